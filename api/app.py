@@ -1,10 +1,11 @@
 from fastapi import FastAPI, HTTPException, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from typing import Optional, Dict, List
 from tempfile import NamedTemporaryFile
+import io
 import os
 import re
 from datetime import datetime
@@ -15,8 +16,18 @@ from smp.core.smp import HazardAnalysisChain
 from new_form_builder.core.doc_to_form import DocToForm
 from chatbot.db.knowledge_base import KnowledgeBase
 from new_form_builder.core.doc_reader import document_reader, authenticate_account
-from chatbot.core.chatbot import KnowledgeBaseChatbot
+from chatbot.core.pool import get_chatbot_pool
 from chatbot.agent.visualization.graph_plotter import chat2plot
+from common.executor import run_blocking
+from common.llm_cache import get_llm_cache, llm_cache_bypass
+from common.context_budget import get_context_stats
+from common.streaming import sse_event
+from common.single_flight import get_single_flight, request_key
+from common.backend_client import get_backend_client
+from common.jobs import JobWorkerPool, get_job_store, new_job_id, FINISHED
+from api.job_handlers import queue_library_refresh
+from smp.core.library import get_hazard_library
+from smp.components.risk import get_risk_scorer
 
 
 
@@ -55,10 +66,27 @@ class FormRequest(BaseModel):
     form_type: str
     save: Optional[bool] = False
     data: Optional[Dict] = False
+    use_cache: Optional[bool] = True
     
 class HazardAnalysisRequest(BaseModel):
     activity_name: str
     input_info: Optional[str] = None
+    use_cache: Optional[bool] = True
+
+class BatchActivity(BaseModel):
+    activity_name: str
+    input_info: Optional[str] = None
+    section: Optional[str] = None
+    shift: Optional[str] = None
+
+class BatchHazardAnalysisRequest(BaseModel):
+    activities: List[BatchActivity]
+    max_concurrency: Optional[int] = None
+    use_cache: Optional[bool] = True
+
+class RescoreRequest(BaseModel):
+    analyses: List[Dict]
+    overwrite: Optional[bool] = True
     
 # class Pdf2FormRequest(BaseModel):
 #     text: str
@@ -68,6 +96,7 @@ class HazardAnalysisRequest(BaseModel):
 class ChatbotQueryRequest(BaseModel):
     query: str
     api_key: Optional[str] = None
+    session_id: Optional[str] = None
 
 # Pydantic model for context
 class ContextEntry(BaseModel):
@@ -92,6 +121,52 @@ class ChatbotQueryResponse(BaseModel):
 def root():
     return {"message": "Welcome to the Coal Mine Form Generator & Hazard Analysis API"}
 
+@app.get("/llm-cache/stats")
+def llm_cache_stats():
+    """
+    Hit/miss metrics of the LLM response cache shared by the chains.
+    """
+    cache = get_llm_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.metrics()}
+
+@app.get("/coalescing/stats")
+def coalescing_stats():
+    """
+    How many identical in-flight LLM requests were coalesced into a shared call.
+    """
+    return get_single_flight().metrics()
+
+@app.get("/backend/stats")
+def backend_stats():
+    """
+    How many mine backend requests were served from the response cache.
+    """
+    return get_backend_client().metrics()
+
+@app.get("/hazard-library")
+def hazard_library_status():
+    """
+    Activities in the pre-computed hazard analysis library and whether they match the current knowledge base.
+    """
+    return {"entries": get_hazard_library().status()}
+
+@app.post("/hazard-library/refresh", status_code=202)
+def refresh_hazard_library(force: bool = False):
+    """
+    Queue regeneration of the hazard analysis library (stale entries only unless forced).
+    """
+    job_id = get_job_store().submit("hazard_library", {"force": force})
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/context/stats")
+def context_stats():
+    """
+    Packed prompt context sizes per chain (tokens against the chain's budget).
+    """
+    return get_context_stats().metrics()
+
 @app.post("/generate-form/")
 async def generate_form(request: FormRequest):
     """
@@ -102,13 +177,19 @@ async def generate_form(request: FormRequest):
     Returns a Generated form as a JSON response in the ShadCN format for webdevs to integrate. 
     """
     try:
-        generated_form = form_generator.generate_form(request.query, request.form_type, request.data)
+        async def generate():
+            with llm_cache_bypass(not request.use_cache):
+                return await form_generator.agenerate_form(request.query, request.form_type, request.data)
+
+        # Identical requests in flight at the same time share one generation
+        key = request_key("generate-form", request.query, request.form_type, request.data, request.use_cache)
+        generated_form = await get_single_flight().do(key, generate)
         if not generated_form:
             raise HTTPException(status_code=500, detail="Form generation failed.")
 
         if request.save:
             output_filename = f"generated_form_{request.query.replace(' ', '_')}.json"
-            form_generator.save_form_to_json(generated_form, output_filename)
+            await run_blocking(form_generator.save_form_to_json, generated_form, output_filename)
             return {
                 "message": "Form generated and saved successfully.",
                 "file_name": output_filename,
@@ -132,15 +213,137 @@ async def perform_hazard_analysis(request: HazardAnalysisRequest):
     Returns Hazard analysis results as a JSON response
     """
     try:
-        result = hazard_analysis_chain.perform_hazard_analysis(
-            activity_name=request.activity_name,
-            input_info=request.input_info or ""
-        )
+        async def analyse():
+            with llm_cache_bypass(not request.use_cache):
+                return await hazard_analysis_chain.aperform_hazard_analysis(
+                    activity_name=request.activity_name,
+                    input_info=request.input_info or "",
+                    use_library=request.use_cache
+                )
+
+        # Identical requests in flight at the same time share one analysis
+        key = request_key("hazard-analysis", request.activity_name, request.input_info or "", request.use_cache)
+        result = await get_single_flight().do(key, analyse)
         return {"message": "Hazard analysis completed", "result": result}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/hazard-analysis/rescore")
+def rescore_hazard_analyses(request: RescoreRequest):
+    """
+    Recompute risk scores and ratings of existing hazard analyses from the SMP scales, without the LLM.
+    
+    Parameters:
+    request: RescoreRequest with the analyses and whether to overwrite their scores (False only validates)
+    
+    Returns the analyses and a report of how many hazards had a wrong score or rating
+    """
+    report = get_risk_scorer().score_analyses(request.analyses, overwrite=request.overwrite)
+    return {"message": "Hazard analyses rescored", "report": report, "analyses": request.analyses}
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _event_stream(events) -> StreamingResponse:
+    """
+    Send an async generator of server-sent events, turning a failure into an error event.
+    """
+    async def stream():
+        try:
+            async for event in events:
+                yield event
+        except Exception as e:
+            yield sse_event({"detail": str(e)}, event="error")
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/generate-form/stream")
+async def generate_form_stream(request: FormRequest):
+    """
+    Streaming variant of /generate-form/ over server-sent events.
+    
+    Events: 'start' immediately, 'section' for each form section as soon as Gemini
+    has finished it, then 'result' with the whole form ('invalid_query' instead if the
+    query is rejected, 'error' on failure). The streamed generation itself is never
+    served from the LLM cache; use_cache applies to the other LLM calls, as for /generate-form/.
+    """
+    async def events():
+        yield sse_event({"query": request.query, "form_type": request.form_type}, event="start")
+        with llm_cache_bypass(not request.use_cache):
+            async for key, data in form_generator.astream_form(request.query, request.form_type, request.data):
+                yield sse_event(data, event="section" if key == "sections" else key)
+    return _event_stream(events())
+
+@app.post("/hazard-analysis/stream")
+async def perform_hazard_analysis_stream(request: HazardAnalysisRequest):
+    """
+    Streaming variant of /hazard-analysis/ over server-sent events.
+    
+    Events: 'start' immediately, 'hazard' for each hazard as soon as Gemini has
+    finished it, then 'result' with the whole analysis ('error' on failure).
+    Streamed responses bypass the LLM cache.
+    """
+    async def events():
+        yield sse_event({"activity_name": request.activity_name}, event="start")
+        async for key, data in hazard_analysis_chain.astream_hazard_analysis(request.activity_name,
+                                                                             request.input_info or "",
+                                                                             use_library=request.use_cache):
+            yield sse_event(data, event="hazard" if key == "hazards" else key)
+    return _event_stream(events())
+
+# Concurrent Gemini calls per batch hazard analysis; requests may ask for fewer
+SMP_BATCH_CONCURRENCY = int(os.getenv("SMP_BATCH_CONCURRENCY", 4))
+
+@app.post("/hazard-analysis/batch")
+async def perform_batch_hazard_analysis(request: BatchHazardAnalysisRequest):
+    """
+    Hazard analysis for all activities of a mine plan over server-sent events.
+    
+    Events: 'start' immediately, 'activity' with each activity's analysis as soon as
+    it completes ('error' for an activity that failed), then 'register' with the
+    consolidated risk register of all activities.
+    """
+    if not request.activities:
+        raise HTTPException(status_code=400, detail="No activities given.")
+    max_concurrency = max(1, min(request.max_concurrency or SMP_BATCH_CONCURRENCY, SMP_BATCH_CONCURRENCY))
+    
+    async def events():
+        yield sse_event({"activities": len(request.activities)}, event="start")
+        with llm_cache_bypass(not request.use_cache):
+            async for key, data in hazard_analysis_chain.astream_batch_hazard_analysis(
+                    [activity.model_dump(exclude_none=True) for activity in request.activities],
+                    max_concurrency=max_concurrency, use_library=request.use_cache):
+                yield sse_event(data, event=key)
+    return _event_stream(events())
+
+@app.post("/chatbot-query/stream")
+async def chatbot_query_stream(request: ChatbotQueryRequest):
+    """
+    Streaming variant of /chatbot-query over server-sent events.
+    
+    Events: 'context' with the retrieved knowledge base context, 'token' for each
+    piece of the response as Gemini generates it, then 'done' with the full response
+    ('error' on failure). Graph and IoT queries are only served by /chatbot-query.
+    """
+    api_key = request.api_key or os.getenv('GOOGLE_API_KEY')
+    if not api_key:
+        raise HTTPException(status_code=400, detail="No API key provided. Please supply an API key.")
+    
+    chatbot_pool = get_chatbot_pool()
+    chatbot = await run_blocking(chatbot_pool.get, api_key, knowledge_base_path="data/vector_db/faiss_index")
+    session_history = chatbot_pool.session_history(api_key, request.session_id)
+    
+    async def events():
+        context_str = await run_blocking(chatbot._retrieve_knowledge_base_context, request.query)
+        yield sse_event(_parse_context(context_str), event="context")
+        parts = []
+        async for text in chatbot.astream_response(request.query, chat_history=session_history,
+                                                   knowledge_base_context=context_str):
+            parts.append(text)
+            yield sse_event({"text": text}, event="token")
+        chatbot_pool.trim_history(session_history)
+        yield sse_event({"response": "".join(parts), "status": "success"}, event="done")
+    return _event_stream(events())
+
 DATA_FOLDER = "data"
 @app.post("/ocr-form/")
 async def upload_pdf(file: UploadFile = File(...)):
@@ -162,26 +365,31 @@ async def upload_pdf(file: UploadFile = File(...)):
         content = await file.read()
         f.write(content)
     try:
-        res = doc_to_form.doc2form(file_location)
+        res = await doc_to_form.adoc2form(file_location)
         return {"message": "Form generated successfully", "form": res}
     except Exception as e:
         raise ValueError("Error generating Form...")
     
+def _read_with_document_ai(file_path: str, mime_type: str) -> str:
+    client = authenticate_account(SERVICE_ACCOUNT_FILE)
+    return document_reader(client=client, file_path=file_path, mime_type=mime_type, location=LOCATION, project_id=PROJECT_ID, processor_id=PROCESSOR_ID)
+
 @app.post("/upload")
-def upload_file(file: UploadFile = File(...)):
+async def upload_file(file: UploadFile = File(...)):
     if file.content_type not in MIME_TYPES:
         if file.content_type not in ["audio/mpeg", "video/mp4"]:
             try:
                 with NamedTemporaryFile(delete=False) as temp_file:
-                    temp_file.write(file.file.read())
+                    temp_file.write(await file.read())
                     temp_file_path = temp_file.name
 
-                client = authenticate_account(SERVICE_ACCOUNT_FILE)
-                extracted_text = document_reader(client=client, file_path=temp_file_path, mime_type=file.content_type, location=LOCATION, project_id=PROJECT_ID, processor_id=PROCESSOR_ID)
+                extracted_text = await run_blocking(_read_with_document_ai, temp_file_path, file.content_type)
                 os.remove(temp_file_path)
-                kb.add_documents([extracted_text], document_type="txt")
+                summary = await run_blocking(kb.add_documents, [io.BytesIO(extracted_text.encode('utf-8'))],
+                                             document_type="txt", source_names=[file.filename])
+                queue_library_refresh(summary)
 
-                return JSONResponse(content={"message": "File processed and added to knowledge base.", "extracted_text": extracted_text})
+                return JSONResponse(content={"message": "File processed and added to knowledge base.", "extracted_text": extracted_text, "ingestion": summary})
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Error processing file with Document AI: {str(e)}")
         else:
@@ -189,19 +397,121 @@ def upload_file(file: UploadFile = File(...)):
     
     try:
         with NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(file.file.read())
+            temp_file.write(await file.read())
             temp_file_path = temp_file.name
     
         if file.content_type == "application/pdf":
-            kb.add_documents([temp_file_path], document_type="pdf")
+            summary = await run_blocking(kb.add_documents, [temp_file_path], document_type="pdf", source_names=[file.filename])
         elif file.content_type == "text/plain":
-            kb.add_documents([temp_file_path], document_type="txt")
+            summary = await run_blocking(kb.add_documents, [temp_file_path], document_type="txt", source_names=[file.filename])
     
         os.remove(temp_file_path)
-        return JSONResponse(content={"message": "File successfully added to knowledge base."})
+        queue_library_refresh(summary)
+        return JSONResponse(content={"message": "File successfully added to knowledge base.", "ingestion": summary})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding file to knowledge base: {str(e)}")
     
+JOB_UPLOADS_FOLDER = os.path.join(DATA_FOLDER, "jobs", "uploads")
+job_workers = JobWorkerPool(get_job_store().path, processes=int(os.getenv("JOB_WORKERS", "2")))
+
+@app.on_event("startup")
+def start_job_workers():
+    # JOB_WORKERS=0 leaves the queue to workers run separately with python -m common.jobs
+    job_workers.start()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    job_workers.stop()
+
+async def _store_upload(job_id: str, file: UploadFile) -> str:
+    directory = os.path.join(JOB_UPLOADS_FOLDER, job_id)
+    os.makedirs(directory, exist_ok=True)
+    file_location = os.path.join(directory, os.path.basename(file.filename))
+    with open(file_location, "wb") as f:
+        f.write(await file.read())
+    return file_location
+
+@app.post("/jobs/ocr-form", status_code=202)
+async def submit_ocr_form_job(file: UploadFile = File(...)):
+    """
+    Queue form generation from a PDF. Poll GET /jobs/{job_id} for the form.
+    """
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
+    job_id = new_job_id()
+    file_location = await _store_upload(job_id, file)
+    get_job_store().submit("ocr_form", {"file_path": file_location}, job_id=job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+@app.post("/jobs/upload", status_code=202)
+async def submit_upload_job(file: UploadFile = File(...)):
+    """
+    Queue adding a file to the knowledge base. Poll GET /jobs/{job_id} for the ingestion summary.
+    """
+    if file.content_type not in MIME_TYPES and file.content_type in ["audio/mpeg", "video/mp4"]:
+        raise HTTPException(status_code=400, detail="Unsupported file type. Only PDF, text, or readable formats are allowed.")
+    job_id = new_job_id()
+    file_location = await _store_upload(job_id, file)
+    get_job_store().submit("ingest", {"file_path": file_location, "content_type": file.content_type,
+                                      "file_name": file.filename}, job_id=job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+@app.post("/jobs/generate-form", status_code=202)
+def submit_generate_form_job(request: FormRequest):
+    """
+    Queue form generation. Poll GET /jobs/{job_id} for the form.
+    """
+    job_id = get_job_store().submit("generate_form", {"query": request.query, "form_type": request.form_type,
+                                                      "data": request.data or None, "use_cache": request.use_cache})
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs")
+def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """
+    Most recent background jobs, optionally with a given status.
+    """
+    return {"jobs": get_job_store().list(status=status, limit=limit)}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Status, progress and, once finished, result or error of a background job.
+    """
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    job.pop("payload")
+    return job
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """
+    Cancel a queued job, or ask a running one to stop at its next step.
+    """
+    status = get_job_store().cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {"job_id": job_id, "status": status, "finished": status in FINISHED}
+
+def _parse_context(context_str: str) -> List[Dict[str, str]]:
+    """
+    Split the chatbot's formatted knowledge base context into source/content entries.
+    """
+    context = []
+    if context_str:
+        # Split by source and parse
+        context_chunks = context_str.split('Source: ')[1:]
+        for chunk in context_chunks:
+            lines = chunk.split('\n', 1)
+            if len(lines) == 2:
+                source = lines[0].strip()
+                content = lines[1].replace('Content: ', '').strip()
+                context.append({
+                    "source": source,
+                    "content": content
+                })
+    return context
+
 @app.post("/chatbot-query", response_model=ChatbotQueryResponse)
 async def chatbot_query(request: ChatbotQueryRequest):
     """
@@ -221,11 +531,10 @@ async def chatbot_query(request: ChatbotQueryRequest):
                 detail="No API key provided. Please supply an API key."
             )
         
-        # Initialize chatbot 
-        chatbot = KnowledgeBaseChatbot(
-            api_key=api_key,
-            knowledge_base_path="data/vector_db/faiss_index"
-        )
+        # Reuse a warm chatbot from the pool, with per-session history
+        chatbot_pool = get_chatbot_pool()
+        chatbot = await run_blocking(chatbot_pool.get, api_key, knowledge_base_path="data/vector_db/faiss_index")
+        session_history = chatbot_pool.session_history(api_key, request.session_id)
         
         graph_terms = ["graph", "visualization", "chart", "plot", "IoT"]
         if any(term in request.query.lower() for term in graph_terms):
@@ -238,7 +547,7 @@ async def chatbot_query(request: ChatbotQueryRequest):
             latest_file_path = os.path.join(folder_path, latest_file)
 
             print(f"Using latest file: {latest_file_path}")
-            df = pd.read_csv(latest_file_path, encoding='latin1')
+            df = await run_blocking(pd.read_csv, latest_file_path, encoding='latin1')
             print("DataFrame Loaded:")
             print(df.head())
             print("\n" + "-"*50 + "\n")
@@ -253,7 +562,7 @@ async def chatbot_query(request: ChatbotQueryRequest):
             # Step 4: Query the LLM to generate the bar chart
             query = "Create a chart showing some kind of simple relation in the data. Clean the data if required."
             print(f"Step 4: Querying ChartPlotter with: '{query}'")
-            result = plotter(query, show_plot=True)
+            result = await run_blocking(plotter, query, show_plot=True)
             print("Query executed. Result obtained.")
             print("\n" + "-"*50 + "\n")
 
@@ -273,26 +582,16 @@ async def chatbot_query(request: ChatbotQueryRequest):
                 }]
             )
         
-        # Generate response
-        response = chatbot.generate_response(request.query)
+        # Retrieve the knowledge base context once, for both the prompt and the response
+        context_str = await run_blocking(chatbot._retrieve_knowledge_base_context, request.query)
         
-        # Process knowledge base context
-        context_str = chatbot._retrieve_knowledge_base_context(request.query)
+        # Generate response
+        response = await chatbot.agenerate_response(request.query, chat_history=session_history,
+                                                    knowledge_base_context=context_str)
+        chatbot_pool.trim_history(session_history)
         
         # Parse context string into list of dictionaries
-        context = []
-        if context_str:
-            # Split by source and parse
-            context_chunks = context_str.split('Source: ')[1:]
-            for chunk in context_chunks:
-                lines = chunk.split('\n', 1)
-                if len(lines) == 2:
-                    source = lines[0].strip()
-                    content = lines[1].replace('Content: ', '').strip()
-                    context.append({
-                        "source": source,
-                        "content": content
-                    })
+        context = _parse_context(context_str)
         
         # Prepare chat history
         chat_history = [
@@ -300,7 +599,7 @@ async def chatbot_query(request: ChatbotQueryRequest):
                 "role": msg.role,
                 "timestamp": msg.timestamp,
                 "content": msg.content
-            } for msg in chatbot.chat_history
+            } for msg in session_history
         ]
         
         # Construct response
@@ -0,0 +1,149 @@
+import io
+import os
+import shutil
+from functools import lru_cache
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+
+from common.jobs import QUEUED, JobContext, get_job_store
+from common.llm_cache import llm_cache_bypass
+
+# Handlers run in the job worker processes, which do not import api.app, so each
+# process builds the heavy objects it needs once and reuses them across jobs.
+load_dotenv()
+
+
+@lru_cache()
+def _doc_to_form():
+    from new_form_builder.core.doc_to_form import DocToForm
+    return DocToForm(os.getenv("GOOGLE_API_KEY"))
+
+
+@lru_cache()
+def _form_generator():
+    from new_form_builder.core.form_builder import CoalMineFormGenerator
+    return CoalMineFormGenerator(os.getenv("GOOGLE_API_KEY"))
+
+
+@lru_cache()
+def _hazard_analysis_chain():
+    from smp.core.smp import HazardAnalysisChain
+    return HazardAnalysisChain(os.getenv("GOOGLE_API_KEY"))
+
+
+@lru_cache()
+def _knowledge_base():
+    from chatbot.db.knowledge_base import KnowledgeBase
+    return KnowledgeBase(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+def _read_with_document_ai(file_path: str, mime_type: str) -> str:
+    from new_form_builder.core.doc_reader import document_reader, authenticate_account
+    client = authenticate_account(os.getenv("SERVICE_ACCOUNT"))
+    return document_reader(client=client, file_path=file_path, mime_type=mime_type, location=os.getenv("LOCATION"),
+                           project_id=os.getenv("PROJECT_ID"), processor_id=os.getenv("PROCESSOR_ID"))
+
+
+def queue_library_refresh(summary: Dict[str, Any]) -> None:
+    """
+    Queue regeneration of the hazard analysis library after an ingestion that changed the knowledge base.
+    """
+    if not summary.get("updated"):
+        return
+    store = get_job_store()
+    if not any(job["kind"] == "hazard_library" for job in store.list(status=QUEUED)):
+        store.submit("hazard_library", {})
+
+
+def _remove_upload(file_path: str) -> None:
+    shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+
+
+def ocr_form(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """
+    Generate a form from an uploaded PDF.
+
+    Parameters:
+    payload: 'file_path' of the stored upload
+    context: Job context for progress reports
+
+    Returns the generated form.
+    """
+    try:
+        context.progress(0.1, "Reading document")
+        doc_to_form = _doc_to_form()
+        extracted_text = doc_to_form._fit_to_budget(doc_to_form._read_document(payload["file_path"]))
+        context.progress(0.5, "Generating form")
+        form = doc_to_form.chain.invoke({"input_text": extracted_text})
+        return {"message": "Form generated successfully", "form": form}
+    finally:
+        _remove_upload(payload["file_path"])
+
+
+def ingest(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """
+    Add an uploaded file to the knowledge base.
+
+    Parameters:
+    payload: 'file_path' of the stored upload, its 'content_type' and original 'file_name'
+    context: Job context for progress reports
+
+    Returns the ingestion summary (and the extracted text for Document AI reads).
+    """
+    file_path, content_type, file_name = payload["file_path"], payload["content_type"], payload["file_name"]
+    try:
+        kb = _knowledge_base()
+        if content_type == "application/pdf":
+            context.progress(0.1, "Embedding document")
+            summary = kb.add_documents([file_path], document_type="pdf", source_names=[file_name])
+            queue_library_refresh(summary)
+            return {"message": "File successfully added to knowledge base.", "ingestion": summary}
+        if content_type == "text/plain":
+            context.progress(0.1, "Embedding document")
+            summary = kb.add_documents([file_path], document_type="txt", source_names=[file_name])
+            queue_library_refresh(summary)
+            return {"message": "File successfully added to knowledge base.", "ingestion": summary}
+
+        context.progress(0.1, "Extracting text with Document AI")
+        extracted_text = _read_with_document_ai(file_path, content_type)
+        context.progress(0.5, "Embedding document")
+        summary = kb.add_documents([io.BytesIO(extracted_text.encode('utf-8'))], document_type="txt",
+                                   source_names=[file_name])
+        queue_library_refresh(summary)
+        return {"message": "File processed and added to knowledge base.", "extracted_text": extracted_text,
+                "ingestion": summary}
+    finally:
+        _remove_upload(file_path)
+
+
+def generate_form(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """
+    Generate a form from a description.
+
+    Parameters:
+    payload: 'query', 'form_type', optional 'data' and 'use_cache' of a FormRequest
+    context: Job context for progress reports
+
+    Returns the generated form.
+    """
+    context.progress(0.1, "Generating form")
+    with llm_cache_bypass(not payload.get("use_cache", True)):
+        form = _form_generator().generate_form(payload["query"], payload["form_type"], payload.get("data"))
+    if not form:
+        raise ValueError("Form generation failed.")
+    return {"message": "Form query processed", "form": form}
+
+
+def hazard_library(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """
+    Regenerate the stale entries of the pre-computed hazard analysis library.
+
+    Parameters:
+    payload: Optional 'activities' to generate and 'force' to regenerate fresh entries
+    context: Job context for progress reports
+
+    Returns the generated, fresh and failed activities.
+    """
+    return _hazard_analysis_chain().precompute_library(payload.get("activities"), force=payload.get("force", False),
+                                                       progress=context.progress)
@@ -0,0 +1,108 @@
+"""
+Load benchmark for the async request path.
+
+Fires concurrent /hazard-analysis/ requests against the FastAPI app in-process with
+the Gemini LLM replaced by a stub that sleeps for a fixed latency. The old blocking
+handler (sync chain call inside an async endpoint) is mounted next to it for comparison.
+
+Usage:
+    python -m api.test.load_benchmark
+"""
+import os
+import time
+import json
+import asyncio
+from typing import Any, List, Optional
+
+import httpx
+from langchain_core.language_models.llms import LLM
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+# Measure the LLM path, not cache hits
+os.environ["LLM_CACHE_DISABLED"] = "1"
+
+import api.app as api_app
+
+LLM_LATENCY = 0.2
+CONCURRENCY_LEVELS = [1, 4, 16, 32]
+
+STUB_RESPONSE = json.dumps({
+    "activity_name": "Blasting",
+    "hazards": [{
+        "hazard_id": "BO-1",
+        "hazard_aspect": "Fly rock",
+        "possible_outcome": "Injury",
+        "existing_control_measures": "Danger zone",
+        "probability": 3,
+        "exposure": 5,
+        "consequences": 1,
+        "risk_score": 15,
+        "risk_rating": "Medium",
+        "additional_control_measures": [],
+        "residual_impact": "Low"
+    }]
+})
+
+
+class StubLLM(LLM):
+    """LLM stand-in that waits for a fixed latency and returns a canned answer."""
+    delay: float = LLM_LATENCY
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        time.sleep(self.delay)
+        return STUB_RESPONSE
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        await asyncio.sleep(self.delay)
+        return STUB_RESPONSE
+
+
+def install_stubs():
+    chain = api_app.hazard_analysis_chain
+    # Every request must reach the LLM: no cached responses and no pre-computed analyses
+    chain.llm = StubLLM(cache=False)
+    chain.library.get = lambda activity_name: None
+    chain.chain = chain.prompt | chain.llm | chain.parser
+    chain.knowledge_base.vector_store = FAISS.from_texts(
+        ["Blasting shall be carried out by a competent shotfirer.",
+         "Danger zone must be cleared before firing."],
+        FakeEmbeddings(size=768),
+    )
+
+    @api_app.app.post("/hazard-analysis-blocking/")
+    async def blocking_hazard_analysis(request: api_app.HazardAnalysisRequest):
+        result = chain.perform_hazard_analysis(activity_name=request.activity_name,
+                                               input_info=request.input_info or "")
+        return {"message": "Hazard analysis completed", "result": result}
+
+
+async def run_level(client: httpx.AsyncClient, path: str, concurrency: int) -> float:
+    # Distinct activities, so identical in-flight requests are not coalesced into one call
+    payloads = [{"activity_name": f"Activity {i}", "use_cache": False} for i in range(concurrency)]
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[client.post(path, json=payload) for payload in payloads])
+    elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200]
+    return concurrency / elapsed
+
+
+async def main():
+    install_stubs()
+    transport = httpx.ASGITransport(app=api_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        print(f"Stub LLM latency: {LLM_LATENCY * 1000:.0f} ms")
+        print(f"{'concurrency':>12} {'blocking req/s':>16} {'async req/s':>12}")
+        for level in CONCURRENCY_LEVELS:
+            blocking = await run_level(client, "/hazard-analysis-blocking/", level)
+            non_blocking = await run_level(client, "/hazard-analysis/", level)
+            print(f"{level:>12} {blocking:>16.1f} {non_blocking:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
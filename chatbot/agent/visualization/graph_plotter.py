@@ -31,6 +31,7 @@ from chatbot.agent.visualization.prompts import (
 )
 from chatbot.agent.visualization.render import draw_plotly, draw_altair
 from chatbot.agent.visualization.schema import PlotConfig, ResponseType, get_schema_of_chart_config
+from common.llm_cache import get_llm_cache
 
 _logger = getLogger(__name__)
 
@@ -329,6 +330,7 @@ def _get_or_default_chat_model(chat: BaseChatModel | None) -> BaseChatModel:
         return ChatGoogleGenerativeAI(
             model="gemini-pro", 
             temperature=0.0,
-            google_api_key=GOOGLE_API_KEY
+            google_api_key=GOOGLE_API_KEY,
+            cache=get_llm_cache()
         )
     return chat
\ No newline at end of file
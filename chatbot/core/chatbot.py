@@ -1,10 +1,12 @@
 import os
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
 from dataclasses import dataclass, field
 from datetime import datetime
 
 # Knowledge Base and LLM imports
 from chatbot.db.knowledge_base import KnowledgeBase
+from common.executor import run_blocking
+from common.context_budget import get_context_budget, get_context_stats, pack_chunks
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory
@@ -62,6 +64,7 @@ class KnowledgeBaseChatbot:
             Based on the conversation history and the most relevant context from the knowledge base, 
             provide a helpful and accurate response. You are Anthra, a coal mine chatbot who will help the supervisor and others 
             in the coal mine. You need to give concrete answers to the questions posed by the user. 
+            When you use the knowledge base context, cite the source and page it came from.
 
             Knowledge Base Context:
             {knowledge_base_context}
@@ -73,9 +76,27 @@ class KnowledgeBaseChatbot:
             AI Response:"""
         )
     
-    def _retrieve_knowledge_base_context(self, query: str, top_k: int = 3) -> str:
+    @staticmethod
+    def _format_citation(metadata: Dict) -> str:
         """
-        Retrieve most relevant context from the knowledge base.
+        Format the provenance of a chunk, e.g. "CMR.pdf, pages 41-42, Regulation 104".
+        Chunks indexed before page tracking only carry their source.
+        
+        :param metadata: Chunk metadata from the knowledge base
+        :return: Citation string
+        """
+        citation = str(metadata['source'])
+        page, end_page = metadata.get('page_number'), metadata.get('end_page')
+        if page is not None:
+            citation += f", page {page}" if end_page in (None, page) else f", pages {page}-{end_page}"
+        if metadata.get('section_title'):
+            citation += f", {metadata['section_title']}"
+        return citation
+    
+    def _retrieve_knowledge_base_context(self, query: str, top_k: int = 5) -> str:
+        """
+        Retrieve most relevant context from the knowledge base, packed under the
+        chatbot's token budget (CONTEXT_BUDGET_CHATBOT).
         
         :param query: User's input query
         :param top_k: Number of top similar chunks to retrieve
@@ -83,34 +104,74 @@ class KnowledgeBaseChatbot:
         """
         try:
             similar_chunks = self.knowledge_base.query_vector_store(query, top_k=top_k)
-            context_str = "\n\n".join([
-                f"Source: {metadata['source']}\nContent: {chunk}"
-                for chunk, metadata in similar_chunks
-            ])
+            packed = pack_chunks(
+                similar_chunks,
+                get_context_budget("chatbot"),
+                format_chunk=lambda chunk, metadata: f"Source: {self._format_citation(metadata)}\nContent: {chunk}",
+                separator="\n\n",
+            )
+            get_context_stats().record("chatbot", packed)
             
-            return context_str
+            return packed.text
         except Exception as e:
             print(f"Error retrieving knowledge base context: {e}")
             return ""
     
-    def generate_response(self, user_input: str) -> str:
+    def _build_prompt(self, user_input: str, knowledge_base_context: str, history: List[ChatMessage]) -> str:
         """
-        Generate a response using the knowledge base and language model.
+        Render the chat prompt from the retrieved context and recent history.
         
         :param user_input: User's input message
-        :return: AI-generated response
+        :param knowledge_base_context: Formatted knowledge base context
+        :param history: Conversation history to draw the last turns from
+        :return: Rendered prompt
         """
-        knowledge_base_context = self._retrieve_knowledge_base_context(user_input)
         chat_history_str = "\n".join([
             f"{msg.role.capitalize()}: {msg.content}" 
-            for msg in self.chat_history[-5:] 
+            for msg in history[-5:] 
         ])
 
-        prompt = self.prompt_template.format(
+        return self.prompt_template.format(
             chat_history=chat_history_str,
             knowledge_base_context=knowledge_base_context,
             human_input=user_input
         )
+    
+    def _record_turn(self, user_input: str, response: str, chat_history: Optional[List[ChatMessage]]) -> None:
+        """
+        Append a completed exchange to the chat history and memory.
+        
+        :param user_input: User's input message
+        :param response: AI-generated response
+        :param chat_history: Session-scoped history, or None for the instance history
+        """
+        history = self.chat_history if chat_history is None else chat_history
+        history.extend([
+            ChatMessage(role='human', content=user_input),
+            ChatMessage(role='ai', content=response)
+        ])
+        
+        # Update memory (only for the instance's own conversation)
+        if chat_history is None:
+            self.memory.chat_memory.add_user_message(user_input)
+            self.memory.chat_memory.add_ai_message(response)
+    
+    def generate_response(self, user_input: str, chat_history: Optional[List[ChatMessage]] = None,
+                          knowledge_base_context: Optional[str] = None) -> str:
+        """
+        Generate a response using the knowledge base and language model.
+        
+        :param user_input: User's input message
+        :param chat_history: Session-scoped history to read and update instead of the
+            instance history (used when the chatbot is shared through a pool)
+        :param knowledge_base_context: Context already retrieved for this input, so a
+            request that also returns the context does not retrieve it twice
+        :return: AI-generated response
+        """
+        history = self.chat_history if chat_history is None else chat_history
+        if knowledge_base_context is None:
+            knowledge_base_context = self._retrieve_knowledge_base_context(user_input)
+        prompt = self._build_prompt(user_input, knowledge_base_context, history)
         
         # Generate response
         try:
@@ -119,14 +180,60 @@ class KnowledgeBaseChatbot:
             print(f"Error generating response: {e}")
             response = "I'm sorry, I couldn't generate a response at the moment."
         
-        # Update chat history
-        self.chat_history.extend([
-            ChatMessage(role='human', content=user_input),
-            ChatMessage(role='ai', content=response)
-        ])
+        self._record_turn(user_input, response, chat_history)
+        return response
+    
+    async def agenerate_response(self, user_input: str, chat_history: Optional[List[ChatMessage]] = None,
+                                 knowledge_base_context: Optional[str] = None) -> str:
+        """
+        Async variant of generate_response. Retrieval runs on the bounded blocking
+        pool and the LLM call is awaited.
+        
+        :param user_input: User's input message
+        :param chat_history: Session-scoped history to read and update
+        :param knowledge_base_context: Context already retrieved for this input
+        :return: AI-generated response
+        """
+        history = self.chat_history if chat_history is None else chat_history
+        if knowledge_base_context is None:
+            knowledge_base_context = await run_blocking(self._retrieve_knowledge_base_context, user_input)
+        prompt = self._build_prompt(user_input, knowledge_base_context, history)
+        
+        try:
+            response = (await self.llm.ainvoke(prompt)).content
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            response = "I'm sorry, I couldn't generate a response at the moment."
+        
+        self._record_turn(user_input, response, chat_history)
+        return response
+    
+    async def astream_response(self, user_input: str, chat_history: Optional[List[ChatMessage]] = None,
+                               knowledge_base_context: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Streaming variant of agenerate_response that yields the response text as
+        Gemini generates it. The turn is recorded once the response is complete.
         
-        # Update memory
-        self.memory.chat_memory.add_user_message(user_input)
-        self.memory.chat_memory.add_ai_message(response)
+        :param user_input: User's input message
+        :param chat_history: Session-scoped history to read and update
+        :param knowledge_base_context: Context already retrieved for this input
+        :return: Async generator of response text chunks
+        """
+        history = self.chat_history if chat_history is None else chat_history
+        if knowledge_base_context is None:
+            knowledge_base_context = await run_blocking(self._retrieve_knowledge_base_context, user_input)
+        prompt = self._build_prompt(user_input, knowledge_base_context, history)
+        
+        parts = []
+        try:
+            async for chunk in self.llm.astream(prompt):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            if not parts:
+                parts.append("I'm sorry, I couldn't generate a response at the moment.")
+                yield parts[0]
         
-        return response
\ No newline at end of file
+        self._record_turn(user_input, "".join(parts), chat_history)
@@ -0,0 +1,167 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from chatbot.core.chatbot import KnowledgeBaseChatbot, ChatMessage
+
+INDEX_FILES = ("store.json", "index.faiss", "index.pkl")
+
+
+def _index_signature(knowledge_base_path: str) -> Tuple:
+    """
+    Build a cheap fingerprint of the vector store on disk.
+
+    :param knowledge_base_path: Directory holding the saved vector store
+    :return: Tuple of (file name, mtime, size) for every index file present
+    """
+    signature = []
+    for name in INDEX_FILES:
+        path = os.path.join(knowledge_base_path, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class ChatbotPool:
+    """
+    A process-wide pool of warm chatbot engines.
+
+    Engines are keyed by (API key, knowledge base path) so that the vector store
+    and LLM clients are loaded once and shared between requests. The pool is bounded
+    and evicts the least recently used engine, and an engine is rebuilt when the
+    vector store on disk changes. Conversation history is kept per session on top
+    of the shared engines.
+
+    Attributes:
+        max_engines (int): Maximum number of engines kept warm
+        max_sessions (int): Maximum number of session histories kept in memory
+        max_history (int): Maximum number of messages kept per session
+    """
+
+    def __init__(self,
+                 max_engines: int = 4,
+                 max_sessions: int = 1000,
+                 max_history: int = 50,
+                 factory: Optional[Callable[[str, str], KnowledgeBaseChatbot]] = None):
+        """
+        Initialize an empty pool.
+
+        :param max_engines: Maximum number of engines kept warm
+        :param max_sessions: Maximum number of session histories kept in memory
+        :param max_history: Maximum number of messages kept per session
+        :param factory: Callable building an engine from (api_key, knowledge_base_path)
+        """
+        self.max_engines = max_engines
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self._factory = factory or (lambda api_key, path: KnowledgeBaseChatbot(
+            api_key=api_key, knowledge_base_path=path))
+
+        self._engines: "OrderedDict[Tuple[str, str], Tuple[Tuple, KnowledgeBaseChatbot]]" = OrderedDict()
+        self._sessions: "OrderedDict[Tuple[str, str], List[ChatMessage]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self.stats = {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0}
+
+    @staticmethod
+    def _key(api_key: str, knowledge_base_path: str) -> Tuple[str, str]:
+        digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        return digest, os.path.abspath(knowledge_base_path)
+
+    def get(self, api_key: str, knowledge_base_path: str = "data/vector_db/faiss_index") -> KnowledgeBaseChatbot:
+        """
+        Return a warm engine, building or hot-swapping it when needed.
+
+        :param api_key: Google API key used by the engine
+        :param knowledge_base_path: Path to the FAISS vector store
+        :return: Shared KnowledgeBaseChatbot instance
+        """
+        key = self._key(api_key, knowledge_base_path)
+        signature = _index_signature(knowledge_base_path)
+
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry is not None and entry[0] == signature:
+                self._engines.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Build outside the pool lock so a slow load does not block other keys
+        with key_lock:
+            with self._lock:
+                entry = self._engines.get(key)
+                if entry is not None and entry[0] == signature:
+                    self._engines.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1]
+
+            engine = self._factory(api_key, knowledge_base_path)
+
+            with self._lock:
+                if entry is not None:
+                    self.stats["reloads"] += 1
+                else:
+                    self.stats["misses"] += 1
+                self._engines[key] = (signature, engine)
+                self._engines.move_to_end(key)
+                while len(self._engines) > self.max_engines:
+                    evicted, _ = self._engines.popitem(last=False)
+                    self._key_locks.pop(evicted, None)
+                    self.stats["evictions"] += 1
+            return engine
+
+    def session_history(self, api_key: str, session_id: Optional[str]) -> List[ChatMessage]:
+        """
+        Return the chat history for a session, creating it when missing. Sessions are
+        scoped to the API key, so a session id sent with another key gets its own history.
+
+        :param api_key: Google API key of the client
+        :param session_id: Session identifier; None gives a throwaway history
+        :return: Mutable list of chat messages for the session
+        """
+        if session_id is None:
+            return []
+
+        key = (hashlib.sha256(api_key.encode("utf-8")).hexdigest(), session_id)
+        with self._lock:
+            history = self._sessions.get(key)
+            if history is None:
+                history = []
+                self._sessions[key] = history
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(key)
+            return history
+
+    def trim_history(self, history: List[ChatMessage]) -> None:
+        """
+        Drop the oldest messages of a session beyond max_history.
+
+        :param history: Session history to trim in place
+        """
+        with self._lock:
+            if len(history) > self.max_history:
+                del history[:len(history) - self.max_history]
+
+    def clear(self) -> None:
+        """Drop every engine and session history."""
+        with self._lock:
+            self._engines.clear()
+            self._sessions.clear()
+            self._key_locks.clear()
+
+
+@lru_cache()
+def get_chatbot_pool() -> ChatbotPool:
+    """Return the process-wide chatbot pool."""
+    return ChatbotPool(
+        max_engines=int(os.getenv("CHATBOT_POOL_SIZE", 4)),
+        max_sessions=int(os.getenv("CHATBOT_MAX_SESSIONS", 1000)),
+    )
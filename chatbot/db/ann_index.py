@@ -0,0 +1,299 @@
+"""
+Approximate-nearest-neighbour indexes for the knowledge base.
+
+LangChain builds a flat (exact) FAISS index whose search cost grows linearly with the
+corpus. An IndexSpec describes an IVF-Flat, IVF-PQ or HNSW index; build_index trains
+it on the stored vectors, and convert_store swaps it into a LangChain FAISS store
+while keeping the docstore and vector ids. benchmark() reports recall and latency
+of each spec against the flat baseline.
+
+Usage:
+    python -m chatbot.db.ann_index faiss_index --kinds ivf-flat ivf-pq hnsw
+"""
+import os
+import math
+import time
+import argparse
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+FLAT = "flat"
+IVF_FLAT = "ivf-flat"
+IVF_PQ = "ivf-pq"
+HNSW = "hnsw"
+
+# k-means needs about 39 training points per centroid
+TRAINING_POINTS_PER_CENTROID = 39
+
+
+@dataclass
+class IndexSpec:
+    """ Type and parameters of a FAISS index. """
+    kind: str = FLAT
+    nlist: Optional[int] = None     # IVF cells (defaults to 4 * sqrt(n))
+    nprobe: int = 8                 # IVF cells visited per query
+    pq_m: int = 16                  # PQ sub-quantizers
+    pq_bits: int = 8                # bits per PQ code
+    hnsw_m: int = 32                # HNSW neighbours per node
+    ef_construction: int = 40       # HNSW candidate list size while building
+    ef_search: int = 64             # HNSW candidate list size per query
+
+    @classmethod
+    def from_env(cls) -> "IndexSpec":
+        """ Read the index configuration from VECTOR_INDEX (flat, ivf-flat, ivf-pq or hnsw),
+            VECTOR_INDEX_NLIST, VECTOR_INDEX_NPROBE and VECTOR_INDEX_EF_SEARCH.
+        """
+        nlist = os.getenv("VECTOR_INDEX_NLIST")
+        return cls(
+            kind=os.getenv("VECTOR_INDEX", FLAT).lower(),
+            nlist=int(nlist) if nlist else None,
+            nprobe=int(os.getenv("VECTOR_INDEX_NPROBE", "8")),
+            ef_search=int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64")),
+        )
+
+    def _nlist(self, n: int) -> int:
+        nlist = self.nlist or int(4 * math.sqrt(n))
+        return max(1, min(nlist, n // TRAINING_POINTS_PER_CENTROID))
+
+    def _pq_m(self, dim: int) -> int:
+        """ Largest number of sub-quantizers not above pq_m that divides the dimension. """
+        return max(m for m in range(1, min(self.pq_m, dim) + 1) if dim % m == 0)
+
+    def min_vectors(self) -> int:
+        """ Number of vectors needed to train the index. """
+        if self.kind == IVF_FLAT:
+            return TRAINING_POINTS_PER_CENTROID
+        if self.kind == IVF_PQ:
+            return TRAINING_POINTS_PER_CENTROID * (1 << self.pq_bits)
+        return 0
+
+    def factory_string(self, dim: int, n: int) -> str:
+        """ FAISS index_factory description of the index for n vectors of a dimension. """
+        if self.kind == FLAT:
+            return "Flat"
+        if self.kind == IVF_FLAT:
+            return f"IVF{self._nlist(n)},Flat"
+        if self.kind == IVF_PQ:
+            return f"IVF{self._nlist(n)},PQ{self._pq_m(dim)}x{self.pq_bits}"
+        if self.kind == HNSW:
+            return f"HNSW{self.hnsw_m}"
+        raise ValueError(f"Unsupported index type: {self.kind}")
+
+
+def set_search_params(index: faiss.Index, spec: IndexSpec) -> None:
+    """ Apply the query-time parameters (nprobe, efSearch) of a spec to an index. """
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = spec.ef_search
+        return
+    if not isinstance(index, faiss.Index):
+        return  # e.g. the memory-mapped flat index
+    try:
+        faiss.extract_index_ivf(index).nprobe = spec.nprobe
+    except RuntimeError:
+        pass  # not an IVF index
+
+
+def search_positions(index, vectors: np.ndarray, k: int, positions: np.ndarray):
+    """ Search only the given vector positions, e.g. the positions matching a metadata filter.
+        Approximate and flat FAISS indexes take the positions as an ID selector, so the
+        restriction is applied during the search; the memory-mapped flat index searches
+        the selected rows directly.
+        :return: (distances, labels) like index.search
+    """
+    positions = np.ascontiguousarray(positions, dtype=np.int64)
+    if not isinstance(index, faiss.Index):
+        return index.search_subset(vectors, k, positions)
+
+    selector = faiss.IDSelectorBatch(positions)
+    if isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    elif isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return index.search(vectors, k, params=params)
+
+
+def index_kind(index: faiss.Index) -> str:
+    """ Kind of an existing FAISS index. """
+    if isinstance(index, faiss.IndexHNSW):
+        return HNSW
+    if isinstance(index, faiss.IndexIVFPQ):
+        return IVF_PQ
+    if isinstance(index, faiss.IndexIVF):
+        return IVF_FLAT
+    return FLAT
+
+
+def build_index(vectors: np.ndarray, spec: IndexSpec) -> faiss.Index:
+    """ Build, train and fill an index.
+        :param vectors: float32 matrix of the vectors, in the order of their docstore ids
+        :param spec: Index type and parameters
+        :return: FAISS index holding the vectors
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    if n < spec.min_vectors():
+        raise ValueError(f"{spec.kind} needs at least {spec.min_vectors()} vectors to train, got {n}")
+
+    index = faiss.index_factory(dim, spec.factory_string(dim, n), faiss.METRIC_L2)
+    if spec.kind == HNSW:
+        index.hnsw.efConstruction = spec.ef_construction
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    if spec.kind in (IVF_FLAT, IVF_PQ):
+        # Lets the index reconstruct vectors, so it can be converted or refilled later
+        faiss.extract_index_ivf(index).make_direct_map()
+    set_search_params(index, spec)
+    return index
+
+
+def store_vectors(vector_store: FAISS) -> np.ndarray:
+    """ Read back every vector of a store, in index order. """
+    index = vector_store.index
+    if isinstance(index, faiss.IndexIVF) and index.direct_map.no():
+        raise ValueError("Vectors of this index cannot be reconstructed; rebuild it from the documents")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def convert_store(vector_store: FAISS, spec: IndexSpec) -> bool:
+    """ Replace the index of a LangChain FAISS store with one built for a spec.
+        Positions are preserved, so the docstore mapping stays valid.
+        :return: Whether the index was converted (False if the store is too small to train it)
+    """
+    if vector_store.index.ntotal < max(spec.min_vectors(), 1):
+        return False
+    vector_store.index = build_index(store_vectors(vector_store), spec)
+    return True
+
+
+def delete_from_store(vector_store: FAISS, ids: List[str]) -> None:
+    """ Delete vectors from a store. LangChain's delete relies on removal renumbering the
+        remaining vectors, which only flat indexes do (and HNSW cannot remove at all), so
+        approximate indexes are refilled with the kept vectors, reusing their training.
+    """
+    if index_kind(vector_store.index) == FLAT:
+        vector_store.delete(ids)
+        return
+
+    removed = set(ids)
+    positions = [i for i, doc_id in sorted(vector_store.index_to_docstore_id.items()) if doc_id not in removed]
+    kept_ids = [vector_store.index_to_docstore_id[i] for i in positions]
+    removed_ids = [doc_id for doc_id in vector_store.index_to_docstore_id.values() if doc_id in removed]
+    vectors = store_vectors(vector_store)[positions]
+
+    index = faiss.clone_index(vector_store.index)
+    index.reset()
+    if len(positions):
+        index.add(vectors)
+    vector_store.docstore.delete(removed_ids)
+    vector_store.index = index
+    vector_store.index_to_docstore_id = dict(enumerate(kept_ids))
+
+
+def needs_retraining(index: faiss.Index, spec: IndexSpec) -> bool:
+    """ Whether an IVF index was trained on a much smaller corpus: once the number of cells
+        the spec gives for its current size has doubled, its lists are too long to search fast.
+    """
+    if spec.kind not in (IVF_FLAT, IVF_PQ) or index_kind(index) != spec.kind:
+        return False
+    return spec._nlist(index.ntotal) >= 2 * faiss.extract_index_ivf(index).nlist
+
+
+def ensure_index(vector_store: FAISS, spec: IndexSpec) -> None:
+    """ Bring a store to the configured index type once it has enough vectors to train it,
+        retrain IVF indexes as the corpus grows, and apply the query-time parameters.
+    """
+    if (index_kind(vector_store.index) != spec.kind and spec.kind != FLAT) or \
+            needs_retraining(vector_store.index, spec):
+        convert_store(vector_store, spec)
+    set_search_params(vector_store.index, spec)
+
+
+def benchmark(vectors: np.ndarray, queries: np.ndarray, specs: Sequence[IndexSpec], k: int = 5) -> List[Dict]:
+    """ Measure recall@k and query latency of index specs against exact search.
+        :param vectors: Indexed vectors
+        :param queries: Query vectors
+        :param specs: Index specs to compare
+        :param k: Number of neighbours
+        :return: One report per spec (plus the flat baseline) with build time, recall and latency
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    reports = []
+    truth = None
+    for spec in [IndexSpec(kind=FLAT)] + list(specs):
+        start = time.perf_counter()
+        try:
+            index = build_index(vectors, spec)
+        except ValueError as e:
+            reports.append({"index": spec.kind, "error": str(e)})
+            continue
+        build_seconds = time.perf_counter() - start
+
+        latencies, results = [], []
+        for query in queries:
+            start = time.perf_counter()
+            _, neighbours = index.search(query[None, :], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(neighbours[0])
+        results = np.array(results)
+        if truth is None:
+            truth = results
+
+        recall = np.mean([len(set(found) & set(expected)) / k for found, expected in zip(results, truth)])
+        reports.append({
+            "index": spec.factory_string(*vectors.shape[::-1]),
+            "build_seconds": round(build_seconds, 3),
+            f"recall@{k}": round(float(recall), 4),
+            "mean_ms": round(float(np.mean(latencies)), 4),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+        })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report recall vs latency of ANN indexes on a saved vector store.")
+    parser.add_argument("store", help="Directory of the saved FAISS vector store")
+    parser.add_argument("--kinds", nargs="+", default=[IVF_FLAT, IVF_PQ, HNSW], help="Index types to compare")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled query vectors")
+    parser.add_argument("--k", type=int, default=5, help="Neighbours per query")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8], help="IVF nprobe values to try")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[64], help="HNSW efSearch values to try")
+    args = parser.parse_args()
+
+    from langchain_community.embeddings import FakeEmbeddings
+    from chatbot.db.mmap_store import open_store
+
+    vectors = store_vectors(open_store(args.store, FakeEmbeddings(size=1)))
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.integers(0, len(vectors), size=args.queries)]
+    queries = sample + rng.normal(scale=float(np.std(vectors)) * 0.1, size=sample.shape).astype(np.float32)
+
+    specs = []
+    for kind in args.kinds:
+        if kind == HNSW:
+            specs += [IndexSpec(kind=kind, ef_search=ef) for ef in args.ef_search]
+        elif kind in (IVF_FLAT, IVF_PQ):
+            specs += [IndexSpec(kind=kind, nprobe=nprobe) for nprobe in args.nprobe]
+        else:
+            specs.append(IndexSpec(kind=kind))
+
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries")
+    for report, spec in zip(benchmark(vectors, queries, specs, k=args.k), [IndexSpec()] + specs):
+        if "error" in report:
+            print(f"{report['index']:>24}  skipped: {report['error']}")
+            continue
+        param = f"nprobe={spec.nprobe}" if spec.kind in (IVF_FLAT, IVF_PQ) else \
+            f"efSearch={spec.ef_search}" if spec.kind == HNSW else ""
+        print(f"{report['index']:>24} {param:>14}  recall@{args.k}={report[f'recall@{args.k}']:.3f}  "
+              f"mean={report['mean_ms']:.3f}ms  p95={report['p95_ms']:.3f}ms  build={report['build_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
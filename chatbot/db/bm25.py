@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or shall that the their there
+these this to was were which will with such any all not no may than then so into under
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """ Lowercase word and number tokens with stopwords removed and plurals folded,
+        so "Regulation 104", "regulations" and "104" all match.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and not token.isdigit():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """ An in-memory inverted index scored with Okapi BM25, kept in sync with the vector
+        store by document id. Postings map each term to {doc id: term frequency}, so
+        documents can be added and removed incrementally.
+    """
+    FILE_NAME = "bm25.json"
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """ :param k1: Term frequency saturation
+            :param b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add_many(self, documents: Iterable[Tuple[str, str]]) -> None:
+        """ Index documents, replacing any with the same id.
+            :param documents: (doc id, text) pairs
+        """
+        with self._lock:
+            documents = list(documents)
+            self.remove_many([doc_id for doc_id, _ in documents if doc_id in self.lengths])
+            for doc_id, text in documents:
+                tokens = tokenize(text)
+                for term, count in Counter(tokens).items():
+                    self.postings[term][doc_id] = count
+                self.lengths[doc_id] = len(tokens)
+                self._total_length += len(tokens)
+
+    def remove_many(self, doc_ids: Iterable[str]) -> None:
+        """ Remove documents from the index. """
+        with self._lock:
+            removed = {doc_id for doc_id in doc_ids if doc_id in self.lengths}
+            if not removed:
+                return
+            for term in list(self.postings):
+                docs = self.postings[term]
+                for doc_id in removed.intersection(docs):
+                    del docs[doc_id]
+                if not docs:
+                    del self.postings[term]
+            for doc_id in removed:
+                self._total_length -= self.lengths.pop(doc_id)
+
+    def search(self, query: str, k: int = 20,
+               allowed: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """ Rank documents for a query.
+            :param query: Query text
+            :param k: Number of results
+            :param allowed: Predicate restricting the ranked documents, e.g. a metadata filter
+            :return: (doc id, BM25 score) pairs, best first
+        """
+        with self._lock:
+            n = len(self.lengths)
+            if not n:
+                return []
+            avgdl = self._total_length / n
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avgdl)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            candidates = scores.items() if allowed is None else \
+                ((doc_id, score) for doc_id, score in scores.items() if allowed(doc_id))
+            return heapq.nlargest(k, candidates, key=lambda item: item[1])
+
+    def save(self, directory: str) -> None:
+        """ Write the index next to the vector store. """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.FILE_NAME)
+        with self._lock:
+            data = {"k1": self.k1, "b": self.b, "lengths": self.lengths, "postings": self.postings}
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        """ Read the index saved in a vector store directory (None if there is none). """
+        path = os.path.join(directory, cls.FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.postings.update(data["postings"])
+        index.lengths = data["lengths"]
+        index._total_length = sum(index.lengths.values())
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """ Fuse several rankings of doc ids with reciprocal rank fusion.
+        :param rankings: Doc ids of each ranking, best first
+        :param k: Rank constant damping the weight of the top ranks
+        :return: (doc id, fused score) pairs, best first
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,124 @@
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# Lines that look like section headings in regulations and SMPs: "CHAPTER IV",
+# "Regulation 104 - Blasting", "3.2 Hazard Identification", or short all-caps titles.
+HEADING_PATTERN = re.compile(
+    r"^[ \t]*("
+    r"(?:CHAPTER|PART|SECTION|SCHEDULE|ANNEXURE|APPENDIX|Chapter|Part|Section|Schedule|Annexure|Appendix)\b[^\n]{0,80}"
+    r"|(?:Regulation|REGULATION)\s+\d+[A-Z]?\b[^\n]{0,70}"
+    r"|\d+(?:\.\d+){0,3}\.?[ \t]+[A-Z][^\n.]{2,70}"
+    r"|[A-Z][A-Z0-9 ,&()/\-]{3,70}"
+    r")[ \t]*$",
+    re.MULTILINE,
+)
+
+
+@dataclass
+class Chunk:
+    """ A chunk of a document with its provenance. Offsets are character offsets in the full document text. """
+    text: str
+    page_number: Optional[int]
+    end_page: Optional[int]
+    start_offset: int
+    end_offset: int
+    section_title: Optional[str] = None
+
+
+def detect_headings(text: str) -> List[Tuple[int, str]]:
+    """ Find section headings in a block of text.
+        :param text: Text to scan
+        :return: List of (offset in text, heading) in order
+    """
+    return [(match.start(1), re.sub(r"\s+", " ", match.group(1)).strip()) for match in HEADING_PATTERN.finditer(text)]
+
+
+class StreamingChunker:
+    """ Splits a stream of pages into overlapping chunks without holding the whole document.
+        Pages are appended to a bounded window that is split with the same recursive splitter
+        as before; chunks that are complete are emitted and the window slides forward.
+        All state is local to a chunks() call, so one chunker can serve concurrent ingestions.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, window_size: Optional[int] = None):
+        """ :param chunk_size: Maximum size of a chunk
+            :param chunk_overlap: Overlap between consecutive chunks
+            :param window_size: Characters buffered before the window is split (defaults to 8 chunks)
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.window_size = window_size or 8 * chunk_size
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            add_start_index=True,
+        )
+
+    def chunks(self, pages: Iterable[Tuple[Optional[int], str]]) -> Iterator[Chunk]:
+        """ Stream chunks from (page number, page text) pairs given in document order.
+            :param pages: Page stream; page numbers may be None for documents without pages
+            :return: Generator of chunks with page number, offsets and section heading
+        """
+        buffer = ""
+        buffer_offset = 0            # document offset of buffer[0]
+        page_starts: List[int] = []  # document offsets where pages start
+        page_numbers: List[Optional[int]] = []
+        heading_offsets: List[int] = []
+        headings: List[str] = []
+
+        for page_number, page_text in pages:
+            page_offset = buffer_offset + len(buffer)
+            page_starts.append(page_offset)
+            page_numbers.append(page_number)
+            for offset, heading in detect_headings(page_text):
+                heading_offsets.append(page_offset + offset)
+                headings.append(heading)
+            buffer += page_text
+
+            if len(buffer) >= self.window_size:
+                keep_from = yield from self._emit(buffer, buffer_offset, page_starts, page_numbers,
+                                                  heading_offsets, headings, final=False)
+                buffer = buffer[keep_from:]
+                buffer_offset += keep_from
+
+                # Forget pages and headings before the window, keeping the ones still in effect
+                first_page = max(bisect_right(page_starts, buffer_offset) - 1, 0)
+                del page_starts[:first_page], page_numbers[:first_page]
+                first_heading = max(bisect_right(heading_offsets, buffer_offset) - 1, 0)
+                del heading_offsets[:first_heading], headings[:first_heading]
+
+        if buffer:
+            yield from self._emit(buffer, buffer_offset, page_starts, page_numbers,
+                                  heading_offsets, headings, final=True)
+
+    def _emit(self, buffer, buffer_offset, page_starts, page_numbers, heading_offsets, headings, final):
+        """ Split the window and yield the chunks that are complete.
+            :return: Position in the buffer from which the window must be kept
+        """
+        pieces = self._splitter.create_documents([buffer])
+        # Chunks close to the end of a non-final window may still grow with the next page
+        limit = len(buffer) if final else len(buffer) - self.chunk_size
+
+        keep_from = len(buffer)
+        for i, piece in enumerate(pieces):
+            start = piece.metadata["start_index"]
+            end = start + len(piece.page_content)
+            if end > limit and i > 0:
+                keep_from = start
+                break
+
+            doc_start, doc_end = buffer_offset + start, buffer_offset + end
+            heading_index = bisect_right(heading_offsets, doc_start) - 1
+            yield Chunk(
+                text=piece.page_content,
+                page_number=page_numbers[max(bisect_right(page_starts, doc_start) - 1, 0)],
+                end_page=page_numbers[max(bisect_right(page_starts, max(doc_end - 1, doc_start)) - 1, 0)],
+                start_offset=doc_start,
+                end_offset=doc_end,
+                section_title=headings[heading_index] if heading_index >= 0 else None,
+            )
+        return keep_from
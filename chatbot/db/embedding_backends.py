@@ -0,0 +1,114 @@
+import os
+import json
+import threading
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from chatbot.db.embedding_dispatcher import EmbeddingDispatcher
+
+GOOGLE = "google"
+SENTENCE_TRANSFORMERS = "sentence-transformers"
+ONNX = "onnx"
+
+# Model used by each backend when none is given
+DEFAULT_MODELS = {
+    GOOGLE: "models/embedding-001",
+    SENTENCE_TRANSFORMERS: "all-MiniLM-L6-v2",
+    ONNX: "all-MiniLM-L6-v2",
+}
+
+
+class LocalEmbeddings(Embeddings):
+    """ Embeddings computed in-process with a sentence-transformers model, on CPU by default.
+        Texts are encoded in batches; the ONNX backend runs the exported model with
+        onnxruntime for lower latency. Requires the sentence-transformers package
+        (and optimum/onnxruntime for the ONNX backend).
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", backend: str = "torch",
+                 batch_size: int = 64, device: str = "cpu", normalize: bool = True):
+        """ :param model_name: sentence-transformers model name or local path
+            :param backend: 'torch' or 'onnx'
+            :param batch_size: Number of texts encoded per forward pass
+            :param device: Device to run the model on
+            :param normalize: Whether to L2-normalize the embeddings
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("Local embeddings require the sentence-transformers package: "
+                              "pip install sentence-transformers") from e
+
+        kwargs = {"backend": backend} if backend != "torch" else {}
+        self.model = SentenceTransformer(model_name, device=device, **kwargs)
+        self.batch_size = batch_size
+        self.normalize = normalize
+        # One encode at a time: concurrent forward passes only oversubscribe the CPU
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                        normalize_embeddings=self.normalize, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts)
+
+
+def create_embeddings(backend: Optional[str] = None, model: Optional[str] = None) -> Embeddings:
+    """ Create the embedding model of a backend.
+        :param backend: 'google', 'sentence-transformers' or 'onnx' (defaults to EMBEDDING_BACKEND, then 'google')
+        :param model: Model name (defaults to EMBEDDING_MODEL, then the backend's default model)
+        :return: Embeddings instance
+    """
+    backend, model = resolve_backend(backend, model)
+    if backend == GOOGLE:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        # Batching, rate limiting and retries are configured through EMBEDDING_* environment variables
+        return EmbeddingDispatcher.from_env(GoogleGenerativeAIEmbeddings(model=model))
+    batch_size = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+    return LocalEmbeddings(model, backend="onnx" if backend == ONNX else "torch", batch_size=batch_size)
+
+
+def resolve_backend(backend: Optional[str] = None, model: Optional[str] = None):
+    """ Fill in the backend and model from the environment and the defaults.
+        EMBEDDING_MODEL only applies to the backend selected by EMBEDDING_BACKEND.
+        :return: (backend, model)
+    """
+    env_backend = (os.getenv("EMBEDDING_BACKEND") or GOOGLE).lower()
+    backend = (backend or env_backend).lower()
+    if backend not in DEFAULT_MODELS:
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+    env_model = os.getenv("EMBEDDING_MODEL") if backend == env_backend else None
+    return backend, model or env_model or DEFAULT_MODELS[backend]
+
+
+@dataclass
+class EmbeddingInfo:
+    """ Embedding model a vector store was built with, saved as embedding.json next to it. """
+    backend: str
+    model: str
+    FILE_NAME = "embedding.json"
+
+    @classmethod
+    def load(cls, directory: str) -> "EmbeddingInfo":
+        """ Read the embedding info of a store. Stores saved before it was recorded used Gemini. """
+        path = os.path.join(directory, cls.FILE_NAME)
+        if not os.path.exists(path):
+            return cls(backend=GOOGLE, model=DEFAULT_MODELS[GOOGLE])
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, self.FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f)
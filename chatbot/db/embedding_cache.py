@@ -0,0 +1,176 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from chatbot.db.embedding_dispatcher import embed_queries
+
+
+def normalize_text(text: str) -> str:
+    """ Normalize text before hashing so that whitespace-only differences share an embedding.
+        :param text: Raw text
+        :return: NFC-normalized text with collapsed whitespace
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def embedding_key(model_name: str, kind: str, text: str) -> str:
+    """ Content address of an embedding.
+        :param model_name: Embedding model name
+        :param kind: 'query' or 'document' (the two are embedded with different task types)
+        :param text: Text to embed
+        :return: Hex digest identifying the embedding
+    """
+    return hashlib.sha256(f"{model_name}\x00{kind}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """ A persistent embedding store for one embedding model.
+        Vectors are appended to a float32 matrix file that is read through a memory map,
+        and an SQLite offset index maps each key to its row. Writers serialize through
+        the SQLite write lock, so several processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        """ Open (or create) the cache for a model.
+            :param cache_dir: Root directory of the embedding cache
+            :param model_name: Embedding model name, used as the subdirectory name
+        """
+        self.directory = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, "offsets.sqlite"),
+                                     check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS offsets (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self.dim: Optional[int] = int(row[0]) if row else None
+        self._matrix: Optional[np.memmap] = None
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM offsets").fetchone()[0]
+
+    def _rows_on_disk(self) -> int:
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dim * 4)
+
+    def _view(self, min_rows: int) -> np.memmap:
+        """ Return a memory map covering at least min_rows rows, remapping after growth. """
+        if self._matrix is None or self._matrix.shape[0] < min_rows:
+            rows = self._rows_on_disk()
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._matrix
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """ Look up cached vectors.
+            :param keys: Embedding keys
+            :return: Mapping of the keys that were found to their vectors
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys or self.dim is None:
+            return {}
+
+        offsets = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                offsets.update(self._conn.execute(
+                    f"SELECT key, row FROM offsets WHERE key IN ({placeholders})", batch).fetchall())
+            if not offsets:
+                return {}
+            matrix = self._view(max(offsets.values()) + 1)
+            return {key: np.array(matrix[row]) for key, row in offsets.items()}
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        """ Append new vectors to the cache.
+            :param vectors: Mapping of embedding keys to vectors
+        """
+        if not vectors:
+            return
+
+        matrix = np.asarray(list(vectors.values()), dtype=np.float32)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dim is None:
+                    row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+                    self.dim = int(row[0]) if row else matrix.shape[1]
+                    self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (str(self.dim),))
+                if matrix.shape[1] != self.dim:
+                    raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match cache dimension {self.dim}")
+
+                # Rows are placed after whatever is on disk, even rows orphaned by an interrupted writer
+                first_row = self._rows_on_disk()
+                with open(self.vectors_path, "ab") as f:
+                    f.truncate(first_row * self.dim * 4)
+                    f.write(matrix.tobytes())
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO offsets (key, row) VALUES (?, ?)",
+                    [(key, first_row + i) for i, key in enumerate(vectors)]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class CachedEmbeddings(Embeddings):
+    """ An Embeddings wrapper that serves repeated texts from a persistent EmbeddingCache
+        and only sends unseen texts to the underlying embedding model.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache_dir: str = "data/cache/embeddings"):
+        """ Wrap an embedding model.
+            :param embeddings: Underlying embedding model
+            :param model_name: Name of the underlying model (part of the cache key)
+            :param cache_dir: Root directory of the embedding cache
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = EmbeddingCache(cache_dir, model_name)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _embed(self, texts: List[str], kind: str, embed_batches) -> List[List[float]]:
+        keys = [embedding_key(self.model_name, kind, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        # Embed each unseen text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.stats["misses"] += len(missing)
+        self.stats["hits"] += len(texts) - len(missing)
+
+        # Every completed batch is written straight away, so a failed run keeps its progress
+        missing_keys = list(missing.keys())
+        for start, new_vectors in (embed_batches(list(missing.values())) if missing else []):
+            fresh = dict(zip(missing_keys[start:start + len(new_vectors)], new_vectors))
+            self.cache.put_many(fresh)
+            found.update({key: np.asarray(vector, dtype=np.float32) for key, vector in fresh.items()})
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        embed_batches = getattr(self.embeddings, "embed_batches", None)
+        if embed_batches is None:
+            embed_batches = lambda batch: [(0, self.embeddings.embed_documents(batch))]
+        return self._embed(texts, "document", embed_batches)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query", lambda batch: [(0, [self.embeddings.embed_query(batch[0])])])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "query", lambda batch: [(0, embed_queries(self.embeddings, batch))])
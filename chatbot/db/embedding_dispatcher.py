@@ -0,0 +1,189 @@
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+class TokenBucket:
+    """ A thread-safe token bucket. Tokens refill continuously at a fixed rate up to
+        the bucket capacity, and acquire() blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """ :param rate: Tokens added per second
+            :param capacity: Maximum number of tokens (defaults to one second worth of tokens)
+        """
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+@lru_cache()
+def get_embedding_rate_limiter() -> TokenBucket:
+    """ Return the rate limiter shared by every embedding request of the process,
+        since the quota applies to the API key and not to a knowledge base.
+        The rate is taken from EMBEDDING_REQUESTS_PER_MINUTE (defaults to 1500).
+    """
+    return TokenBucket(rate=float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "1500")) / 60)
+
+
+def is_retryable(error: Exception) -> bool:
+    """ Whether an embedding error is a rate limit or a transient server error.
+        langchain_google_genai wraps the API errors, so the whole cause chain is checked.
+    """
+    while error is not None:
+        code = getattr(error, "code", None)
+        if code in (429, 500, 502, 503, 504):
+            return True
+        message = str(error)
+        if any(marker in message for marker in ("429", "Resource has been exhausted", "quota", "503", "Deadline")):
+            return True
+        error = error.__cause__
+    return False
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """ Embed several queries in as few requests as the model allows. Models with an
+        embed_queries method encode them together; others get one embed_query per text.
+    """
+    batch = getattr(embeddings, "embed_queries", None)
+    if batch is not None:
+        return batch(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+class EmbeddingDispatcher(Embeddings):
+    """ Sends embedding requests in batches of a fixed size, with a bounded number of
+        batches in flight, a shared token-bucket rate limit and retry with exponential
+        backoff on rate-limit and transient errors.
+        embed_batches() yields batches as they complete, which lets CachedEmbeddings
+        checkpoint every finished batch so a failed ingest resumes where it stopped.
+    """
+
+    def __init__(self, embeddings: Embeddings, batch_size: int = 100, max_in_flight: int = 4,
+                 rate_limiter: Optional[TokenBucket] = None, max_retries: int = 5,
+                 backoff: float = 1.0, max_backoff: float = 60.0):
+        """ :param embeddings: Underlying embedding model
+            :param batch_size: Number of texts per embedding request
+            :param max_in_flight: Maximum number of concurrent batch requests
+            :param rate_limiter: Token bucket consumed once per request (defaults to the shared one)
+            :param max_retries: Retries of a batch before the error is raised
+            :param backoff: Initial backoff in seconds, doubled after every retry
+            :param max_backoff: Upper bound of the backoff in seconds
+        """
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = rate_limiter or get_embedding_rate_limiter()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, embeddings: Embeddings) -> "EmbeddingDispatcher":
+        """ Build a dispatcher configured by EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_IN_FLIGHT
+            and EMBEDDING_MAX_RETRIES.
+        """
+        return cls(
+            embeddings,
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "100")),
+            max_in_flight=int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4")),
+            max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", "5")),
+        )
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                                    thread_name_prefix="embedding")
+            return self._executor
+
+    def _call(self, fn, *args):
+        """ Run one embedding request under the rate limit, retrying retryable errors. """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            self.stats["requests"] += 1
+            try:
+                return fn(*args)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    self.stats["failures"] += 1
+                    raise
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logging.warning(f"Embedding request failed ({e}), retrying in {delay:.1f}s")
+                self.stats["retries"] += 1
+                time.sleep(delay)
+
+    def embed_batches(self, texts: List[str]) -> Iterator[Tuple[int, List[List[float]]]]:
+        """ Embed texts batch by batch.
+            :param texts: Texts to embed
+            :return: Generator of (index of the first text, vectors) in completion order.
+                     If a batch fails, the batches that completed are yielded before the error is raised.
+        """
+        starts = list(range(0, len(texts), self.batch_size))
+        pending = {}
+        error = None
+        while pending or (starts and error is None):
+            while starts and error is None and len(pending) < self.max_in_flight:
+                start = starts.pop(0)
+                batch = texts[start:start + self.batch_size]
+                pending[self.executor.submit(self._call, self.embeddings.embed_documents, batch)] = start
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                start = pending.pop(future)
+                try:
+                    vectors = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                yield start, vectors
+
+        if error is not None:
+            raise error
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start, batch_vectors in self.embed_batches(texts):
+            vectors[start:start + len(batch_vectors)] = batch_vectors
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(self.embeddings.embed_query, text)
+
+    def _query_batch(self, texts: List[str]) -> List[List[float]]:
+        # Google embeddings take a task type, so a batch of queries is one batchEmbedContents request
+        if hasattr(self.embeddings, "task_type"):
+            return self.embeddings.embed_documents(texts, task_type=self.embeddings.task_type or "RETRIEVAL_QUERY")
+        return embed_queries(self.embeddings, texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """ Embed queries in batches, one rate-limited request per batch. """
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._call(self._query_batch, texts[start:start + self.batch_size]))
+        return vectors
@@ -0,0 +1,128 @@
+import os
+import logging
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+from PyPDF2 import PdfReader
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """ Worker: extract the text of pages [start, end) of a PDF.
+        :return: List of (page number, text) with 1-based page numbers
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        reader = PdfReader(pdf_file)
+        return [(number + 1, reader.pages[number].extract_text() or "") for number in range(start, end)]
+
+
+def _extract_table_range(pdf_path: str, start: int, end: int) -> List[pd.DataFrame]:
+    """ Worker: extract the tables of pages [start, end) of a PDF with tabula.
+        tabula runs its JVM in-process through jpype, so each worker process starts
+        the JVM once and keeps it warm for every later task.
+    """
+    import tabula
+
+    try:
+        return tabula.read_pdf(
+            pdf_path,
+            pages=f"{start + 1}-{end}",
+            multiple_tables=True,
+            guess=True,
+            encoding='utf-8',
+            pandas_options={
+                'header': 0,
+                'dtype': str,
+                'na_values': ['']
+            }
+        ) or []
+    except Exception as e:
+        logging.error(f"Error extracting tables from pages {start + 1}-{end} of {pdf_path}: {str(e)}")
+        return []
+
+
+@lru_cache()
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """ Return the process pool shared by every PDF extraction.
+        The number of workers is taken from PDF_EXTRACTION_WORKERS (defaults to the CPU count).
+    """
+    return ProcessPoolExecutor(max_workers=int(os.getenv("PDF_EXTRACTION_WORKERS", os.cpu_count() or 1)))
+
+
+class PendingExtraction:
+    """ Extraction of one PDF that is running on the pool. Page ranges complete in any
+        order, but pages() yields them in document order as soon as they are available.
+    """
+
+    def __init__(self, pdf_path: str, text_futures: List[Future], table_futures: List[Future]):
+        self.pdf_path = pdf_path
+        self._text_futures = text_futures
+        self._table_futures = table_futures
+
+    def pages(self) -> Iterator[Tuple[int, str]]:
+        """ Stream (page number, text) in page order.
+            Page ranges are released once consumed, so the stream can only be read once.
+        """
+        while self._text_futures:
+            yield from self._text_futures.pop(0).result()
+
+    def text(self) -> str:
+        return "".join(page_text for _, page_text in self.pages())
+
+    def table(self) -> pd.DataFrame:
+        """ All tables of the document combined into one DataFrame (empty if none). """
+        tables = [table for future in self._table_futures for table in future.result()]
+        if not tables:
+            return pd.DataFrame()
+        return pd.concat(tables, ignore_index=True) if len(tables) > 1 else tables[0]
+
+
+class PdfExtractor:
+    """ Parallel PDF text and table extraction. Large PDFs are split into page ranges
+        that are extracted on a shared process pool, so bulk loads scale with the number of cores.
+    """
+
+    def __init__(self, pages_per_task: int = 16, executor: Optional[Executor] = None):
+        """ :param pages_per_task: Number of pages extracted per worker task
+            :param executor: Executor to run the tasks on (defaults to the shared process pool)
+        """
+        self.pages_per_task = pages_per_task
+        self._executor = executor
+
+    @property
+    def executor(self) -> Executor:
+        return self._executor or get_extraction_pool()
+
+    def _ranges(self, pdf_path: str) -> List[Tuple[int, int]]:
+        with open(pdf_path, 'rb') as pdf_file:
+            page_count = len(PdfReader(pdf_file).pages)
+        return [(start, min(start + self.pages_per_task, page_count))
+                for start in range(0, page_count, self.pages_per_task)]
+
+    def submit(self, pdf_path: str, tables: bool = False) -> PendingExtraction:
+        """ Start extracting a PDF in the background.
+            :param pdf_path: Path to the PDF file
+            :param tables: Whether to extract tables as well as text
+            :return: Handle to stream the pages and collect the tables
+        """
+        if not isinstance(pdf_path, str):
+            raise ValueError("Expected a string path for the PDF file.")
+
+        ranges = self._ranges(pdf_path)
+        text_futures = [self.executor.submit(_extract_page_range, pdf_path, start, end) for start, end in ranges]
+        table_futures = [self.executor.submit(_extract_table_range, pdf_path, start, end)
+                         for start, end in ranges] if tables else []
+        return PendingExtraction(pdf_path, text_futures, table_futures)
+
+    def iter_pages(self, pdf_path: str) -> Iterator[Tuple[int, str]]:
+        """ Stream (page number, text) of a PDF in page order. """
+        return self.submit(pdf_path).pages()
+
+    def extract_tables(self, pdf_path: str) -> pd.DataFrame:
+        """ Extract and combine the tables of a PDF. """
+        if not isinstance(pdf_path, str):
+            raise ValueError("Expected a string path for the PDF file.")
+        ranges = self._ranges(pdf_path)
+        futures = [self.executor.submit(_extract_table_range, pdf_path, start, end) for start, end in ranges]
+        return PendingExtraction(pdf_path, [], futures).table()
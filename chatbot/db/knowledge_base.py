@@ -1,14 +1,27 @@
 import os
-from typing import List, Union, Optional, Tuple
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from typing import Iterable, Iterator, List, Union, Optional, Tuple
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import FAISS
 import google.generativeai as genai
 from dotenv import load_dotenv
 from dataclasses import dataclass
 import pandas as pd
-import tabula
+import numpy as np
+import faiss
+import threading
+from langchain_core.documents import Document
+from chatbot.db.embedding_cache import CachedEmbeddings
+from chatbot.db.embedding_dispatcher import embed_queries
+from chatbot.db.embedding_backends import GOOGLE, EmbeddingInfo, create_embeddings, resolve_backend
+from chatbot.db.manifest import IngestionManifest, ChunkRecord, file_sha256, text_sha256
+from chatbot.db.extraction import PdfExtractor, PendingExtraction
+from chatbot.db.chunker import StreamingChunker
+from chatbot.db.ann_index import IndexSpec, delete_from_store, ensure_index, search_positions
+from chatbot.db.mmap_store import open_store, read_generation, save_store, store_exists, store_lock
+from chatbot.db.bm25 import BM25Index, reciprocal_rank_fusion
+from chatbot.db.metadata_index import MetadataIndex
+from chatbot.db.reranker import CrossEncoderReranker, get_reranker
+from datetime import datetime
 import logging
 
 @dataclass
@@ -17,45 +30,79 @@ class DocumentMetadata:
     source: str
     document_type: str
     section_title: Optional[str] = None
+    page_number: Optional[int] = None
+    end_page: Optional[int] = None
+    start_offset: Optional[int] = None
+    end_offset: Optional[int] = None
+    timestamp: Optional[str] = None
 
 class KnowledgeBase:
     """ A class to manage knowledge base creation and storage using vector embeddings.
         Supports PDF, text files, and tabular data, and uses Faiss as the vector store.
+        Ingestion is incremental: an IngestionManifest saved next to the vector store
+        records what is indexed, so unchanged documents are skipped and only changed
+        chunks are re-embedded. The FAISS index can be flat or approximate (IVF-Flat,
+        IVF-PQ, HNSW), see IndexSpec. Embeddings are requested in rate-limited batches and
+        checkpointed in the embedding cache, so an interrupted ingest resumes from the
+        last completed batch.
     """
+    # Default location of the saved vector store
+    default_store_path = "data/vector_db/faiss_index"
+    # Whether tables extracted from PDFs are indexed as additional chunks
+    include_tables = False
+    # Whether queries fuse BM25 and vector results (reciprocal rank fusion)
+    hybrid_search = True
+    # Number of candidates retrieved for the reranker to choose top_k from
+    rerank_candidates = 20
     
-    def __init__(self, api_key: Optional[str] = None, embedding_model: str = "models/embedding-001",
-                 chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, api_key: Optional[str] = None, embedding_model: Optional[str] = None,
+                 chunk_size: int = 1000, chunk_overlap: int = 200,
+                 embedding_cache_dir: Optional[str] = "data/cache/embeddings",
+                 embedding_backend: Optional[str] = None, embeddings: Optional[Embeddings] = None,
+                 index_spec: Optional[IndexSpec] = None, reranker: Optional[CrossEncoderReranker] = None):
         """ Initialize the KnowledgeBase with configuration parameters.
             :param api_key: Google API key (optional, can be loaded from .env)
-            :param embedding_model: Embedding model to use
+            :param embedding_model: Embedding model to use (defaults to the backend's model)
             :param chunk_size: Size of text chunks for embedding
             :param chunk_overlap: Overlap between text chunks
+            :param embedding_cache_dir: Directory of the persistent embedding cache (None disables it)
+            :param embedding_backend: 'google', 'sentence-transformers' or 'onnx' (defaults to EMBEDDING_BACKEND)
+            :param embeddings: Embedding model to use instead of creating one for the backend
+            :param index_spec: FAISS index type and search parameters (defaults to the VECTOR_INDEX* settings)
+            :param reranker: Cross-encoder reranking the retrieved chunks (defaults to the RERANK* settings)
         """
         load_dotenv()
+        self.embedding_backend, self.embedding_model = resolve_backend(embedding_backend, embedding_model)
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
+        if self.embedding_backend == GOOGLE and embeddings is None and not self.api_key:
             raise ValueError("Google API Key must be provided either as argument or in .env file")
         
-        genai.configure(api_key=self.api_key)
-        self.embedding_model = embedding_model
-        self.embeddings = GoogleGenerativeAIEmbeddings(model=self.embedding_model)
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+        self.embeddings = embeddings or create_embeddings(self.embedding_backend, self.embedding_model)
+        if embedding_cache_dir:
+            self.embeddings = CachedEmbeddings(self.embeddings, self.embedding_model, cache_dir=embedding_cache_dir)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.index_spec = index_spec or IndexSpec.from_env()
+        self.reranker = reranker or get_reranker()
         self.vector_store = None
+        self.manifest = IngestionManifest()
+        self.bm25 = BM25Index()
+        self._metadata_index: Optional[MetadataIndex] = None
+        # Store directory and generation the in-memory store was loaded from or last saved as
+        self._loaded_from: Optional[Tuple[str, int]] = None
+        self.pdf_extractor = PdfExtractor()
+        self.chunker = StreamingChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._ingest_lock = threading.RLock()
 
     def _extract_text_from_pdf(self, pdf_path: Union[str, object]) -> Tuple[str, DocumentMetadata]:
         """ Extract text and metadata from a PDF file.
+            Page ranges are extracted in parallel on the shared extraction pool.
             :param pdf_path: Path to PDF file or file-like object
             :return: Extracted text and document metadata 
         """
-        if isinstance(pdf_path, str):
-            with open(pdf_path, 'rb') as pdf_file:
-                pdf_reader = PdfReader(pdf_file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() or ""
-        else:
-            raise ValueError("Expected a string path for the PDF file.")
+        text = self.pdf_extractor.submit(pdf_path).text()
 
         return text, DocumentMetadata(source=pdf_path, document_type='pdf')
 
@@ -73,31 +120,16 @@ class KnowledgeBase:
 
     def _extract_table_from_pdf(self, pdf_path: str) -> Tuple[pd.DataFrame, DocumentMetadata]:
         """ Extract tabular data from a PDF file with improved error handling.
+            Page ranges are extracted in parallel by workers that keep the tabula JVM warm.
             :param pdf_path: Path to PDF file 
             :return: Extracted tabular data and document metadata 
         """
         try:
-            # Add more robust table extraction options
-            tables = tabula.read_pdf(
-                pdf_path, 
-                pages='all',  # Extract from all pages
-                multiple_tables=True,  # Allow multiple tables
-                guess=True,  # Try to guess table areas
-                encoding='utf-8',
-                pandas_options={
-                    'header': 0,
-                    'dtype': str,
-                    'na_values': ['']  # Treat empty strings as NaN
-                }
-            )
+            combined_table = self.pdf_extractor.extract_tables(pdf_path)
             
             # Check if tables were extracted
-            if not tables or len(tables) == 0:
+            if combined_table.empty:
                 logging.warning(f"No tables found in PDF: {pdf_path}")
-                return pd.DataFrame(), DocumentMetadata(source=pdf_path, document_type='pdf')
-            
-            # Combine multiple tables if found
-            combined_table = pd.concat(tables, ignore_index=True) if len(tables) > 1 else tables[0]
             
             return combined_table, DocumentMetadata(source=pdf_path, document_type='pdf')
         
@@ -108,122 +140,326 @@ class KnowledgeBase:
             # Provide a fallback
             return pd.DataFrame(), DocumentMetadata(source=pdf_path, document_type='pdf')
 
-    def _split_text(self, text: str) -> List[Tuple[str, DocumentMetadata]]:
+    def _split_pages(self, pages: Iterable[Tuple[Optional[int], str]], source: str,
+                     document_type: str) -> Iterator[Tuple[str, dict]]:
+        """ Split a stream of pages into chunks and associate metadata with each chunk.
+            :param pages: (page number, text) pairs in document order
+            :param source: Source name recorded in the chunk metadata
+            :param document_type: Type of the document
+            :return: Generator of text chunks with their page, offsets and section title
+        """
+        for chunk in self.chunker.chunks(pages):
+            yield chunk.text, vars(DocumentMetadata(source=source,
+                                                    document_type=document_type,
+                                                    section_title=chunk.section_title,
+                                                    page_number=chunk.page_number,
+                                                    end_page=chunk.end_page,
+                                                    start_offset=chunk.start_offset,
+                                                    end_offset=chunk.end_offset))
+
+    def _split_text(self, text: str, source: str, document_type: str) -> List[Tuple[str, dict]]:
         """ Split text into chunks and associate metadata with each chunk.
             :param text: Input text to be split 
+            :param source: Source name recorded in the chunk metadata
+            :param document_type: Type of the document
             :return: List of text chunks and their associated metadata 
         """
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap
-        )
-        
-        chunks = text_splitter.split_text(text)
-        
-        return [(chunk, vars(DocumentMetadata(source=self.current_doc_source,
-                                               document_type=self.current_doc_type))) for chunk in chunks]
+        return list(self._split_pages([(None, text)], source, document_type))
+
+    def _document_chunks(self, doc: Union[str, object], document_type: str, source: str,
+                         extraction: Optional[PendingExtraction] = None) -> List[Tuple[str, dict]]:
+        """ Extract a document and split it into chunks with metadata.
+            PDF pages are chunked as they arrive from the extraction pool, so chunking
+            overlaps extraction. The chunk list is built up front: incremental ingestion
+            matches every chunk hash against the manifest before anything is embedded.
+            :param doc: Document path or file-like object
+            :param document_type: Type of the document ('pdf' or 'txt')
+            :param source: Source name recorded in the chunk metadata
+            :param extraction: Extraction of the PDF already running on the pool, if any
+            :return: List of text chunks and their metadata
+        """
+        if document_type.lower() == 'pdf':
+            extraction = extraction or self.pdf_extractor.submit(doc, tables=self.include_tables)
+            text_chunks = list(self._split_pages(extraction.pages(), source, 'pdf'))
+        elif document_type.lower() == 'txt':
+            text, metadata = self._extract_text_from_txt(doc)
+            text_chunks = self._split_text(text, source, metadata.document_type)
+        else:
+            raise ValueError(f"Unsupported document type: {document_type}")
+
+        if self.include_tables and document_type.lower() == 'pdf':
+            table = extraction.table()
+            if not table.empty:
+                table_text = table.to_string(index=False)  # Convert DataFrame to string
+                text_chunks.append((table_text, vars(DocumentMetadata(source=source, document_type='pdf',
+                                                                      section_title="Tables"))))
+
+        return text_chunks
+
+    def _ingest(self, documents: Union[List[str], List[object]], document_type: str,
+                source_names: Optional[List[str]] = None) -> dict:
+        """ Index documents into the vector store, skipping unchanged documents,
+            embedding only new chunks and deleting chunks that disappeared.
+            :param documents: List of document paths or file-like objects
+            :param document_type: Type of documents ('pdf' or 'txt')
+            :param source_names: Logical names of the documents (defaults to their paths)
+            :return: Summary of the ingestion
+        """
+        if source_names is not None and len(source_names) != len(documents):
+            raise ValueError("source_names must have one entry per document")
+
+        summary = {"skipped": [], "updated": [], "added_chunks": 0, "removed_chunks": 0}
+        pending = []
+        for i, doc in enumerate(documents):
+            source = source_names[i] if source_names else (doc if isinstance(doc, str) else getattr(doc, 'name', repr(doc)))
+            file_hash = file_sha256(doc)
+
+            record = self.manifest.get(source)
+            if record is not None and record.file_hash == file_hash:
+                summary["skipped"].append(source)
+                continue
+            duplicate_of = self.manifest.find_source_by_hash(file_hash)
+            if record is None and duplicate_of is not None:
+                logging.info(f"Skipping {source}: same content as already indexed {duplicate_of}")
+                summary["skipped"].append(source)
+                continue
+            pending.append((doc, source, file_hash))
+
+        ingested_at = datetime.now().isoformat(timespec='seconds')
+
+        # Start extracting every changed PDF up front so the pool works on all of them in parallel
+        extractions = {}
+        if document_type.lower() == 'pdf':
+            extractions = {source: self.pdf_extractor.submit(doc, tables=self.include_tables)
+                           for doc, source, _ in pending}
+
+        for doc, source, file_hash in pending:
+            chunks = self._document_chunks(doc, document_type, source, extractions.get(source))
+            chunk_hashes = [text_sha256(text) for text, _ in chunks]
+            ids, stale_ids = self.manifest.plan(source, chunk_hashes)
+
+            new_positions = [j for j, vector_id in enumerate(ids) if vector_id is None]
+            reused_positions = [j for j, vector_id in enumerate(ids) if vector_id is not None]
+            if reused_positions and self.vector_store is not None:
+                self._rewrite_metadata([ids[j] for j in reused_positions],
+                                       [dict(chunks[j][1], timestamp=ingested_at) for j in reused_positions])
+            for j in new_positions:
+                ids[j] = text_sha256(f"{source}\x00{file_hash}\x00{j}")
+            if new_positions:
+                texts = [chunks[j][0] for j in new_positions]
+                metadatas = [dict(chunks[j][1], timestamp=ingested_at) for j in new_positions]
+                new_ids = [ids[j] for j in new_positions]
+                if self.vector_store is None:
+                    self.vector_store = FAISS.from_texts(texts, embedding=self.embeddings,
+                                                         metadatas=metadatas, ids=new_ids)
+                else:
+                    self.vector_store.add_texts(texts, metadatas=metadatas, ids=new_ids)
+                self.bm25.add_many(zip(new_ids, texts))
+                if self._metadata_index is not None:
+                    self._metadata_index.append(new_ids, metadatas)
+            if stale_ids and self.vector_store is not None:
+                delete_from_store(self.vector_store, stale_ids)
+                self.bm25.remove_many(stale_ids)
+                if self._metadata_index is not None:
+                    self._metadata_index.remove(stale_ids)
+
+            self.manifest.record(source, file_hash, document_type.lower(),
+                                 [ChunkRecord(hash=h, vector_id=v) for h, v in zip(chunk_hashes, ids)])
+            summary["updated"].append(source)
+            summary["added_chunks"] += len(new_positions)
+            summary["removed_chunks"] += len(stale_ids)
+
+        if self.vector_store is not None:
+            ensure_index(self.vector_store, self.index_spec)
+        return summary
+
+    def _rewrite_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        """ Replace the docstore metadata of unchanged chunks with that of the new version of
+            their document, keeping their embeddings. Text that moved to another page or
+            section is then cited with its new location.
+            :param ids: Vector ids of the reused chunks
+            :param metadatas: New metadata of each chunk
+        """
+        docstore = self.vector_store.docstore
+        changed = {}
+        for doc_id, metadata in zip(ids, metadatas):
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document) and doc.metadata != metadata:
+                changed[doc_id] = Document(page_content=doc.page_content, metadata=metadata, id=doc_id)
+        if not changed:
+            return
+        docstore.delete(list(changed))
+        docstore.add(changed)
+        if self._metadata_index is not None:
+            self._metadata_index.update(list(changed), [doc.metadata for doc in changed.values()])
 
     def create_vector_store(self, documents: Union[List[str], List[object]], 
-                             document_type: str = 'pdf', save_path: str = "data/vector_db/faiss_index") -> FAISS:
+                             document_type: str = 'pdf', save_path: Optional[str] = None,
+                             source_names: Optional[List[str]] = None) -> FAISS:
         """ Create a vector store from documents.
             :param documents: List of document paths or file-like objects 
             :param document_type: Type of documents ('pdf', 'txt', or 'table') 
             :param save_path: Path to save the vector store 
+            :param source_names: Logical names of the documents (defaults to their paths)
             :return: FAISS vector store 
         """
-        all_text_chunks = []
-        all_tables = []
-        
-        for doc in documents:
-            if document_type.lower() == 'pdf':
-                text, metadata = self._extract_text_from_pdf(doc)
-                table, table_metadata = self._extract_table_from_pdf(doc)
-                
-                if table.shape[0] > 0:
-                    all_tables.append((table, table_metadata))
-            
-            elif document_type.lower() == 'txt':
-                text, metadata = self._extract_text_from_txt(doc)
-            
-            else:
-                raise ValueError(f"Unsupported document type: {document_type}")
-            
-            self.current_doc_source = metadata.source
-            self.current_doc_type = metadata.document_type
-            
-            text_chunks = self._split_text(text)
-            all_text_chunks.extend(text_chunks)
-
-        self.vector_store = FAISS.from_texts(
-            [chunk[0] for chunk in all_text_chunks],
-            embedding=self.embeddings,
-            metadatas=[chunk[1] for chunk in all_text_chunks]
-        )
+        with self._ingest_lock:
+            self.vector_store = None
+            self.manifest = IngestionManifest()
+            self.bm25 = BM25Index()
+            self._metadata_index = None
+            self._loaded_from = None
+            self._ingest(documents, document_type, source_names)
         
         return self.vector_store
 
-    def load_vector_store(self, load_path: str = "data/vector_db/faiss_index") -> FAISS:
+    def load_vector_store(self, load_path: Optional[str] = None) -> FAISS:
         """ Load an existing vector store.
             :param load_path: Path to the saved vector store 
             :return: Loaded FAISS vector store 
         """
-        self.vector_store = FAISS.load_local(load_path,
-                                              self.embeddings,
-                                              allow_dangerous_deserialization=True)
+        load_path = load_path or self.default_store_path
+        generation = read_generation(load_path)
+        info = EmbeddingInfo.load(load_path)
+        if (info.backend, info.model) != (self.embedding_backend, self.embedding_model):
+            raise ValueError(f"Vector store {load_path} was embedded with {info.backend}:{info.model}, "
+                             f"not {self.embedding_backend}:{self.embedding_model}. "
+                             f"Re-embed it with python -m chatbot.db.migrate_embeddings")
+        self.vector_store = open_store(load_path, self.embeddings)
+        ensure_index(self.vector_store, self.index_spec)
+        self.manifest = IngestionManifest.load(load_path)
+        self._metadata_index = None
+        self._loaded_from = (os.path.realpath(load_path), generation)
+
+        # Rebuild the lexical index when it is missing or out of sync with the vectors
+        self.bm25 = BM25Index.load(load_path)
+        if self.bm25 is None or len(self.bm25) != len(self.vector_store.index_to_docstore_id):
+            self.bm25 = BM25Index()
+            doc_ids = list(self.vector_store.index_to_docstore_id.values())
+            self.bm25.add_many((doc_id, self.vector_store.docstore.search(doc_id).page_content) for doc_id in doc_ids)
         
         return self.vector_store
 
     def add_documents(self, documents: List[str], document_type: str = 'pdf',
-                      save_path: str = "data/vector/faiss_index") -> None:
+                      save_path: Optional[str] = None, source_names: Optional[List[str]] = None) -> dict:
         """ Add new documents to an existing vector store or create a new one.
+            Documents whose content is already indexed are skipped, and for changed
+            documents only the changed chunks are embedded.
             :param documents: List of document paths 
             :param document_type: Type of documents ('pdf', 'txt', or 'table') 
             :param save_path: Path to save/update the vector store 
+            :param source_names: Logical names of the documents, e.g. the uploaded file names
+            :return: Summary with the skipped and updated sources and the chunk counts
         """
-        all_text_chunks = []
-        
-        for doc in documents:
-            if document_type.lower() == 'pdf':
-                text, metadata = self._extract_text_from_pdf(doc)
-                self.current_doc_source = metadata.source
-                self.current_doc_type = metadata.document_type
-                
-                text_chunks = self._split_text(text)
-                all_text_chunks.extend(text_chunks)
-                
-
-            elif document_type.lower() == 'txt':
-                text, metadata = self._extract_text_from_txt(doc)
-                self.current_doc_source = metadata.source
-                self.current_doc_type = metadata.document_type
-                
-                text_chunks = self._split_text(text)
-                all_text_chunks.extend(text_chunks)
-
-            else:
-                raise ValueError(f"Unsupported document type: {document_type}")
+        save_path = save_path or self.default_store_path
+        # Other processes (API workers, job workers) ingest into the same store, so the
+        # load, ingest and save run under the store's lock, starting from its latest generation
+        with self._ingest_lock, store_lock(save_path):
+            if store_exists(save_path) and (self.vector_store is None or self._is_outdated(save_path)):
+                self.load_vector_store(save_path)
 
-        if self.vector_store is None:
-            self.create_vector_store(documents, document_type, save_path)
+            summary = self._ingest(documents, document_type, source_names)
+
+            if self.vector_store is not None and summary["updated"]:
+                save_store(self.vector_store, save_path)
+                self.bm25.save(save_path)
+                self.manifest.save(save_path)
+                EmbeddingInfo(self.embedding_backend, self.embedding_model).save(save_path)
+                self._loaded_from = (os.path.realpath(save_path), read_generation(save_path))
         
+        return summary
+
+    def _is_outdated(self, store_path: str) -> bool:
+        """ Whether another process saved the store at store_path since this one loaded or saved it. """
+        if self._loaded_from is None or self._loaded_from[0] != os.path.realpath(store_path):
+            return False
+        return read_generation(store_path) != self._loaded_from[1]
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        """ Filter index over the chunk metadata, built on first use and then kept in sync by ingestion. """
+        if self._metadata_index is None or len(self._metadata_index) != len(self.vector_store.index_to_docstore_id):
+            self._metadata_index = MetadataIndex.from_store(self.vector_store)
+        return self._metadata_index
+
+    def _dense_search(self, queries: List[str], k: int, positions: Optional[np.ndarray] = None) -> List[List[str]]:
+        """ Ids of the k nearest chunks to each query, found with one batched embedding call
+            and one matrix search, optionally restricted to some vector positions.
+        """
+        # Queries are embedded like similarity_search does, with the store's own embedding model
+        embeddings = self.vector_store.embeddings or self.embeddings
+        vectors = np.array(embed_queries(embeddings, queries), dtype=np.float32).reshape(len(queries), -1)
+        if self.vector_store._normalize_L2:
+            faiss.normalize_L2(vectors)
+        if positions is None:
+            _, found = self.vector_store.index.search(vectors, k)
         else:
-            self.vector_store.add_texts(
-                [chunk[0] for chunk in all_text_chunks],
-                metadatas=[chunk[1] for chunk in all_text_chunks]
-            )
-        
-        self.vector_store.save_local(save_path)
+            _, found = search_positions(self.vector_store.index, vectors, k, positions)
+        return [[self.vector_store.index_to_docstore_id[i] for i in row if i != -1] for row in found]
 
-    def query_vector_store(self, query: str, top_k: int = 5) -> List[Tuple[str, DocumentMetadata]]:
+    def query_many(self, queries: List[str], top_k: int = 5, hybrid: Optional[bool] = None,
+                   filters: Optional[dict] = None,
+                   rerank: Optional[bool] = None) -> List[List[Tuple[str, DocumentMetadata]]]:
+        """ Query the vector store for several strings at once. The queries are embedded in
+            one batch and searched as one matrix, and repeated queries are only searched once,
+            so bulk callers such as a whole SMP pay for a single retrieval pass.
+            With hybrid search, BM25 and vector rankings are fused so that exact terms such as
+            regulation numbers and equipment names are found without raising top_k. With a
+            reranker, rerank_candidates chunks are retrieved and the cross-encoder keeps the best top_k.
+            :param queries: The query strings to search for in the vector store
+            :param top_k: Number of top results to return per query (default is 5)
+            :param hybrid: Whether to fuse BM25 and vector results (defaults to hybrid_search)
+            :param filters: Metadata conditions the chunks must match, e.g. {"document_type": "pdf"},
+                            {"source": ["cmr.pdf"]} or {"timestamp": {"gte": datetime.now() - timedelta(hours=24)}}
+            :param rerank: Whether to rerank the retrieved chunks (defaults to whether a reranker is configured)
+            :return: For each query, the most similar text chunks and their associated metadata
+        """
+        if self.vector_store is None:
+            raise ValueError("Vector store is not loaded or created. Please create/load the vector store first.")
+        unique = list(dict.fromkeys(queries))
+        if not unique:
+            return []
+
+        hybrid = (self.hybrid_search if hybrid is None else hybrid) and len(self.bm25) > 0
+        reranker = self.reranker if rerank is not False else None
+        if rerank and reranker is None:
+            raise ValueError("Reranking was requested but no reranker is configured")
+        retrieve_k = max(top_k, self.rerank_candidates) if reranker else top_k
+        fetch_k = max(4 * retrieve_k, 20) if hybrid else retrieve_k
+        positions, allowed = None, None
+        if filters:
+            metadata_index = self.metadata_index
+            mask = metadata_index.mask(filters)
+            if not mask.any():
+                return [[] for _ in queries]
+            positions = np.flatnonzero(mask)
+            allowed = lambda doc_id: doc_id in metadata_index.position_of and mask[metadata_index.position_of[doc_id]]
+
+        ranked = {}
+        for query, ranked_ids in zip(unique, self._dense_search(unique, fetch_k, positions)):
+            if hybrid:
+                lexical_ids = [doc_id for doc_id, _ in self.bm25.search(query, fetch_k, allowed=allowed)]
+                ranked_ids = [doc_id for doc_id, _ in reciprocal_rank_fusion([ranked_ids, lexical_ids])]
+            ranked[query] = ranked_ids[:retrieve_k]
+
+        documents = {doc_id: self.vector_store.docstore.search(doc_id)
+                     for doc_id in dict.fromkeys(doc_id for ids in ranked.values() for doc_id in ids)}
+        results = {query: [(documents[doc_id].page_content, documents[doc_id].metadata)
+                           for doc_id in ids if isinstance(documents[doc_id], Document)]
+                   for query, ids in ranked.items()}
+        if reranker:
+            results = {query: reranker.rerank(query, chunks, top_k) for query, chunks in results.items()}
+        return [list(results[query]) for query in queries]
+
+    def query_vector_store(self, query: str, top_k: int = 5, hybrid: Optional[bool] = None,
+                           filters: Optional[dict] = None,
+                           rerank: Optional[bool] = None) -> List[Tuple[str, DocumentMetadata]]:
         """ Query the vector store for a particular string.
             :param query: The query string to search for in the vector store 
             :param top_k: Number of top results to return (default is 5) 
+            :param hybrid: Whether to fuse BM25 and vector results (defaults to hybrid_search)
+            :param filters: Metadata conditions the chunks must match (see query_many)
+            :param rerank: Whether to rerank the retrieved chunks (defaults to whether a reranker is configured)
             :return: A list of most similar text chunks and their associated metadata 
         """
-        
-        if self.vector_store is None:
-            raise ValueError("Vector store is not loaded or created. Please create/load the vector store first.")
-        
-        results = self.vector_store.similarity_search(query, k=top_k)
-        
-        return [(result.page_content, result.metadata) for result in results]
\ No newline at end of file
+        return self.query_many([query], top_k=top_k, hybrid=hybrid, filters=filters, rerank=rerank)[0]
@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+from collections import defaultdict
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+
+def file_sha256(document: Union[str, object]) -> str:
+    """ Hash the raw bytes of a document.
+        :param document: Path to a file or a file-like object
+        :return: Hex digest of the content
+    """
+    digest = hashlib.sha256()
+    if isinstance(document, str):
+        with open(document, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    else:
+        position = document.tell()
+        for block in iter(lambda: document.read(1 << 20), b''):
+            digest.update(block if isinstance(block, bytes) else block.encode('utf-8'))
+        document.seek(position)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    """ Hash a chunk of text. """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class ChunkRecord:
+    """ A chunk stored in the vector store. """
+    hash: str
+    vector_id: str
+
+
+@dataclass
+class DocumentRecord:
+    """ Ingestion state of one source document. """
+    source: str
+    file_hash: str
+    document_type: str
+    ingested_at: str
+    chunks: List[ChunkRecord] = field(default_factory=list)
+
+
+class IngestionManifest:
+    """ Tracks which documents are indexed in a vector store, with their file hash,
+        chunk hashes and vector ids, so that re-ingestion only touches what changed.
+        The manifest is stored as manifest.json next to the saved vector store.
+    """
+    FILE_NAME = "manifest.json"
+
+    def __init__(self, documents: Optional[Dict[str, DocumentRecord]] = None):
+        self.documents: Dict[str, DocumentRecord] = documents or {}
+
+    @classmethod
+    def load(cls, directory: str) -> "IngestionManifest":
+        """ Load the manifest saved in a vector store directory (empty if there is none). """
+        path = os.path.join(directory, cls.FILE_NAME)
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        documents = {}
+        for source, record in raw.get("documents", {}).items():
+            chunks = [ChunkRecord(**chunk) for chunk in record.pop("chunks", [])]
+            documents[source] = DocumentRecord(chunks=chunks, **record)
+        return cls(documents)
+
+    def save(self, directory: str) -> None:
+        """ Write the manifest next to the vector store. """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.FILE_NAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"documents": {source: asdict(record) for source, record in self.documents.items()}}, f)
+        os.replace(tmp_path, path)
+
+    def version(self) -> str:
+        """ Fingerprint of the indexed content, changing whenever a document is added, updated or removed. """
+        pairs = sorted((source, record.file_hash) for source, record in self.documents.items())
+        return hashlib.sha256(json.dumps(pairs).encode('utf-8')).hexdigest()
+
+    def get(self, source: str) -> Optional[DocumentRecord]:
+        return self.documents.get(source)
+
+    def find_source_by_hash(self, file_hash: str) -> Optional[str]:
+        """ Return the source of an indexed document with the given content hash. """
+        for source, record in self.documents.items():
+            if record.file_hash == file_hash:
+                return source
+        return None
+
+    def plan(self, source: str, chunk_hashes: List[str]) -> Tuple[List[Optional[str]], List[str]]:
+        """ Match the new chunks of a document against what is already indexed.
+            :param source: Document source
+            :param chunk_hashes: Hashes of the document's chunks, in order
+            :return: Existing vector id for every chunk (None when it must be embedded),
+                     and the vector ids that are no longer part of the document
+        """
+        record = self.documents.get(source)
+        available = defaultdict(list)
+        if record is not None:
+            for chunk in record.chunks:
+                available[chunk.hash].append(chunk.vector_id)
+
+        ids = []
+        for chunk_hash in chunk_hashes:
+            ids.append(available[chunk_hash].pop(0) if available[chunk_hash] else None)
+
+        stale_ids = [vector_id for vector_ids in available.values() for vector_id in vector_ids]
+        return ids, stale_ids
+
+    def record(self, source: str, file_hash: str, document_type: str, chunks: List[ChunkRecord]) -> None:
+        self.documents[source] = DocumentRecord(
+            source=source,
+            file_hash=file_hash,
+            document_type=document_type,
+            ingested_at=datetime.now().isoformat(timespec='seconds'),
+            chunks=chunks,
+        )
+
+    def remove(self, source: str) -> List[str]:
+        """ Forget a document and return its vector ids. """
+        record = self.documents.pop(source, None)
+        return [chunk.vector_id for chunk in record.chunks] if record else []
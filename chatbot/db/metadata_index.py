@@ -0,0 +1,142 @@
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+# Fields that can be filtered on. Categorical fields match values exactly,
+# numeric fields also accept ranges.
+CATEGORICAL_FIELDS = ("source", "document_type", "section_title")
+NUMERIC_FIELDS = ("page_number", "timestamp")
+
+RANGE_OPERATORS = {
+    "gt": np.greater,
+    "gte": np.greater_equal,
+    "lt": np.less,
+    "lte": np.less_equal,
+}
+
+
+def _to_number(field: str, value: Any) -> float:
+    """ Numeric value of a metadata field; timestamps are converted to epoch seconds. """
+    if value is None:
+        return np.nan
+    if field == "timestamp":
+        if isinstance(value, datetime):
+            return value.timestamp()
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class MetadataIndex:
+    """ Columnar metadata of the chunks, aligned with the vector positions of the index.
+        Categorical fields are dictionary-encoded into integer code arrays and numeric
+        fields are float arrays, so a filter evaluates to a boolean bitmap over all
+        positions in a few vectorized operations. The bitmap restricts the vector and
+        BM25 search directly, instead of over-fetching and filtering the results.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.position_of: Dict[str, int] = {}
+        self._codes = {field: np.zeros(0, dtype=np.int32) for field in CATEGORICAL_FIELDS}
+        self._dictionaries: Dict[str, Dict[Any, int]] = {field: {} for field in CATEGORICAL_FIELDS}
+        self._numbers = {field: np.zeros(0, dtype=np.float64) for field in NUMERIC_FIELDS}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_store(cls, vector_store) -> "MetadataIndex":
+        """ Build the index from the docstore of a LangChain FAISS store. """
+        index = cls()
+        mapping = vector_store.index_to_docstore_id
+        ids = [mapping[i] for i in range(len(mapping))]
+        index.append(ids, [vector_store.docstore.search(doc_id).metadata for doc_id in ids])
+        return index
+
+    def append(self, ids: List[str], metadatas: Iterable[dict]) -> None:
+        """ Add rows for vectors appended to the index, in the same order. """
+        metadatas = list(metadatas)
+        with self._lock:
+            for field in CATEGORICAL_FIELDS:
+                dictionary = self._dictionaries[field]
+                codes = [dictionary.setdefault(metadata.get(field), len(dictionary)) for metadata in metadatas]
+                self._codes[field] = np.concatenate([self._codes[field], np.array(codes, dtype=np.int32)])
+            for field in NUMERIC_FIELDS:
+                numbers = [_to_number(field, metadata.get(field)) for metadata in metadatas]
+                self._numbers[field] = np.concatenate([self._numbers[field], np.array(numbers, dtype=np.float64)])
+            for doc_id in ids:
+                self.position_of[doc_id] = len(self.ids)
+                self.ids.append(doc_id)
+
+    def update(self, ids: List[str], metadatas: Iterable[dict]) -> None:
+        """ Replace the rows of vectors whose metadata changed; positions stay the same. """
+        with self._lock:
+            for doc_id, metadata in zip(ids, metadatas):
+                position = self.position_of.get(doc_id)
+                if position is None:
+                    continue
+                for field in CATEGORICAL_FIELDS:
+                    dictionary = self._dictionaries[field]
+                    self._codes[field][position] = dictionary.setdefault(metadata.get(field), len(dictionary))
+                for field in NUMERIC_FIELDS:
+                    self._numbers[field][position] = _to_number(field, metadata.get(field))
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """ Drop the rows of deleted vectors; later rows move up like the index positions do. """
+        with self._lock:
+            removed = {self.position_of[doc_id] for doc_id in ids if doc_id in self.position_of}
+            if not removed:
+                return
+            keep = np.ones(len(self.ids), dtype=bool)
+            keep[list(removed)] = False
+            for field in CATEGORICAL_FIELDS:
+                self._codes[field] = self._codes[field][keep]
+            for field in NUMERIC_FIELDS:
+                self._numbers[field] = self._numbers[field][keep]
+            self.ids = [doc_id for doc_id, kept in zip(self.ids, keep) if kept]
+            self.position_of = {doc_id: i for i, doc_id in enumerate(self.ids)}
+
+    def _field_mask(self, field: str, condition: Any) -> np.ndarray:
+        if field in CATEGORICAL_FIELDS:
+            values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+            codes = [self._dictionaries[field][value] for value in values if value in self._dictionaries[field]]
+            return np.isin(self._codes[field], codes)
+
+        numbers = self._numbers[field]
+        if isinstance(condition, dict):
+            unknown = set(condition) - set(RANGE_OPERATORS)
+            if unknown:
+                raise ValueError(f"Unsupported range operators for {field}: {sorted(unknown)}")
+            mask = ~np.isnan(numbers)
+            for operator, bound in condition.items():
+                mask &= RANGE_OPERATORS[operator](numbers, _to_number(field, bound))
+            return mask
+        values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+        return np.isin(numbers, [_to_number(field, value) for value in values])
+
+    def mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """ Evaluate a filter over every vector position.
+            :param filters: Field conditions combined with AND. A condition is a value, a list of
+                            values (any of), or for page_number / timestamp a range such as
+                            {"gte": datetime.now() - timedelta(hours=24)}
+            :return: Boolean bitmap of the matching positions
+        """
+        unknown = set(filters) - set(CATEGORICAL_FIELDS) - set(NUMERIC_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot filter on {sorted(unknown)}; "
+                             f"supported fields are {list(CATEGORICAL_FIELDS + NUMERIC_FIELDS)}")
+        with self._lock:
+            mask = np.ones(len(self.ids), dtype=bool)
+            for field, condition in filters.items():
+                mask &= self._field_mask(field, condition)
+            return mask
@@ -0,0 +1,112 @@
+"""
+Re-embed an existing FAISS vector store with another embedding backend.
+
+The chunks, their metadata and their vector ids are kept, so the ingestion manifest
+stays valid. The new store is written next to the target and swapped in at the end,
+and embeddings go through the persistent embedding cache, so an interrupted
+migration leaves the old store untouched and resumes where it stopped. The target's
+store lock is held throughout, so no ingestion writes to the store being replaced,
+and the new store continues its generation numbering, so processes that loaded the
+old store see that it changed.
+
+Usage:
+    python -m chatbot.db.migrate_embeddings data/vector_db/faiss_index --backend sentence-transformers
+"""
+import os
+import shutil
+import logging
+import argparse
+from typing import Optional
+
+from langchain_community.vectorstores import FAISS
+
+from chatbot.db.knowledge_base import KnowledgeBase
+from chatbot.db.manifest import IngestionManifest
+from chatbot.db.embedding_backends import DEFAULT_MODELS, EmbeddingInfo
+from chatbot.db.mmap_store import open_store, read_generation, save_store, store_lock
+from chatbot.db.bm25 import BM25Index
+
+
+def migrate_index(source_path: str, target_path: Optional[str] = None, backend: Optional[str] = None,
+                  model: Optional[str] = None, batch_size: int = 256,
+                  knowledge_base: Optional[KnowledgeBase] = None) -> dict:
+    """ Re-embed every chunk of a vector store.
+        :param source_path: Directory of the existing vector store
+        :param target_path: Directory of the migrated store (defaults to replacing the source)
+        :param backend: Embedding backend to migrate to
+        :param model: Embedding model to migrate to (defaults to the backend's model)
+        :param batch_size: Number of chunks embedded per step
+        :param knowledge_base: Knowledge base providing the target embeddings (built from backend/model if None)
+        :return: Summary with the number of vectors, their dimension and the new backend and model
+    """
+    target_path = target_path or source_path
+    kb = knowledge_base or KnowledgeBase(embedding_backend=backend, embedding_model=model)
+
+    with store_lock(target_path):
+        source = open_store(source_path, kb.embeddings)
+        entries = [(doc_id, source.docstore.search(doc_id))
+                   for _, doc_id in sorted(source.index_to_docstore_id.items())]
+        if not entries:
+            raise ValueError(f"Vector store {source_path} is empty")
+
+        store = None
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            texts = [doc.page_content for _, doc in batch]
+            vectors = kb.embeddings.embed_documents(texts)
+            metadatas = [doc.metadata for _, doc in batch]
+            ids = [doc_id for doc_id, _ in batch]
+            if store is None:
+                store = FAISS.from_embeddings(list(zip(texts, vectors)), kb.embeddings, metadatas=metadatas,
+                                              ids=ids, distance_strategy=source.distance_strategy)
+            else:
+                store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+            logging.info(f"Re-embedded {min(start + batch_size, len(entries))}/{len(entries)} chunks")
+
+        staging_path = target_path.rstrip("/\\") + ".migrating"
+        if os.path.exists(staging_path):
+            shutil.rmtree(staging_path)
+        # Continue the numbering of the replaced store, so processes that loaded it notice the swap
+        generation = max(read_generation(source_path), read_generation(target_path)) + 1
+        save_store(store, staging_path, generation=generation)
+        IngestionManifest.load(source_path).save(staging_path)
+        bm25 = BM25Index.load(source_path)
+        if bm25 is not None:
+            bm25.save(staging_path)
+        EmbeddingInfo(kb.embedding_backend, kb.embedding_model).save(staging_path)
+
+        if os.path.exists(target_path):
+            backup_path = target_path.rstrip("/\\") + ".previous"
+            if os.path.exists(backup_path):
+                shutil.rmtree(backup_path)
+            os.rename(target_path, backup_path)
+            os.rename(staging_path, target_path)
+            shutil.rmtree(backup_path)
+        else:
+            os.rename(staging_path, target_path)
+
+    return {
+        "vectors": store.index.ntotal,
+        "dimension": store.index.d,
+        "backend": kb.embedding_backend,
+        "model": kb.embedding_model,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed a FAISS vector store with another embedding backend.")
+    parser.add_argument("source", help="Directory of the existing vector store")
+    parser.add_argument("--target", help="Directory of the migrated store (defaults to replacing the source)")
+    parser.add_argument("--backend", required=True, choices=sorted(DEFAULT_MODELS), help="Embedding backend")
+    parser.add_argument("--model", help="Embedding model (defaults to the backend's model)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks embedded per step")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    summary = migrate_index(args.source, args.target, args.backend, args.model, args.batch_size)
+    print(f"Migrated {summary['vectors']} vectors to {summary['backend']}:{summary['model']} "
+          f"({summary['dimension']} dimensions)")
+
+
+if __name__ == "__main__":
+    main()
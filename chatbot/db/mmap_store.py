@@ -0,0 +1,319 @@
+"""
+Native on-disk format for the knowledge-base vector stores.
+
+LangChain's save_local pickles the whole docstore into index.pkl and every process
+reads index.faiss fully into memory. The native format instead stores:
+
+    store.json               header: generation, count, dimension, distance strategy
+    vectors.<gen>.f32        float32 matrix, memory-mapped read-only
+    ids.<gen>.npy            docstore ids by vector position, fixed-width bytes
+    docstore.<gen>.sqlite    chunk texts and JSON metadata, read on demand
+    index.<gen>.faiss        trained approximate index (only for IVF / HNSW stores)
+
+Loading only maps the files, so it is near-instant and uvicorn workers share the
+vector pages through the OS page cache. A save writes a new generation and then
+swaps store.json, so readers never see a half-written store. Writers hold an
+exclusive lock on the directory (the <directory>.lock file next to it, which
+survives the directory being swapped), so saves from several processes never
+reuse a generation number.
+
+Usage (convert a pickled store in place):
+    python -m chatbot.db.mmap_store data/vector_db/faiss_index
+"""
+import os
+import glob
+import json
+import fcntl
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Union
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from chatbot.db.ann_index import FLAT, index_kind, store_vectors
+
+HEADER_FILE = "store.json"
+LOCK_SUFFIX = ".lock"
+FORMAT_VERSION = 1
+
+# Store directories whose lock the current thread holds, with the nesting depth
+_held_locks = threading.local()
+
+
+class MmapFlatIndex:
+    """ Exact-search index over a memory-mapped vector matrix. It implements the part
+        of the faiss.Index interface that LangChain's FAISS wrapper uses. The mapped
+        file is never written: the first add or removal copies the vectors into memory,
+        and the next save writes them as a new generation.
+    """
+    is_trained = True
+
+    def __init__(self, vectors: np.ndarray, metric_type: int = faiss.METRIC_L2):
+        self._vectors = vectors
+        self.d = vectors.shape[1]
+        self.metric_type = metric_type
+
+    @property
+    def ntotal(self) -> int:
+        return self._vectors.shape[0]
+
+    def search(self, x: np.ndarray, k: int):
+        distances = np.full((len(x), k), np.inf if self.metric_type == faiss.METRIC_L2 else -np.inf,
+                            dtype=np.float32)
+        labels = np.full((len(x), k), -1, dtype=np.int64)
+        found = min(k, self.ntotal)
+        if found:
+            distances[:, :found], labels[:, :found] = faiss.knn(x, self._vectors, found, metric=self.metric_type)
+        return distances, labels
+
+    def search_subset(self, x: np.ndarray, k: int, positions: np.ndarray):
+        """ Exact search restricted to some vector positions. """
+        distances, labels = MmapFlatIndex(self._vectors[positions], self.metric_type).search(x, k)
+        return distances, np.where(labels >= 0, positions[np.maximum(labels, 0)], -1)
+
+    def add(self, x: np.ndarray) -> None:
+        self._vectors = np.concatenate([np.asarray(self._vectors), np.asarray(x, dtype=np.float32)])
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        keep = np.ones(self.ntotal, dtype=bool)
+        keep[ids] = False
+        self._vectors = np.asarray(self._vectors)[keep]
+        return int((~keep).sum())
+
+    def reset(self) -> None:
+        self._vectors = np.zeros((0, self.d), dtype=np.float32)
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return np.array(self._vectors[key])
+
+    def reconstruct_n(self, n0: int, ni: int) -> np.ndarray:
+        return np.array(self._vectors[n0:n0 + ni])
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """ Docstore reading chunks from a saved SQLite file on demand. Additions and
+        deletions are kept in memory until the store is saved as a new generation.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """ :param path: SQLite file of a saved store (None for an empty docstore) """
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False) if path else None
+        self._lock = threading.Lock()
+        self._added: Dict[str, Document] = {}
+        self._deleted = set()
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self._added:
+            return self._added[search]
+        if search in self._deleted or self._conn is None:
+            return f"ID {search} not found."
+        with self._lock:
+            row = self._conn.execute("SELECT text, metadata FROM documents WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        self._added.update(texts)
+        self._deleted.difference_update(texts)
+
+    def delete(self, ids: List) -> None:
+        for doc_id in ids:
+            self._added.pop(doc_id, None)
+            self._deleted.add(doc_id)
+
+
+@contextmanager
+def store_lock(directory: str) -> Iterator[None]:
+    """ Exclusive lock on a store directory, held across processes and threads. It is
+        re-entrant within a thread, so a caller can hold it around load, update and save.
+        The lock file sits next to the directory, so replacing the directory does not release it.
+        :param directory: Store directory
+    """
+    key = os.path.realpath(directory)
+    os.makedirs(os.path.dirname(key), exist_ok=True)
+    held = _held_locks.__dict__.setdefault("depth", {})
+    if key in held:
+        held[key] += 1
+        try:
+            yield
+        finally:
+            held[key] -= 1
+        return
+
+    with open(key + LOCK_SUFFIX, "a+") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        held[key] = 1
+        try:
+            yield
+        finally:
+            del held[key]
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_generation(directory: str) -> int:
+    """ Generation of the store saved in a directory (0 if there is none). """
+    header = _read_header(directory)
+    return header["generation"] if header else 0
+
+
+def _read_header(directory: str) -> Optional[dict]:
+    path = os.path.join(directory, HEADER_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_native_store(directory: str) -> bool:
+    """ Whether a directory holds a store in the native format. """
+    return os.path.exists(os.path.join(directory, HEADER_FILE))
+
+
+def store_exists(directory: str) -> bool:
+    """ Whether a directory holds a saved store, native or pickled. """
+    return is_native_store(directory) or os.path.exists(os.path.join(directory, "index.faiss"))
+
+
+def save_store(vector_store: FAISS, directory: str, generation: Optional[int] = None) -> None:
+    """ Save a LangChain FAISS store in the native format as a new generation.
+        Afterwards the store reads its chunks (and flat vectors) from the saved files,
+        so documents added since it was loaded are no longer held in memory.
+        :param vector_store: Store to save (any docstore and index type)
+        :param directory: Store directory
+        :param generation: Generation to save as, e.g. to continue the numbering of a store this
+                           one will replace (defaults to the next generation of the directory)
+    """
+    with store_lock(directory):
+        os.makedirs(directory, exist_ok=True)
+        generation = max(generation or 0, read_generation(directory) + 1)
+        _write_generation(vector_store, directory, generation)
+
+        # Keep the previous generation for readers that are still opening it
+        for pattern in ("vectors.*.f32", "ids.*.npy", "docstore.*.sqlite", "index.*.faiss"):
+            for old_path in glob.glob(os.path.join(directory, pattern)):
+                old_generation = os.path.basename(old_path).split(".")[1]
+                if old_generation.isdigit() and int(old_generation) < generation - 1:
+                    os.remove(old_path)
+
+
+def _write_generation(vector_store: FAISS, directory: str, generation: int) -> None:
+    """ Write the files of one generation and swap the header to it. """
+    def path(name: str) -> str:
+        return os.path.join(directory, name.format(gen=generation))
+
+    ids = [vector_store.index_to_docstore_id[i] for i in range(len(vector_store.index_to_docstore_id))]
+    vectors = np.ascontiguousarray(store_vectors(vector_store), dtype=np.float32)
+    vectors.tofile(path("vectors.{gen}.f32"))
+    np.save(path("ids.{gen}.npy"), np.array([doc_id.encode("utf-8") for doc_id in ids], dtype=bytes))
+
+    docstore_path = path("docstore.{gen}.sqlite")
+    if os.path.exists(docstore_path):
+        os.remove(docstore_path)
+    conn = sqlite3.connect(docstore_path)
+    try:
+        conn.execute("CREATE TABLE documents (id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)")
+        for start in range(0, len(ids), 1000):
+            rows = []
+            for doc_id in ids[start:start + 1000]:
+                doc = vector_store.docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Could not find document for id {doc_id}, got {doc}")
+                rows.append((doc_id, doc.page_content, json.dumps(doc.metadata, default=str)))
+            conn.executemany("INSERT INTO documents (id, text, metadata) VALUES (?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+    index_file = None
+    if index_kind(vector_store.index) != FLAT:
+        index_file = f"index.{generation}.faiss"
+        faiss.write_index(vector_store.index, os.path.join(directory, index_file))
+
+    new_header = {
+        "format": FORMAT_VERSION,
+        "generation": generation,
+        "count": len(ids),
+        "dim": int(vector_store.index.d),
+        "distance_strategy": vector_store.distance_strategy.value
+        if isinstance(vector_store.distance_strategy, DistanceStrategy) else str(vector_store.distance_strategy),
+        "normalize_L2": bool(vector_store._normalize_L2),
+        "index_file": index_file,
+    }
+    tmp_path = os.path.join(directory, HEADER_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(new_header, f)
+    os.replace(tmp_path, os.path.join(directory, HEADER_FILE))
+
+    # Read the saved chunks from SQLite instead of keeping them in memory
+    vector_store.docstore = SQLiteDocstore(docstore_path)
+    if isinstance(vector_store.index, MmapFlatIndex) and len(ids):
+        vector_store.index._vectors = np.memmap(path("vectors.{gen}.f32"), dtype=np.float32, mode="r",
+                                                shape=vectors.shape)
+
+
+def load_store(directory: str, embeddings: Embeddings) -> FAISS:
+    """ Open a store saved in the native format. Vectors and ids are memory-mapped and
+        chunks are read from SQLite on demand; nothing is unpickled.
+        :param directory: Store directory
+        :param embeddings: Embedding model used for queries
+        :return: LangChain FAISS store
+    """
+    header = _read_header(directory)
+    if header is None:
+        raise FileNotFoundError(f"No vector store found in {directory}")
+    generation, count, dim = header["generation"], header["count"], header["dim"]
+
+    def path(name: str) -> str:
+        return os.path.join(directory, name.format(gen=generation))
+
+    distance_strategy = DistanceStrategy(header["distance_strategy"])
+    if header.get("index_file"):
+        index = faiss.read_index(os.path.join(directory, header["index_file"]))
+    else:
+        vectors = np.memmap(path("vectors.{gen}.f32"), dtype=np.float32, mode="r", shape=(count, dim)) \
+            if count else np.zeros((0, dim), dtype=np.float32)
+        metric = faiss.METRIC_INNER_PRODUCT if distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT \
+            else faiss.METRIC_L2
+        index = MmapFlatIndex(vectors, metric)
+
+    ids = np.load(path("ids.{gen}.npy"), mmap_mode="r") if count else []
+    index_to_docstore_id = {i: doc_id.decode("utf-8") for i, doc_id in enumerate(ids)}
+
+    return FAISS(embeddings, index, SQLiteDocstore(path("docstore.{gen}.sqlite")), index_to_docstore_id,
+                 normalize_L2=header.get("normalize_L2", False), distance_strategy=distance_strategy)
+
+
+def open_store(directory: str, embeddings: Embeddings) -> FAISS:
+    """ Open a saved store in either format. Stores saved with LangChain's save_local
+        before the native format existed are still read from their pickle.
+    """
+    if is_native_store(directory):
+        return load_store(directory, embeddings)
+    return FAISS.load_local(directory, embeddings, allow_dangerous_deserialization=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a pickled FAISS vector store to the native format.")
+    parser.add_argument("store", help="Directory of the saved vector store")
+    args = parser.parse_args()
+
+    from langchain_community.embeddings import FakeEmbeddings
+
+    # Embeddings are only used to answer queries, so any model will do for the conversion
+    vector_store = FAISS.load_local(args.store, FakeEmbeddings(size=1), allow_dangerous_deserialization=True)
+    save_store(vector_store, args.store)
+    print(f"Converted {vector_store.index.ntotal} vectors in {args.store} to the native format")
+
+
+if __name__ == "__main__":
+    main()
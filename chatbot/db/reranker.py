@@ -0,0 +1,125 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from chatbot.db.embedding_cache import normalize_text
+from chatbot.db.manifest import text_sha256
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """ Reorders retrieved chunks by a cross-encoder's relevance score, on CPU by default.
+        Scoring stops at a latency budget: if the candidates cannot all be scored in time
+        the vector order is kept, so reranking never makes a query slower than the budget
+        allows. Scores are cached per (query, chunk) pair, so a query that ran out of
+        budget is reranked the next time and repeated queries cost nothing.
+        Requires the sentence-transformers package unless a model is given.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, budget_ms: float = 150.0, batch_size: int = 8,
+                 device: str = "cpu", cache_size: int = 10000, model=None):
+        """ :param model_name: sentence-transformers cross-encoder name or local path
+            :param budget_ms: Time allowed for scoring the candidates of one query
+            :param batch_size: Number of (query, chunk) pairs scored per forward pass;
+                               the budget is checked between passes
+            :param device: Device to run the model on
+            :param cache_size: Number of (query, chunk) scores kept
+            :param model: Model with a CrossEncoder-style predict(pairs) to use instead of loading model_name
+        """
+        if model is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError as e:
+                raise ImportError("Reranking requires the sentence-transformers package: "
+                                  "pip install sentence-transformers") from e
+            model = CrossEncoder(model_name, device=device)
+        self.model = model
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One forward pass at a time: concurrent passes only oversubscribe the CPU
+        self._model_lock = threading.Lock()
+        self.stats = {"queries": 0, "reranked": 0, "fallbacks": 0, "cache_hits": 0, "scored": 0}
+
+    @classmethod
+    def from_env(cls) -> "CrossEncoderReranker":
+        """ Build a reranker configured by RERANK_MODEL, RERANK_BUDGET_MS and RERANK_BATCH_SIZE. """
+        return cls(
+            model_name=os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL),
+            budget_ms=float(os.getenv("RERANK_BUDGET_MS", "150")),
+            batch_size=int(os.getenv("RERANK_BATCH_SIZE", "8")),
+        )
+
+    def _cached(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        with self._lock:
+            found = {}
+            for key in keys:
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    found[key] = self._scores[key]
+            return found
+
+    def _store(self, scores: Dict[Tuple[str, str], float]) -> None:
+        with self._lock:
+            self._scores.update(scores)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+    def rerank(self, query: str, candidates: List[Tuple[str, dict]], top_k: int) -> List[Tuple[str, dict]]:
+        """ Rerank retrieved chunks for a query.
+            :param query: Query text
+            :param candidates: (chunk text, metadata) pairs in vector order
+            :param top_k: Number of chunks to keep
+            :return: The top_k chunks by cross-encoder score, or by vector order if the budget ran out
+        """
+        self.stats["queries"] += 1
+        if len(candidates) <= 1:
+            return candidates[:top_k]
+
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        normalized = normalize_text(query)
+        keys = [(normalized, text_sha256(text)) for text, _ in candidates]
+        scores = self._cached(keys)
+        self.stats["cache_hits"] += len(scores)
+
+        # One index per unscored pair; repeated chunk texts share a score
+        missing = list({key: i for i, key in enumerate(keys) if key not in scores}.values())
+        for start in range(0, len(missing), self.batch_size):
+            if time.perf_counter() > deadline:
+                self.stats["fallbacks"] += 1
+                logging.info(f"Rerank budget of {self.budget_ms:.0f} ms exceeded after {start} of "
+                             f"{len(missing)} pairs, keeping the vector order")
+                return candidates[:top_k]
+            batch = missing[start:start + self.batch_size]
+            with self._model_lock:
+                batch_scores = self.model.predict([(query, candidates[i][0]) for i in batch])
+            fresh = {keys[i]: float(score) for i, score in zip(batch, batch_scores)}
+            self._store(fresh)
+            scores.update(fresh)
+            self.stats["scored"] += len(batch)
+
+        self.stats["reranked"] += 1
+        order = sorted(range(len(candidates)), key=lambda i: scores[keys[i]], reverse=True)
+        return [candidates[i] for i in order[:top_k]]
+
+
+@lru_cache()
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """ Return the reranker shared by every knowledge base of the process, or None when
+        reranking is disabled (RERANK unset or false) or the model cannot be loaded.
+    """
+    if os.getenv("RERANK", "false").lower() not in ("1", "true", "yes"):
+        return None
+    try:
+        return CrossEncoderReranker.from_env()
+    except Exception as e:
+        logging.warning(f"Reranking disabled: {e}")
+        return None
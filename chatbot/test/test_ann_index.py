@@ -0,0 +1,85 @@
+import os
+import tempfile
+import faiss
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from chatbot.db.ann_index import (IndexSpec, benchmark, build_index, convert_store, delete_from_store,
+                                  index_kind, HNSW, IVF_FLAT, IVF_PQ)
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+from chatbot.db.knowledge_base import KnowledgeBase
+
+
+class HashEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [np.random.default_rng(abs(hash(t)) % (2 ** 32)).normal(size=16).tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_store(n=400):
+    texts = [f"chunk {i}" for i in range(n)]
+    return FAISS.from_texts(texts, HashEmbeddings(), ids=texts), texts
+
+
+@pytest.mark.parametrize("kind", [IVF_FLAT, HNSW])
+def test_converted_store_searches_and_deletes(kind):
+    store, texts = make_store()
+    assert convert_store(store, IndexSpec(kind=kind, nprobe=64))
+    assert index_kind(store.index) == kind
+    assert store.similarity_search("chunk 7", k=1)[0].page_content == "chunk 7"
+
+    delete_from_store(store, ["chunk 7", "chunk 9"])
+    assert store.index.ntotal == len(texts) - 2
+    assert store.similarity_search("chunk 7", k=1)[0].page_content != "chunk 7"
+    assert store.similarity_search("chunk 8", k=1)[0].page_content == "chunk 8"
+
+    store.add_texts(["chunk 7"], ids=["chunk 7"])
+    assert store.similarity_search("chunk 7", k=1)[0].page_content == "chunk 7"
+
+
+def test_pq_needs_enough_training_vectors():
+    store, _ = make_store(100)
+    assert not convert_store(store, IndexSpec(kind=IVF_PQ))
+    with pytest.raises(ValueError):
+        build_index(np.zeros((100, 16), dtype=np.float32), IndexSpec(kind=IVF_PQ))
+
+
+def test_benchmark_reports_recall_against_flat():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+    reports = benchmark(vectors, vectors[:50], [IndexSpec(kind=HNSW), IndexSpec(kind=IVF_FLAT, nprobe=1)], k=5)
+    assert reports[0]["index"] == "Flat" and reports[0]["recall@5"] == 1.0
+    assert reports[1]["recall@5"] > 0.9
+    assert all("mean_ms" in report for report in reports)
+
+
+def test_ivf_index_is_retrained_as_the_store_grows():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "faiss_index")
+        kb = KnowledgeBase(embeddings=HashEmbeddings(), embedding_cache_dir=None, chunk_size=60, chunk_overlap=0,
+                           index_spec=IndexSpec(kind=IVF_FLAT))
+        nlists = []
+        for batch, size in enumerate((60, 400, 1600)):
+            doc = os.path.join(tmp, f"plan-{batch}.txt")
+            with open(doc, "w", encoding="utf-8") as f:
+                f.write("\n\n".join(f"Plan {batch} item {i}: inspect the haul road." for i in range(size)))
+            kb.add_documents([doc], document_type="txt", save_path=store)
+            nlists.append(faiss.extract_index_ivf(kb.vector_store.index).nlist)
+
+        assert kb.vector_store.index.ntotal == 2060
+        assert nlists[0] == 1 and nlists[0] < nlists[1] < nlists[2]
+        assert kb.query_vector_store("Plan 2 item 7: inspect the haul road.", top_k=1, hybrid=False,
+                                     rerank=False)[0][0] == "Plan 2 item 7: inspect the haul road."
+
+
+if __name__ == "__main__":
+    test_converted_store_searches_and_deletes(IVF_FLAT)
+    test_converted_store_searches_and_deletes(HNSW)
+    test_pq_needs_enough_training_vectors()
+    test_benchmark_reports_recall_against_flat()
+    test_ivf_index_is_retrained_as_the_store_grows()
+    print("ANN index tests passed.")
@@ -0,0 +1,46 @@
+from chatbot.db.chunker import StreamingChunker, detect_headings
+
+
+def make_pages(count=40):
+    pages = []
+    for number in range(1, count + 1):
+        body = " ".join(f"Line {number}.{i}: the manager shall keep the haul road watered." for i in range(8))
+        heading = f"CHAPTER {number // 5 + 1}\n" if number % 5 == 0 else ""
+        pages.append((number, f"{heading}{body}\n\n"))
+    return pages
+
+
+def test_chunks_keep_offsets_pages_and_sections():
+    pages = make_pages()
+    document = "".join(text for _, text in pages)
+    page_starts, offset = [], 0
+    for number, text in pages:
+        page_starts.append((offset, number))
+        offset += len(text)
+
+    chunks = list(StreamingChunker(chunk_size=200, chunk_overlap=40, window_size=600).chunks(iter(pages)))
+
+    covered = 0
+    for chunk in chunks:
+        assert document[chunk.start_offset:chunk.end_offset] == chunk.text
+        assert len(chunk.text) <= 200
+        assert chunk.page_number == max(n for start, n in page_starts if start <= chunk.start_offset)
+        assert chunk.end_page >= chunk.page_number
+        assert document[covered:chunk.start_offset].strip() == ""  # only whitespace between chunks
+        covered = max(covered, chunk.end_offset)
+    assert document[covered:].strip() == ""
+
+    last = chunks[-1]
+    assert last.page_number == 40 and last.section_title == "CHAPTER 9"
+    assert chunks[0].section_title is None
+
+
+def test_headings_are_detected():
+    text = "3.2 Hazard Identification\nThe owner shall identify hazards.\nREGULATION 104 - Blasting\nfoo bar."
+    assert [title for _, title in detect_headings(text)] == ["3.2 Hazard Identification", "REGULATION 104 - Blasting"]
+
+
+if __name__ == "__main__":
+    test_chunks_keep_offsets_pages_and_sections()
+    test_headings_are_detected()
+    print("Chunker tests passed.")
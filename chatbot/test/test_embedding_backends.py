@@ -0,0 +1,87 @@
+import os
+import time
+import tempfile
+import threading
+from typing import List
+import pytest
+from langchain_core.embeddings import Embeddings
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+from chatbot.db.knowledge_base import KnowledgeBase
+from chatbot.db.embedding_backends import EmbeddingInfo
+from chatbot.db.migrate_embeddings import migrate_index
+from chatbot.db.mmap_store import read_generation, store_lock
+
+
+class FixedEmbeddings(Embeddings):
+    def __init__(self, size):
+        self.size = size
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[float(len(t) % (i + 2)) for i in range(self.size)] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def test_migration_reembeds_and_keeps_chunks():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "faiss_index")
+        doc = os.path.join(tmp, "cmr.txt")
+        with open(doc, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(f"Regulation {i}: the manager shall ensure safe working." for i in range(6)))
+
+        google_kb = KnowledgeBase(chunk_size=60, chunk_overlap=0, embedding_cache_dir=None,
+                                  embeddings=FixedEmbeddings(4))
+        google_kb.add_documents([doc], document_type="txt", save_path=store)
+        before = google_kb.query_vector_store("Regulation 3", top_k=6)
+
+        local_kb = KnowledgeBase(chunk_size=60, chunk_overlap=0, embedding_cache_dir=None,
+                                 embedding_backend="sentence-transformers", embeddings=FixedEmbeddings(8))
+        summary = migrate_index(store, batch_size=4, knowledge_base=local_kb)
+        assert summary["vectors"] == len(before) and summary["dimension"] == 8
+        assert EmbeddingInfo.load(store).backend == "sentence-transformers"
+
+        local_kb.load_vector_store(store)
+        after = local_kb.query_vector_store("Regulation 3", top_k=6)
+        assert sorted(text for text, _ in after) == sorted(text for text, _ in before)
+        assert local_kb.add_documents([doc], document_type="txt", save_path=store)["skipped"] == [doc]
+
+        # A knowledge base on another embedding model must not query the migrated store
+        with pytest.raises(ValueError):
+            KnowledgeBase(embedding_cache_dir=None, embeddings=FixedEmbeddings(4)).load_vector_store(store)
+
+
+def test_migration_waits_for_the_store_lock_and_continues_generations():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "faiss_index")
+        doc = os.path.join(tmp, "cmr.txt")
+        kb = KnowledgeBase(chunk_size=60, chunk_overlap=0, embedding_cache_dir=None, embeddings=FixedEmbeddings(4))
+        for i in range(3):
+            with open(doc, "w", encoding="utf-8") as f:
+                f.write("\n\n".join(f"Regulation {i}.{j}: the manager shall ensure safe working." for j in range(4)))
+            kb.add_documents([doc], document_type="txt", save_path=store)
+        old_generation = read_generation(store)
+        assert old_generation == 3
+
+        local_kb = KnowledgeBase(embedding_cache_dir=None, embedding_backend="sentence-transformers",
+                                 embeddings=FixedEmbeddings(8))
+        migration = threading.Thread(target=migrate_index, args=(store,), kwargs={"knowledge_base": local_kb})
+        # An ingestion holding the store lock keeps the migration from swapping the store under it
+        with store_lock(store):
+            migration.start()
+            time.sleep(0.3)
+            assert migration.is_alive()
+            assert EmbeddingInfo.load(store).backend != "sentence-transformers"
+        migration.join(timeout=30)
+
+        assert EmbeddingInfo.load(store).backend == "sentence-transformers"
+        assert read_generation(store) > old_generation
+        # A process that loaded the old store sees that it was replaced
+        assert kb._is_outdated(store)
+
+
+if __name__ == "__main__":
+    test_migration_reembeds_and_keeps_chunks()
+    test_migration_waits_for_the_store_lock_and_continues_generations()
+    print("Embedding backend tests passed.")
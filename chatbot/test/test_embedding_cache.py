@@ -0,0 +1,61 @@
+import tempfile
+from typing import List
+from langchain_core.embeddings import Embeddings
+from chatbot.db.embedding_cache import CachedEmbeddings, EmbeddingCache, embedding_key
+
+
+class CountingEmbeddings(Embeddings):
+    """ Deterministic embeddings that count how many texts reach the 'API'. """
+    def __init__(self):
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += len(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return [v + 0.5 for v in self._vector(text)]
+
+
+def test_repeated_texts_cost_no_api_calls():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        base = CountingEmbeddings()
+        embeddings = CachedEmbeddings(base, "models/embedding-001", cache_dir=cache_dir)
+
+        first = embeddings.embed_documents(["Regulation 104", "Regulation  104 ", "Dragline"])
+        assert base.calls == 2  # whitespace variants share one embedding
+        assert first[0] == first[1]
+
+        again = embeddings.embed_documents(["Dragline", "Regulation 104"])
+        assert base.calls == 2
+        assert again == [first[2], first[0]]
+
+        # Queries and documents are embedded with different task types
+        query = embeddings.embed_query("Dragline")
+        assert base.calls == 3
+        assert query != first[2]
+
+
+def test_cache_persists_across_processes():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        base = CountingEmbeddings()
+        CachedEmbeddings(base, "models/embedding-001", cache_dir=cache_dir).embed_documents(["a", "bb", "ccc"])
+
+        reopened = CachedEmbeddings(CountingEmbeddings(), "models/embedding-001", cache_dir=cache_dir)
+        assert reopened.embed_documents(["ccc"]) == [[3.0, float(3 * 99 % 97), 1.0]]
+        assert reopened.embeddings.calls == 0
+        assert len(EmbeddingCache(cache_dir, "models/embedding-001")) == 3
+
+        # A different model never sees these vectors
+        other = EmbeddingCache(cache_dir, "all-MiniLM-L6-v2")
+        assert other.get_many([embedding_key("models/embedding-001", "document", "a")]) == {}
+
+
+if __name__ == "__main__":
+    test_repeated_texts_cost_no_api_calls()
+    test_cache_persists_across_processes()
+    print("All embedding cache tests passed.")
@@ -0,0 +1,76 @@
+import time
+import tempfile
+from typing import List
+import pytest
+from langchain_core.embeddings import Embeddings
+from chatbot.db.embedding_cache import CachedEmbeddings
+from chatbot.db.embedding_dispatcher import EmbeddingDispatcher, TokenBucket
+
+
+class RateLimitError(Exception):
+    code = 429
+
+
+class ScriptedEmbeddings(Embeddings):
+    """Fails the calls whose number is in fail_calls, or every call from fail_from on."""
+
+    def __init__(self, fail_calls=(), fail_from=None, error=RateLimitError):
+        self.calls = 0
+        self.embedded: List[str] = []
+        self.fail_calls = set(fail_calls)
+        self.fail_from = fail_from
+        self.error = error
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.calls in self.fail_calls or (self.fail_from is not None and self.calls >= self.fail_from):
+            raise self.error("Resource has been exhausted (e.g. check quota).")
+        self.embedded.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def dispatcher(embeddings, **kwargs):
+    return EmbeddingDispatcher(embeddings, batch_size=2, max_in_flight=1,
+                               rate_limiter=TokenBucket(rate=1000), backoff=0.001, **kwargs)
+
+
+def test_batches_and_retries_on_rate_limit():
+    texts = [f"chunk {i}" for i in range(7)]
+    inner = ScriptedEmbeddings(fail_calls={2})
+    embeddings = dispatcher(inner)
+
+    assert embeddings.embed_documents(texts) == [[float(len(t)), 1.0] for t in texts]
+    assert embeddings.stats["retries"] == 1
+    assert inner.calls == 5  # 4 batches plus one retry
+
+
+def test_failed_ingest_resumes_from_last_batch():
+    texts = [f"chunk {i}" for i in range(10)]
+    with tempfile.TemporaryDirectory() as tmp:
+        failing = ScriptedEmbeddings(fail_from=4, error=ValueError)
+        with pytest.raises(ValueError):
+            CachedEmbeddings(dispatcher(failing), "fake", cache_dir=tmp).embed_documents(texts)
+        assert len(failing.embedded) == 6
+
+        resumed = ScriptedEmbeddings()
+        vectors = CachedEmbeddings(dispatcher(resumed), "fake", cache_dir=tmp).embed_documents(texts)
+        assert resumed.embedded == texts[6:]
+        assert vectors == [[float(len(t)), 1.0] for t in texts]
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+if __name__ == "__main__":
+    test_batches_and_retries_on_rate_limit()
+    test_failed_ingest_resumes_from_last_batch()
+    test_token_bucket_limits_rate()
+    print("Embedding dispatcher tests passed.")
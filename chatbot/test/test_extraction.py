@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+from PyPDF2 import PdfReader
+from chatbot.db.extraction import PdfExtractor
+
+TEST_PDF = "proof/Guidelines for implementation of safety managment plan in coal and metalliferous mines (23 December, 2019).pdf"
+
+
+def test_pages_stream_in_order():
+    reader = PdfReader(TEST_PDF)
+    expected = [(i + 1, page.extract_text() or "") for i, page in enumerate(reader.pages)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        extractor = PdfExtractor(pages_per_task=2, executor=executor)
+        pages = list(extractor.iter_pages(TEST_PDF))
+        text = extractor.submit(TEST_PDF).text()
+
+    assert pages == expected
+    assert text == "".join(page_text for _, page_text in expected)
+
+
+if __name__ == "__main__":
+    test_pages_stream_in_order()
+    print("Extraction test passed.")
@@ -0,0 +1,66 @@
+import os
+import tempfile
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+from chatbot.db.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from chatbot.db.knowledge_base import KnowledgeBase
+
+
+class ConstantEmbeddings(Embeddings):
+    """Dense retrieval that cannot tell chunks apart."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [1.0, 0.0]
+
+
+def test_bm25_ranks_and_updates_incrementally():
+    index = BM25Index()
+    index.add_many([("a", "Regulation 104: blasting near the dragline"),
+                    ("b", "Regulations on dumper maintenance"),
+                    ("c", "General safety of excavators")])
+    assert tokenize("Regulations, DRAGLINE 104") == ["regulation", "dragline", "104"]
+    assert index.search("dragline", k=2)[0][0] == "a"
+    assert {doc_id for doc_id, _ in index.search("regulation", k=3)} == {"a", "b"}
+
+    index.remove_many(["a"])
+    index.add_many([("d", "Dragline bucket inspection")])
+    assert [doc_id for doc_id, _ in index.search("dragline")] == ["d"]
+    assert len(index) == 3
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]])
+    assert fused[0][0] == "y"
+    assert {doc_id for doc_id, _ in fused} == {"x", "y", "z", "w"}
+
+
+def test_hybrid_query_finds_exact_terms_and_survives_reload():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "faiss_index")
+        doc = os.path.join(tmp, "cmr.txt")
+        paragraphs = [f"Rule {i}: the manager shall ensure safe working." for i in range(8)]
+        paragraphs[5] = "Regulation 104: no dragline shall operate near a blast."
+        with open(doc, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+
+        kb = KnowledgeBase(chunk_size=60, chunk_overlap=0, embedding_cache_dir=None,
+                           embeddings=ConstantEmbeddings())
+        kb.add_documents([doc], document_type="txt", save_path=store)
+        assert kb.query_vector_store("dragline regulation 104", top_k=1)[0][0] == paragraphs[5]
+
+        reloaded = KnowledgeBase(embedding_cache_dir=None, embeddings=ConstantEmbeddings())
+        reloaded.load_vector_store(store)
+        assert len(reloaded.bm25) == 8
+        assert reloaded.query_vector_store("Regulation 104", top_k=1)[0][0] == paragraphs[5]
+
+
+if __name__ == "__main__":
+    test_bm25_ranks_and_updates_incrementally()
+    test_reciprocal_rank_fusion_rewards_agreement()
+    test_hybrid_query_finds_exact_terms_and_survives_reload()
+    print("Hybrid search tests passed.")
@@ -0,0 +1,128 @@
+import os
+import time
+import tempfile
+from datetime import datetime
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+from chatbot.db.knowledge_base import KnowledgeBase
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded += len(texts)
+        return [[float(len(t)), float(sum(map(ord, t)) % 101)] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def make_kb():
+    kb = KnowledgeBase(api_key="test-key", chunk_size=60, chunk_overlap=0, embedding_cache_dir=None)
+    kb.embeddings = CountingEmbeddings()
+    return kb
+
+
+def write(path, paragraphs):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs))
+
+
+def test_incremental_ingestion():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "faiss_index")
+        doc = os.path.join(tmp, "cmr.txt")
+        paragraphs = [f"Regulation {i}: the manager shall ensure safe working." for i in range(6)]
+        write(doc, paragraphs)
+
+        kb = make_kb()
+        summary = kb.add_documents([doc], document_type="txt", save_path=store, source_names=["cmr.txt"])
+        assert summary["added_chunks"] == 6
+        assert kb.embeddings.embedded == 6
+
+        # Re-uploading the same file (under any temp path) is a no-op
+        copy = os.path.join(tmp, "upload_tmp")
+        write(copy, paragraphs)
+        summary = kb.add_documents([copy], document_type="txt", save_path=store, source_names=["cmr.txt"])
+        assert summary["skipped"] == ["cmr.txt"]
+        assert kb.embeddings.embedded == 6
+
+        # Only the changed paragraph is embedded and the stale vector is deleted
+        paragraphs[2] = "Regulation 2: amended text for dragline operation."
+        write(doc, paragraphs)
+        reloaded = make_kb()
+        summary = reloaded.add_documents([doc], document_type="txt", save_path=store, source_names=["cmr.txt"])
+        assert summary["added_chunks"] == 1
+        assert summary["removed_chunks"] == 1
+        assert reloaded.embeddings.embedded == 1
+        assert reloaded.vector_store.index.ntotal == 6
+
+        store_ = reloaded.vector_store
+        contents = {store_.docstore.search(doc_id).page_content for doc_id in store_.index_to_docstore_id.values()}
+        assert "Regulation 2: amended text for dragline operation." in contents
+        assert all("Regulation 2: the manager" not in c for c in contents)
+
+
+def test_reused_chunks_get_new_metadata():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "faiss_index")
+        doc = os.path.join(tmp, "cmr.txt")
+        paragraphs = [f"Regulation {i}: the manager shall ensure safe working." for i in range(4)]
+        write(doc, paragraphs)
+        kb = make_kb()
+        kb.add_documents([doc], document_type="txt", save_path=store, source_names=["cmr.txt"])
+
+        def offsets(kb):
+            docs = [kb.vector_store.docstore.search(doc_id) for doc_id in kb.vector_store.index_to_docstore_id.values()]
+            return {d.page_content: d.metadata["start_offset"] for d in docs}
+
+        before = offsets(kb)
+        assert len(kb.metadata_index) == 4
+        time.sleep(1.1)
+        cutoff = datetime.now().replace(microsecond=0)
+        # A paragraph inserted at the start moves every existing chunk
+        write(doc, ["Regulation 0A: newly inserted rule on haul roads."] + paragraphs)
+        summary = kb.add_documents([doc], document_type="txt", save_path=store, source_names=["cmr.txt"])
+        assert summary["added_chunks"] == 1
+        assert kb.embeddings.embedded == 5
+
+        after = offsets(kb)
+        assert all(after[text] > offset for text, offset in before.items())
+        assert kb.metadata_index.mask({"timestamp": {"gte": cutoff}}).sum() == 5
+        reloaded = make_kb()
+        reloaded.load_vector_store(store)
+        assert offsets(reloaded) == after
+
+
+def test_knowledge_bases_sharing_a_store_keep_each_others_documents():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "faiss_index")
+        docs = {}
+        for name in ("cmr.txt", "smp.txt", "dgms.txt"):
+            docs[name] = os.path.join(tmp, name)
+            write(docs[name], [f"{name} rule {i}: keep the haul road clear." for i in range(2)])
+
+        # Two job workers, each holding its own knowledge base, ingest one after the other
+        first, second = make_kb(), make_kb()
+        first.add_documents([docs["cmr.txt"]], document_type="txt", save_path=store, source_names=["cmr.txt"])
+        second.add_documents([docs["smp.txt"]], document_type="txt", save_path=store, source_names=["smp.txt"])
+        first.add_documents([docs["dgms.txt"]], document_type="txt", save_path=store, source_names=["dgms.txt"])
+
+        reloaded = make_kb()
+        reloaded.load_vector_store(store)
+        sources = {reloaded.vector_store.docstore.search(doc_id).metadata["source"]
+                   for doc_id in reloaded.vector_store.index_to_docstore_id.values()}
+        assert sources == {"cmr.txt", "smp.txt", "dgms.txt"}
+        assert set(reloaded.manifest.documents) == {"cmr.txt", "smp.txt", "dgms.txt"}
+        assert len(reloaded.bm25) == reloaded.vector_store.index.ntotal == 6
+
+
+if __name__ == "__main__":
+    test_incremental_ingestion()
+    test_reused_chunks_get_new_metadata()
+    test_knowledge_bases_sharing_a_store_keep_each_others_documents()
+    print("Incremental ingestion tests passed.")
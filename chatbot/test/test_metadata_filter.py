@@ -0,0 +1,104 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+from chatbot.db.ann_index import HNSW, IVF_FLAT, IndexSpec, convert_store, search_positions
+from chatbot.db.metadata_index import MetadataIndex
+from chatbot.db.knowledge_base import KnowledgeBase
+
+
+class HashEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [np.random.default_rng(abs(hash(t)) % (2 ** 32)).normal(size=16).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def write(tmp, name, paragraphs):
+    path = os.path.join(tmp, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs))
+    return path
+
+
+def test_mask_combines_categorical_and_range_conditions():
+    now = datetime.now()
+    index = MetadataIndex()
+    index.append(["a", "b", "c", "d"], [
+        {"source": "cmr.pdf", "document_type": "pdf", "page_number": 1, "timestamp": (now - timedelta(days=3)).isoformat()},
+        {"source": "cmr.pdf", "document_type": "pdf", "page_number": 7, "timestamp": now.isoformat()},
+        {"source": "live.txt", "document_type": "txt", "page_number": None, "timestamp": now.isoformat()},
+        {"source": "dgms.pdf", "document_type": "pdf", "page_number": 2},
+    ])
+    assert index.mask({"source": "cmr.pdf"}).tolist() == [True, True, False, False]
+    assert index.mask({"source": ["cmr.pdf", "dgms.pdf"], "page_number": {"lte": 2}}).tolist() == \
+        [True, False, False, True]
+    assert index.mask({"timestamp": {"gte": now - timedelta(hours=24)}}).tolist() == [False, True, True, False]
+    assert not index.mask({"source": "unknown.pdf"}).any()
+
+    index.remove(["b"])
+    assert index.ids == ["a", "c", "d"]
+    assert index.mask({"document_type": "pdf"}).tolist() == [True, False, True]
+
+    with pytest.raises(ValueError):
+        index.mask({"author": "x"})
+    with pytest.raises(ValueError):
+        index.mask({"page_number": {"between": 3}})
+
+
+@pytest.mark.parametrize("kind", [IVF_FLAT, HNSW])
+def test_search_positions_only_returns_selected_vectors(kind):
+    texts = [f"chunk {i}" for i in range(400)]
+    store = FAISS.from_texts(texts, HashEmbeddings(), ids=texts)
+    assert convert_store(store, IndexSpec(kind=kind, nprobe=64))
+    query = np.array([HashEmbeddings().embed_query("chunk 7")], dtype=np.float32)
+    positions = np.arange(0, 400, 2)
+    _, labels = search_positions(store.index, query, 5, positions)
+    assert all(label % 2 == 0 for label in labels[0] if label != -1)
+    assert 7 not in labels[0]
+
+
+def test_filtered_query_is_restricted_and_survives_reload():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "faiss_index")
+        cmr = write(tmp, "cmr.txt", [f"CMR rule {i}: blasting near the dragline." for i in range(6)])
+        live = write(tmp, "live.txt", [f"Live reading {i}: blasting near the dragline." for i in range(6)])
+
+        kb = KnowledgeBase(chunk_size=50, chunk_overlap=0, embedding_cache_dir=None, embeddings=HashEmbeddings())
+        kb.add_documents([cmr, live], document_type="txt", save_path=store)
+
+        results = kb.query_vector_store("blasting dragline", top_k=4, filters={"source": cmr})
+        assert len(results) == 4 and all(metadata["source"] == cmr for _, metadata in results)
+        dense = kb.query_vector_store("blasting dragline", top_k=3, hybrid=False, filters={"source": live})
+        assert len(dense) == 3 and all(metadata["source"] == live for _, metadata in dense)
+        recent = kb.query_vector_store("dragline", top_k=20,
+                                       filters={"timestamp": {"gte": datetime.now() - timedelta(hours=24)}})
+        assert len(recent) == 12
+        assert kb.query_vector_store("dragline", filters={"timestamp": {"lt": datetime.now() - timedelta(hours=24)}}) == []
+
+        # Re-ingesting a changed file keeps the filter index in sync with the vector positions
+        write(tmp, "live.txt", [f"Live reading {i}: methane level normal." for i in range(3)])
+        kb.add_documents([live], document_type="txt", save_path=store)
+        live_results = kb.query_vector_store("methane", top_k=10, filters={"source": live})
+        assert sorted(text for text, _ in live_results) == [f"Live reading {i}: methane level normal." for i in range(3)]
+
+        reloaded = KnowledgeBase(embedding_cache_dir=None, embeddings=HashEmbeddings())
+        reloaded.load_vector_store(store)
+        results = reloaded.query_vector_store("dragline", top_k=10, filters={"source": cmr})
+        assert len(results) == 6 and all(metadata["source"] == cmr for _, metadata in results)
+
+
+if __name__ == "__main__":
+    test_mask_combines_categorical_and_range_conditions()
+    test_search_positions_only_returns_selected_vectors(IVF_FLAT)
+    test_search_positions_only_returns_selected_vectors(HNSW)
+    test_filtered_query_is_restricted_and_survives_reload()
+    print("Metadata filter tests passed.")
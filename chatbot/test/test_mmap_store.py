@@ -0,0 +1,108 @@
+import os
+import tempfile
+import threading
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from chatbot.db.ann_index import IndexSpec, HNSW, convert_store, delete_from_store
+from chatbot.db.mmap_store import MmapFlatIndex, SQLiteDocstore, load_store, open_store, read_generation, save_store
+
+
+class HashEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [np.random.default_rng(abs(hash(t)) % (2 ** 32)).normal(size=16).tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_store(n=50):
+    texts = [f"chunk {i}" for i in range(n)]
+    metadatas = [{"source": "cmr.pdf", "page_number": i // 5 + 1} for i in range(n)]
+    return FAISS.from_texts(texts, HashEmbeddings(), metadatas=metadatas, ids=[f"id-{i}" for i in range(n)])
+
+
+def test_round_trip_without_pickle():
+    with tempfile.TemporaryDirectory() as tmp:
+        original = make_store()
+        save_store(original, tmp)
+        assert not os.path.exists(os.path.join(tmp, "index.pkl"))
+
+        loaded = load_store(tmp, HashEmbeddings())
+        assert isinstance(loaded.index, MmapFlatIndex) and isinstance(loaded.docstore, SQLiteDocstore)
+        assert isinstance(loaded.index.reconstruct_n(0, 1), np.ndarray)
+        for query in ("chunk 3", "chunk 42"):
+            expected = original.similarity_search_with_score(query, k=3)
+            found = loaded.similarity_search_with_score(query, k=3)
+            assert [d.page_content for d, _ in found] == [d.page_content for d, _ in expected]
+            assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-4)
+        assert loaded.similarity_search("chunk 12", k=1)[0].metadata == {"source": "cmr.pdf", "page_number": 3}
+
+
+def test_updates_are_saved_as_new_generation():
+    with tempfile.TemporaryDirectory() as tmp:
+        save_store(make_store(), tmp)
+        store = load_store(tmp, HashEmbeddings())
+        store.add_texts(["chunk new"], metadatas=[{"source": "smp.pdf"}], ids=["id-new"])
+        delete_from_store(store, ["id-3"])
+        save_store(store, tmp)
+        save_store(store, tmp)
+
+        reloaded = open_store(tmp, HashEmbeddings())
+        assert reloaded.index.ntotal == 50
+        assert reloaded.similarity_search("chunk new", k=1)[0].page_content == "chunk new"
+        assert reloaded.similarity_search("chunk 3", k=1)[0].page_content != "chunk 3"
+        # Only the current and the previous generation are kept
+        assert sorted(f for f in os.listdir(tmp) if f.startswith("vectors.")) == ["vectors.2.f32", "vectors.3.f32"]
+
+
+def test_approximate_index_is_saved():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(200)
+        convert_store(store, IndexSpec(kind=HNSW))
+        save_store(store, tmp)
+        loaded = load_store(tmp, HashEmbeddings())
+        assert not isinstance(loaded.index, MmapFlatIndex)
+        assert loaded.similarity_search("chunk 7", k=1)[0].page_content == "chunk 7"
+
+
+def test_saved_additions_are_not_kept_in_memory():
+    with tempfile.TemporaryDirectory() as tmp:
+        save_store(make_store(), tmp)
+        store = load_store(tmp, HashEmbeddings())
+        store.add_texts(["chunk new"], metadatas=[{"source": "smp.pdf"}], ids=["id-new"])
+        assert "id-new" in store.docstore._added
+        save_store(store, tmp)
+
+        assert isinstance(store.docstore, SQLiteDocstore) and not store.docstore._added
+        assert isinstance(store.index._vectors, np.memmap)
+        assert store.similarity_search("chunk new", k=1)[0].page_content == "chunk new"
+
+
+def test_concurrent_saves_get_distinct_generations():
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = [make_store(20), make_store(30)]
+
+        def save_repeatedly(store):
+            for _ in range(5):
+                save_store(store, tmp)
+
+        threads = [threading.Thread(target=save_repeatedly, args=(store,)) for store in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert read_generation(tmp) == 10
+        loaded = load_store(tmp, HashEmbeddings())
+        assert loaded.index.ntotal in (20, 30)
+        assert loaded.similarity_search("chunk 5", k=1)[0].page_content == "chunk 5"
+
+
+if __name__ == "__main__":
+    test_round_trip_without_pickle()
+    test_updates_are_saved_as_new_generation()
+    test_approximate_index_is_saved()
+    test_saved_additions_are_not_kept_in_memory()
+    test_concurrent_saves_get_distinct_generations()
+    print("Memory-mapped store tests passed.")
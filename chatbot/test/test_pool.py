@@ -0,0 +1,60 @@
+import os
+import time
+import tempfile
+from chatbot.core.pool import ChatbotPool
+
+
+class DummyEngine:
+    def __init__(self, api_key, path):
+        self.api_key = api_key
+        self.path = path
+
+
+def test_pool_reuses_and_evicts():
+    pool = ChatbotPool(max_engines=2, factory=DummyEngine)
+    with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b, tempfile.TemporaryDirectory() as c:
+        first = pool.get("key", a)
+        assert pool.get("key", a) is first
+        pool.get("key", b)
+        pool.get("key", c)
+
+        # 'a' was least recently used and has been evicted
+        assert pool.get("key", a) is not first
+        assert pool.stats["evictions"] >= 1
+
+
+def test_pool_hot_swaps_on_index_change():
+    pool = ChatbotPool(factory=DummyEngine)
+    with tempfile.TemporaryDirectory() as path:
+        index_file = os.path.join(path, "index.faiss")
+        with open(index_file, "wb") as f:
+            f.write(b"v1")
+        first = pool.get("key", path)
+
+        time.sleep(0.01)
+        with open(index_file, "wb") as f:
+            f.write(b"version2")
+        second = pool.get("key", path)
+
+        assert second is not first
+        assert pool.stats["reloads"] == 1
+
+
+def test_session_histories_are_isolated():
+    pool = ChatbotPool(max_history=2, factory=DummyEngine)
+    history = pool.session_history("key-a", "supervisor-1")
+    history.extend(["a", "b", "c"])
+    pool.trim_history(history)
+
+    assert pool.session_history("key-a", "supervisor-1") == ["b", "c"]
+    assert pool.session_history("key-a", "supervisor-2") == []
+    assert pool.session_history("key-a", None) == []
+    # The same session id under another API key is a different conversation
+    assert pool.session_history("key-b", "supervisor-1") == []
+
+
+if __name__ == "__main__":
+    test_pool_reuses_and_evicts()
+    test_pool_hot_swaps_on_index_change()
+    test_session_histories_are_isolated()
+    print("All pool tests passed.")
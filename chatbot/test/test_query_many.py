@@ -0,0 +1,80 @@
+import os
+import tempfile
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+from chatbot.db.embedding_dispatcher import EmbeddingDispatcher, TokenBucket
+from chatbot.db.knowledge_base import KnowledgeBase
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic embeddings that count how often queries are embedded."""
+
+    def __init__(self):
+        self.query_calls = 0
+        self.batch_calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [np.random.default_rng(abs(hash(t)) % (2 ** 32)).normal(size=16).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.query_calls += 1
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        self.batch_calls += 1
+        return self.embed_documents(texts)
+
+
+def build_kb(tmp, embeddings):
+    doc = os.path.join(tmp, "smp.txt")
+    with open(doc, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(f"Activity {i}: dragline and dumper hazard controls." for i in range(12)))
+    kb = KnowledgeBase(chunk_size=60, chunk_overlap=0, embedding_cache_dir=None, embeddings=embeddings)
+    kb.add_documents([doc], document_type="txt", save_path=os.path.join(tmp, "faiss_index"))
+    return kb
+
+
+def test_query_many_matches_single_queries_with_one_embedding_call():
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings = CountingEmbeddings()
+        kb = build_kb(tmp, embeddings)
+        queries = ["Activity 3", "dumper hazard", "Activity 3", "Activity 10 dragline"]
+
+        for hybrid in (False, True):
+            embeddings.batch_calls = 0
+            batched = kb.query_many(queries, top_k=3, hybrid=hybrid)
+            assert embeddings.batch_calls == 1
+            assert len(batched) == len(queries)
+            assert batched[0] == batched[2]
+            for query, results in zip(queries, batched):
+                assert results == kb.query_vector_store(query, top_k=3, hybrid=hybrid)
+
+        assert kb.query_many([]) == []
+
+
+def test_query_many_applies_filters_to_every_query():
+    with tempfile.TemporaryDirectory() as tmp:
+        kb = build_kb(tmp, CountingEmbeddings())
+        assert kb.query_many(["Activity 1", "Activity 2"], filters={"source": "other.pdf"}) == [[], []]
+        results = kb.query_many(["Activity 1", "Activity 2"], filters={"document_type": "txt"})
+        assert all(len(r) == 5 and all(m["document_type"] == "txt" for _, m in r) for r in results)
+
+
+def test_dispatcher_batches_queries():
+    inner = CountingEmbeddings()
+    dispatcher = EmbeddingDispatcher(inner, batch_size=2, rate_limiter=TokenBucket(1000))
+    vectors = dispatcher.embed_queries(["a", "b", "c"])
+    assert vectors == inner.embed_documents(["a", "b", "c"])
+    assert inner.batch_calls == 2 and inner.query_calls == 0
+    assert dispatcher.stats["requests"] == 2
+
+
+if __name__ == "__main__":
+    test_query_many_matches_single_queries_with_one_embedding_call()
+    test_query_many_applies_filters_to_every_query()
+    test_dispatcher_batches_queries()
+    print("Batched retrieval tests passed.")
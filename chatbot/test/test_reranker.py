@@ -0,0 +1,88 @@
+import os
+import time
+import tempfile
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+from chatbot.db.reranker import CrossEncoderReranker
+from chatbot.db.knowledge_base import KnowledgeBase
+
+
+class KeywordCrossEncoder:
+    """Scores a pair by how often the chunk mentions the query's last word."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.pairs = 0
+
+    def predict(self, pairs):
+        time.sleep(self.delay)
+        self.pairs += len(pairs)
+        return np.array([text.lower().count(query.split()[-1].lower()) for query, text in pairs], dtype=float)
+
+
+class HashEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [np.random.default_rng(abs(hash(t)) % (2 ** 32)).normal(size=16).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+CANDIDATES = [("dumper haulage road", {}), ("dragline dragline bench", {}), ("dragline swing", {})]
+
+
+def test_rerank_orders_by_score_and_caches_pairs():
+    model = KeywordCrossEncoder()
+    reranker = CrossEncoderReranker(model=model, budget_ms=1000)
+    assert [text for text, _ in reranker.rerank("check the dragline", CANDIDATES, 2)] == \
+        ["dragline dragline bench", "dragline swing"]
+    assert model.pairs == 3
+
+    reranker.rerank("check  the dragline", CANDIDATES, 2)
+    assert model.pairs == 3
+    assert reranker.stats["cache_hits"] == 3 and reranker.stats["reranked"] == 2
+
+
+def test_rerank_keeps_vector_order_when_over_budget():
+    model = KeywordCrossEncoder(delay=0.05)
+    reranker = CrossEncoderReranker(model=model, budget_ms=10, batch_size=1)
+    assert reranker.rerank("dragline", CANDIDATES, 2) == CANDIDATES[:2]
+    assert reranker.stats["fallbacks"] == 1
+
+    # Pairs scored before the budget ran out are reused by the next query
+    reranker.rerank("dragline", CANDIDATES, 2)
+    assert reranker.stats["cache_hits"] >= 1
+
+
+def test_knowledge_base_reranks_over_fetched_candidates():
+    with tempfile.TemporaryDirectory() as tmp:
+        doc = os.path.join(tmp, "smp.txt")
+        paragraphs = [f"Rule {i}: keep the haul road clear." for i in range(10)]
+        paragraphs[7] = "Rule 7: berm berm berm at every dump edge."
+        with open(doc, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+
+        reranker = CrossEncoderReranker(model=KeywordCrossEncoder(), budget_ms=1000)
+        kb = KnowledgeBase(chunk_size=50, chunk_overlap=0, embedding_cache_dir=None,
+                           embeddings=HashEmbeddings(), reranker=reranker)
+        kb.hybrid_search = False
+        kb.add_documents([doc], document_type="txt", save_path=os.path.join(tmp, "faiss_index"))
+        assert kb.query_vector_store("where is the berm", top_k=1)[0][0] == paragraphs[7]
+        assert len(kb.query_vector_store("where is the berm", top_k=3, rerank=False)) == 3
+
+        plain = KnowledgeBase(embedding_cache_dir=None, embeddings=HashEmbeddings())
+        plain.vector_store = kb.vector_store
+        with pytest.raises(ValueError):
+            plain.query_vector_store("berm", rerank=True)
+
+
+if __name__ == "__main__":
+    test_rerank_orders_by_score_and_caches_pairs()
+    test_rerank_keeps_vector_order_when_over_budget()
+    test_knowledge_base_reranks_over_fetched_candidates()
+    print("Reranker tests passed.")
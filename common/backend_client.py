@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Freshness of cached responses in seconds, by endpoint path. Shift and mine data change
+# a few times per shift; rounds and SMP records are followed more closely.
+ENDPOINT_TTLS = {
+    "/api/v1/shift": 300,
+    "/api/v1/mine": 3600,
+    "/api/v1/section": 3600,
+    "/api/v1/supervisor": 600,
+    "/api/v1/user": 600,
+    "/api/v1/smp": 60,
+    "/api/v1/rounds": 30,
+}
+
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+@dataclass
+class CacheEntry:
+    """
+    A cached backend response. The body is kept as JSON bytes and decoded for every
+    caller, so a caller changing its data cannot corrupt the cache for the others.
+
+    Attributes:
+        body (bytes): JSON body, or the error dict of a failed request as JSON.
+        fetched_at (float): When the response was fetched or last revalidated (monotonic seconds).
+        etag (str, optional): ETag validator of the response.
+        last_modified (str, optional): Last-Modified validator of the response.
+        error (bool): Whether the entry records a failure.
+    """
+    body: bytes
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    error: bool = False
+
+
+def _error(message: str, details: Optional[str] = None) -> Dict[str, str]:
+    # Same shape as the error dicts data_requester always returned
+    error = {"error": message}
+    if details is not None:
+        error["details"] = details
+    return error
+
+
+class BackendClient:
+    """
+    HTTP client for the mine backend APIs, shared by the chatbot, SMP and form builder.
+
+    Connections are kept alive in a pooled requests session (blocking calls) and a
+    pooled httpx client per event loop (async calls). Failed requests are retried with
+    exponential backoff. Successful GET responses are cached per URL: a fresh entry is
+    served without a request; a stale entry is served immediately while a single
+    background request revalidates it with its ETag/Last-Modified (stale-while-revalidate);
+    past the stale window the request is made inline. When the backend is down, the last
+    good response is served, and a failure is remembered for a short time so an
+    unreachable backend does not cost a timeout on every call.
+
+    Attributes:
+        stats (dict): 'hits' (fresh), 'stale_hits', 'misses', 'revalidated' (304 responses),
+            'retries' and 'errors'
+    """
+
+    def __init__(self, timeout: float = 5.0, retries: int = 2, backoff: float = 0.2,
+                 default_ttl: float = 60.0, stale_ttl: float = 600.0, error_ttl: float = 15.0,
+                 endpoint_ttls: Optional[Dict[str, float]] = None, pool_size: int = 10, max_entries: int = 512):
+        """
+        Args:
+            timeout (float): Request timeout in seconds.
+            retries (int): Retries after a failed attempt (connection errors, timeouts, 429 and 5xx).
+            backoff (float): Delay before the first retry in seconds, doubled for each next one.
+            default_ttl (float): Freshness of responses from endpoints not in endpoint_ttls (0 disables caching).
+            stale_ttl (float): How long past its freshness an entry is still served while it is revalidated.
+            error_ttl (float): How long a failure is served before the endpoint is tried again.
+            endpoint_ttls (dict, optional): Freshness by endpoint path (defaults to ENDPOINT_TTLS).
+            pool_size (int): Connections kept alive per host.
+            max_entries (int): Maximum number of cached responses.
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = error_ttl
+        self.endpoint_ttls = ENDPOINT_TTLS if endpoint_ttls is None else endpoint_ttls
+        self.pool_size = pool_size
+        self.max_entries = max_entries
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._async_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+        self._cache: Dict[Tuple, CacheEntry] = {}
+        self._revalidating: set = set()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "stale_hits": 0, "misses": 0, "revalidated": 0,
+                                      "retries": 0, "errors": 0}
+
+    def ttl(self, url: str) -> float:
+        """Freshness of an endpoint's responses, matched on the longest configured path in the URL."""
+        path = httpx.URL(url).path.rstrip("/")
+        matches = [prefix for prefix in self.endpoint_ttls if path == prefix or path.startswith(prefix + "/")]
+        return self.endpoint_ttls[max(matches, key=len)] if matches else self.default_ttl
+
+    def _key(self, url: str, headers: Optional[Dict[str, str]]) -> Tuple:
+        return url, tuple(sorted((headers or {}).items()))
+
+    def _lookup(self, key: Tuple, ttl: float) -> Tuple[Optional[CacheEntry], str]:
+        """Return the cached entry and whether it is 'fresh', 'stale' (serve and revalidate) or 'expired'."""
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is None or ttl <= 0:
+            return entry, "expired"
+        age = time.monotonic() - entry.fetched_at
+        if entry.error:
+            return entry, "fresh" if age < self.error_ttl else "expired"
+        if age < ttl:
+            return entry, "fresh"
+        if age < ttl + self.stale_ttl:
+            return entry, "stale"
+        return entry, "expired"
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _conditional_headers(self, headers: Optional[Dict[str, str]], entry: Optional[CacheEntry]) -> Dict[str, str]:
+        request_headers = dict(headers or {})
+        if entry is not None and not entry.error:
+            if entry.etag:
+                request_headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request_headers["If-Modified-Since"] = entry.last_modified
+        return request_headers
+
+    @staticmethod
+    def _serve(entry: CacheEntry) -> Any:
+        # A fresh copy for every caller
+        return json.loads(entry.body)
+
+    def _store(self, key: Tuple, entry: Optional[CacheEntry], status: Optional[int], body: Optional[bytes],
+               headers: Any, error: Optional[Dict[str, str]], ttl: float) -> Any:
+        """Record the outcome of a request and return the data to serve."""
+        now = time.monotonic()
+        data = None
+        if status == 200:
+            try:
+                data = json.loads(body)
+            except ValueError as e:
+                status, error = None, _error(f"An exception occurred: {str(e)}")
+
+        if status == 304 and entry is not None and not entry.error:
+            self._count("revalidated")
+            new_entry = CacheEntry(entry.body, now, entry.etag, entry.last_modified)
+            data = self._serve(new_entry)
+        elif status == 200:
+            new_entry = CacheEntry(body, now, headers.get("ETag"), headers.get("Last-Modified"))
+        else:
+            self._count("errors")
+            if entry is not None and not entry.error:
+                # Serve the last good response while the backend is failing
+                logging.warning(f"Backend request for {key[0]} failed, serving cached data: {error['error']}")
+                return self._serve(entry)
+            new_entry = CacheEntry(json.dumps(error).encode("utf-8"), now, error=True)
+            data = error
+
+        if ttl > 0:
+            with self._lock:
+                self._cache[key] = new_entry
+                if len(self._cache) > self.max_entries:
+                    oldest = min(self._cache, key=lambda k: self._cache[k].fetched_at)
+                    del self._cache[oldest]
+        return data
+
+    def _fetch(self, url: str, headers: Optional[Dict[str, str]], entry: Optional[CacheEntry],
+               timeout: Optional[float]) -> Tuple[Optional[int], Any, Any, Optional[Dict[str, str]]]:
+        request_headers = self._conditional_headers(headers, entry)
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count("retries")
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                response = self._session.get(url, headers=request_headers, timeout=timeout or self.timeout)
+            except requests.RequestException as e:
+                error = _error(f"An exception occurred: {str(e)}")
+                continue
+            if response.status_code in RETRY_STATUS:
+                error = _error(f"Failed to retrieve data. Status Code: {response.status_code}", response.text)
+                continue
+            if response.status_code in (200, 304):
+                body = response.content if response.status_code == 200 else None
+                return response.status_code, body, response.headers, None
+            return None, None, None, _error(f"Failed to retrieve data. Status Code: {response.status_code}",
+                                            response.text)
+        return None, None, None, error
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> Any:
+        """
+        Fetch a GET endpoint, from the cache when possible.
+
+        Args:
+            url (str): The URL of the GET endpoint.
+            headers (dict, optional): Headers to include in the request (e.g., for authentication).
+            timeout (float, optional): Request timeout in seconds (defaults to the client's).
+
+        Returns:
+            The parsed JSON response, or an error dict with 'error' (and 'details').
+        """
+        key, ttl = self._key(url, headers), self.ttl(url)
+        entry, state = self._lookup(key, ttl)
+        if state == "fresh":
+            self._count("hits")
+            return self._serve(entry)
+        if state == "stale":
+            self._count("stale_hits")
+            if self._start_revalidation(key):
+                threading.Thread(target=self._revalidate, args=(key, url, headers, entry, ttl), daemon=True).start()
+            return self._serve(entry)
+        self._count("misses")
+        return self._store(key, entry, *self._fetch(url, headers, entry, timeout), ttl)
+
+    def _start_revalidation(self, key: Tuple) -> bool:
+        # One background revalidation per URL at a time
+        with self._lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+            return True
+
+    def _revalidate(self, key: Tuple, url: str, headers: Optional[Dict[str, str]], entry: CacheEntry,
+                    ttl: float) -> None:
+        try:
+            self._store(key, entry, *self._fetch(url, headers, entry, None), ttl)
+        finally:
+            with self._lock:
+                self._revalidating.discard(key)
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # httpx clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None or client.is_closed:
+                for closed_loop in [other for other in self._async_clients if other.is_closed()]:
+                    del self._async_clients[closed_loop]
+                client = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(
+                    max_connections=self.pool_size * 2, max_keepalive_connections=self.pool_size))
+                self._async_clients[loop] = client
+        return client
+
+    async def _afetch(self, url: str, headers: Optional[Dict[str, str]], entry: Optional[CacheEntry],
+                      timeout: Optional[float]) -> Tuple[Optional[int], Any, Any, Optional[Dict[str, str]]]:
+        request_headers = self._conditional_headers(headers, entry)
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count("retries")
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                response = await self._async_client().get(url, headers=request_headers,
+                                                          timeout=timeout or self.timeout)
+            except httpx.HTTPError as e:
+                error = _error(f"An exception occurred: {str(e) or type(e).__name__}")
+                continue
+            if response.status_code in RETRY_STATUS:
+                error = _error(f"Failed to retrieve data. Status Code: {response.status_code}", response.text)
+                continue
+            if response.status_code in (200, 304):
+                body = response.content if response.status_code == 200 else None
+                return response.status_code, body, response.headers, None
+            return None, None, None, _error(f"Failed to retrieve data. Status Code: {response.status_code}",
+                                            response.text)
+        return None, None, None, error
+
+    async def aget(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> Any:
+        """
+        Async variant of get that does not block the event loop. Stale entries are
+        revalidated in a background task.
+        """
+        key, ttl = self._key(url, headers), self.ttl(url)
+        entry, state = self._lookup(key, ttl)
+        if state == "fresh":
+            self._count("hits")
+            return self._serve(entry)
+        if state == "stale":
+            self._count("stale_hits")
+            if self._start_revalidation(key):
+                asyncio.ensure_future(self._arevalidate(key, url, headers, entry, ttl))
+            return self._serve(entry)
+        self._count("misses")
+        return self._store(key, entry, *(await self._afetch(url, headers, entry, timeout)), ttl)
+
+    async def _arevalidate(self, key: Tuple, url: str, headers: Optional[Dict[str, str]], entry: CacheEntry,
+                           ttl: float) -> None:
+        try:
+            self._store(key, entry, *(await self._afetch(url, headers, entry, None)), ttl)
+        finally:
+            with self._lock:
+                self._revalidating.discard(key)
+
+    async def aclose(self) -> None:
+        """Close the async client of the running event loop (e.g. before asyncio.run returns)."""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def invalidate(self, url: Optional[str] = None) -> None:
+        """Drop the cached responses of a URL, or all of them."""
+        with self._lock:
+            for key in [key for key in self._cache if url is None or key[0] == url]:
+                del self._cache[key]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the counters with the share of calls served from the cache and the number of cached URLs."""
+        with self._lock:
+            served = self.stats["hits"] + self.stats["stale_hits"]
+            calls = served + self.stats["misses"]
+            return {**self.stats, "entries": len(self._cache), "hit_ratio": served / calls if calls else 0.0}
+
+
+@lru_cache()
+def get_backend_client() -> BackendClient:
+    """
+    Return the process-wide backend client, configured with BACKEND_TIMEOUT, BACKEND_RETRIES,
+    BACKEND_CACHE_TTL (default freshness), BACKEND_STALE_TTL and BACKEND_ERROR_TTL, in seconds.
+    """
+    return BackendClient(
+        timeout=float(os.getenv("BACKEND_TIMEOUT", 5.0)),
+        retries=int(os.getenv("BACKEND_RETRIES", 2)),
+        default_ttl=float(os.getenv("BACKEND_CACHE_TTL", 60.0)),
+        stale_ttl=float(os.getenv("BACKEND_STALE_TTL", 600.0)),
+        error_ttl=float(os.getenv("BACKEND_ERROR_TTL", 15.0)),
+    )
+
+
+def data_requester(endpoint_url, headers=None, timeout=None):
+    """
+    Fetches data from a GET endpoint through the shared backend client.
+
+    Args:
+        endpoint_url (str): The URL of the GET endpoint.
+        headers (dict, optional): Headers to include in the request (e.g., for authentication).
+        timeout (float, optional): Timeout of the request in seconds.
+
+    Returns:
+        dict: The data retrieved from the endpoint, or an error message.
+    """
+    return get_backend_client().get(endpoint_url, headers=headers, timeout=timeout)
+
+
+async def adata_requester(endpoint_url, headers=None, timeout=None):
+    """
+    Async variant of data_requester that does not block the event loop.
+    """
+    return await get_backend_client().aget(endpoint_url, headers=headers, timeout=timeout)
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import math
+import logging
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Gemini averages about four characters per token on English text
+CHARS_PER_TOKEN = 4
+
+# Default context budgets in tokens, overridable per chain with CONTEXT_BUDGET_<CHAIN>
+DEFAULT_BUDGETS = {
+    "chatbot": 1500,
+    "hazard_analysis": 2500,
+    "form": 2500,
+    "doc_to_form": 8000,
+}
+
+# Shortest suffix/prefix overlap treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 40
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without calling the model's tokenizer.
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Estimated token count.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def get_context_budget(chain: str) -> int:
+    """
+    Token budget of a chain's prompt context, read from CONTEXT_BUDGET_<CHAIN>
+    (e.g. CONTEXT_BUDGET_CHATBOT) and falling back to DEFAULT_BUDGETS.
+    """
+    value = os.getenv(f"CONTEXT_BUDGET_{chain.upper()}")
+    return int(value) if value else DEFAULT_BUDGETS[chain]
+
+
+def truncate_to_budget(text: str, max_tokens: int, counter: Callable[[str], int] = count_tokens) -> str:
+    """
+    Cut a text to a token budget at a word boundary, marking the cut.
+
+    Args:
+        text (str): Text to shorten.
+        max_tokens (int): Token budget.
+        counter (callable): Token counter.
+
+    Returns:
+        str: The text, or its longest prefix that fits followed by an ellipsis.
+    """
+    if counter(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if counter(text[:middle] + " ...") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    if " " in cut[len(cut) // 2:]:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + " ..." if cut else ""
+
+
+def _prune(value: Any, max_items: int, max_chars: int, drop_empty: bool) -> Any:
+    if isinstance(value, dict):
+        pruned = {}
+        for key, item in value.items():
+            item = _prune(item, max_items, max_chars, drop_empty)
+            if not drop_empty or item not in (None, "", [], {}):
+                pruned[key] = item
+        return pruned
+    if isinstance(value, list):
+        items = [_prune(item, max_items, max_chars, drop_empty) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"... {len(value) - max_items} more")
+        return items
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + "..."
+    return value
+
+
+def compress_json(payload: Any, max_tokens: Optional[int] = None, drop_empty: bool = True,
+                  counter: Callable[[str], int] = count_tokens) -> str:
+    """
+    Serialize a JSON payload compactly for a prompt: no whitespace, empty values
+    dropped, and, to meet a budget, long lists and strings shortened step by step.
+
+    Args:
+        payload (Any): JSON-serializable payload.
+        max_tokens (int, optional): Token budget of the serialized payload.
+        drop_empty (bool): Whether to drop null and empty values (keep them for example templates).
+        counter (callable): Token counter.
+
+    Returns:
+        str: Compact JSON text.
+    """
+    def dumps(value: Any) -> str:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    text = dumps(_prune(payload, 10 ** 9, 10 ** 9, drop_empty))
+    if max_tokens is None or counter(text) <= max_tokens:
+        return text
+    for max_items, max_chars in ((50, 500), (20, 200), (10, 100), (5, 60), (3, 40), (1, 20)):
+        text = dumps(_prune(payload, max_items, max_chars, drop_empty))
+        if counter(text) <= max_tokens:
+            return text
+    return truncate_to_budget(text, max_tokens, counter)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is a prefix of right."""
+    for size in range(min(len(left), len(right)), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+@dataclass
+class PackedContext:
+    """
+    Prompt context packed under a token budget.
+
+    Attributes:
+        text (str): The packed context.
+        tokens (int): Estimated tokens of the text.
+        budget (int): Token budget it was packed under.
+        packed (int): Number of chunks included.
+        deduplicated (int): Chunks dropped or trimmed as duplicates or overlaps.
+        dropped (int): Chunks left out because they did not fit.
+    """
+    text: str = ""
+    tokens: int = 0
+    budget: int = 0
+    packed: int = 0
+    deduplicated: int = 0
+    dropped: int = 0
+
+    def report(self) -> Dict[str, int]:
+        return {"tokens": self.tokens, "budget": self.budget, "packed": self.packed,
+                "deduplicated": self.deduplicated, "dropped": self.dropped}
+
+
+def pack_chunks(chunks: Iterable[Tuple[str, dict]], max_tokens: int,
+                format_chunk: Callable[[str, dict], str] = lambda text, metadata: text,
+                separator: str = "\n", counter: Callable[[str], int] = count_tokens) -> PackedContext:
+    """
+    Pack retrieved chunks into a prompt context, most relevant first, under a token budget.
+    Repeated chunks are dropped and the overlap adjacent chunks share from the text
+    splitter is removed, so the budget is spent on distinct text. A chunk that does not
+    fit is skipped and smaller, less relevant chunks may still fill the remaining room.
+
+    Args:
+        chunks (iterable): (text, metadata) pairs in relevance order.
+        max_tokens (int): Token budget of the packed context.
+        format_chunk (callable): Renders a chunk's text and metadata for the prompt.
+        separator (str): Text placed between chunks.
+        counter (callable): Token counter.
+
+    Returns:
+        PackedContext: The context and its size report.
+    """
+    result = PackedContext(budget=max_tokens)
+    kept: List[str] = []
+    parts: List[str] = []
+    used = 0
+    for text, metadata in chunks:
+        normalized = _normalize(text)
+        if not normalized or any(normalized in other for other in kept):
+            result.deduplicated += 1
+            continue
+        trimmed = normalized
+        for other in kept:
+            size = _overlap(other, trimmed)
+            if size:
+                trimmed = trimmed[size:].strip()
+            size = _overlap(trimmed, other)
+            if size:
+                trimmed = trimmed[:-size].strip()
+        if trimmed != normalized:
+            result.deduplicated += 1
+            if not trimmed:
+                continue
+
+        part = format_chunk(trimmed, metadata)
+        cost = counter(part) + (counter(separator) if parts else 0)
+        if used + cost > max_tokens:
+            result.dropped += 1
+            continue
+        kept.append(normalized)
+        parts.append(part)
+        used += cost
+
+    result.text = separator.join(parts)
+    result.tokens = counter(result.text) if parts else 0
+    result.packed = len(parts)
+    return result
+
+
+class ContextStats:
+    """
+    Packed context sizes per chain, for monitoring prompt cost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chains: Dict[str, Dict[str, int]] = {}
+
+    def record(self, chain: str, packed: PackedContext) -> None:
+        """Record the context packed for one request and log its size."""
+        logging.info(f"{chain} context: {packed.tokens}/{packed.budget} tokens, {packed.packed} chunks, "
+                     f"{packed.deduplicated} deduplicated, {packed.dropped} dropped")
+        with self._lock:
+            stats = self._chains.setdefault(chain, {"requests": 0, "total_tokens": 0, "max_tokens": 0,
+                                                    "deduplicated": 0, "dropped": 0})
+            stats["requests"] += 1
+            stats["total_tokens"] += packed.tokens
+            stats["max_tokens"] = max(stats["max_tokens"], packed.tokens)
+            stats["deduplicated"] += packed.deduplicated
+            stats["dropped"] += packed.dropped
+            stats["last"] = packed.report()
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Return the per-chain counters with the mean packed size."""
+        with self._lock:
+            return {chain: {**stats, "mean_tokens": stats["total_tokens"] / stats["requests"]}
+                    for chain, stats in self._chains.items()}
+
+
+@lru_cache()
+def get_context_stats() -> ContextStats:
+    """Return the process-wide context size statistics."""
+    return ContextStats()
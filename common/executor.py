@@ -0,0 +1,38 @@
+import os
+import asyncio
+import contextvars
+import functools
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+
+@lru_cache()
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide thread pool used for blocking work (FAISS search,
+    PDF extraction, Document AI calls) issued from async request handlers.
+
+    The pool size is bounded by the BLOCKING_POOL_SIZE environment variable.
+    """
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("BLOCKING_POOL_SIZE", 8)),
+        thread_name_prefix="blocking",
+    )
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking callable on the bounded thread pool without stalling the event loop.
+    The caller's context variables are carried over to the worker thread.
+
+    Args:
+        func (callable): The blocking function to run.
+        *args, **kwargs: Arguments forwarded to the function.
+
+    Returns:
+        The return value of the function.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_blocking_executor(), call)
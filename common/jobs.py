@@ -0,0 +1,381 @@
+"""
+Persistent background jobs for work that should not hold an HTTP request open
+(OCR, knowledge base ingestion, form generation, hazard library refresh).
+
+Jobs are rows in a SQLite queue. Worker processes claim queued jobs, run the
+handler registered for the job's kind and store its JSON result. Handlers report
+progress and check for cancellation through a JobContext. The queue survives
+restarts: jobs left running by a dead worker are queued again.
+
+Usage (run workers without the API):
+    python -m common.jobs --workers 2
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import argparse
+import importlib
+import threading
+import multiprocessing
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Handlers by job kind, as "module:function" so worker processes can import them
+HANDLERS = {
+    "ocr_form": "api.job_handlers:ocr_form",
+    "ingest": "api.job_handlers:ingest",
+    "generate_form": "api.job_handlers:generate_form",
+    "hazard_library": "api.job_handlers:hazard_library",
+}
+
+# Maximum number of jobs of a kind running at once across all workers.
+# Ingestion writes the shared vector store and the library refresh rewrites the
+# hazard analysis library, so each is serialized.
+KIND_CONCURRENCY = {"ingest": 1, "hazard_library": 1}
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled."""
+
+
+class JobStore:
+    """
+    SQLite-backed job queue shared by the API and the worker processes.
+    Every state change is a single transaction, so several processes can
+    submit, claim and update jobs concurrently.
+    """
+
+    def __init__(self, path: str = "data/jobs/jobs.sqlite", kind_concurrency: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            path (str): SQLite file of the queue.
+            kind_concurrency (dict, optional): Maximum running jobs per kind (defaults to KIND_CONCURRENCY).
+        """
+        self.path = path
+        self.kind_concurrency = KIND_CONCURRENCY if kind_concurrency is None else kind_concurrency
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._connection().execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                       id TEXT PRIMARY KEY,
+                       kind TEXT NOT NULL,
+                       status TEXT NOT NULL,
+                       payload TEXT NOT NULL,
+                       result TEXT,
+                       error TEXT,
+                       progress REAL NOT NULL DEFAULT 0,
+                       message TEXT,
+                       cancel_requested INTEGER NOT NULL DEFAULT 0,
+                       worker TEXT,
+                       created REAL NOT NULL,
+                       started REAL,
+                       finished REAL,
+                       heartbeat REAL
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection())
+
+    def submit(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> str:
+        """
+        Queue a job.
+
+        Args:
+            kind (str): Job kind, a key of HANDLERS.
+            payload (dict): JSON-serializable handler input.
+            job_id (str, optional): Id to use, e.g. when files were stored under it before submitting.
+
+        Returns:
+            str: The job id.
+        """
+        job_id = job_id or new_job_id()
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO jobs (id, kind, status, payload, created) VALUES (?, ?, ?, ?, ?)",
+                         (job_id, kind, QUEUED, json.dumps(payload), time.time()))
+        return job_id
+
+    def claim(self, worker: str, kinds: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest queued job that may run now and mark it running.
+
+        Args:
+            worker (str): Id of the claiming worker.
+            kinds (list, optional): Job kinds the worker can run (all if None).
+
+        Returns:
+            dict: The claimed job, or None if nothing can run.
+        """
+        with self._transaction() as conn:
+            running = dict(conn.execute("SELECT kind, COUNT(*) FROM jobs WHERE status = ? GROUP BY kind",
+                                        (RUNNING,)).fetchall())
+            blocked = [kind for kind, limit in self.kind_concurrency.items() if running.get(kind, 0) >= limit]
+            query = "SELECT * FROM jobs WHERE status = ?"
+            params: List[Any] = [QUEUED]
+            if kinds is not None:
+                query += f" AND kind IN ({','.join('?' * len(kinds))})"
+                params += kinds
+            if blocked:
+                query += f" AND kind NOT IN ({','.join('?' * len(blocked))})"
+                params += blocked
+            row = conn.execute(query + " ORDER BY created LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute("UPDATE jobs SET status = ?, worker = ?, started = ?, heartbeat = ? WHERE id = ?",
+                         (RUNNING, worker, now, now, row["id"]))
+        return self.get(row["id"])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job with its payload and result decoded, or None if it does not exist."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _decode(row) if row is not None else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the most recent jobs, optionally with a given status, without their results."""
+        query = "SELECT id, kind, status, progress, message, error, created, started, finished FROM jobs"
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        with self._transaction() as conn:
+            rows = conn.execute(query + " ORDER BY created DESC LIMIT ?", params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def progress(self, job_id: str, progress: float, message: Optional[str] = None) -> bool:
+        """
+        Record the progress of a running job (also its heartbeat).
+
+        Returns:
+            bool: Whether cancellation of the job has been requested.
+        """
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET progress = ?, message = COALESCE(?, message), heartbeat = ? WHERE id = ?",
+                         (progress, message, time.time(), job_id))
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def heartbeat(self, job_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        """Mark a job succeeded, failed or cancelled and store its result or error."""
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?,
+                       progress = CASE WHEN ? = ? THEN 1 ELSE progress END
+                   WHERE id = ?""",
+                (status, json.dumps(result, default=str) if result is not None else None, error, time.time(),
+                 status, SUCCEEDED, job_id))
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job. A queued job is cancelled at once; a running job is asked to stop
+        and ends as cancelled at its handler's next progress report.
+
+        Returns:
+            str: The job's status after the request, or None if it does not exist.
+        """
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+                         (CANCELLED, time.time(), job_id, QUEUED))
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def requeue_stale(self, timeout: float = 120.0) -> int:
+        """
+        Queue again the running jobs whose worker stopped sending heartbeats (e.g. it was killed).
+
+        Returns:
+            int: Number of jobs requeued.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, started = NULL WHERE status = ? AND heartbeat < ?",
+                (QUEUED, RUNNING, time.time() - timeout))
+        return cursor.rowcount
+
+
+class _Transaction:
+    """Context manager running a block of statements as one IMMEDIATE transaction."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+class JobContext:
+    """
+    Handed to a job handler to report progress. Every report also checks whether the
+    job was cancelled and raises JobCancelled if so, so handlers stop at their next step.
+    """
+
+    def __init__(self, store: JobStore, job: Dict[str, Any]):
+        self.store = store
+        self.job = job
+        self.job_id = job["id"]
+
+    def progress(self, fraction: float, message: Optional[str] = None) -> None:
+        """
+        Args:
+            fraction (float): Completed share of the job, from 0 to 1.
+            message (str, optional): Current step, shown to the client.
+        """
+        if self.store.progress(self.job_id, max(0.0, min(1.0, fraction)), message):
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+
+def resolve_handler(kind: str, handlers: Optional[Dict[str, str]] = None) -> Callable[[Dict[str, Any], JobContext], Any]:
+    """Import the handler of a job kind from its "module:function" path."""
+    module_name, function_name = (handlers or HANDLERS)[kind].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def run_job(store: JobStore, job: Dict[str, Any], handlers: Optional[Dict[str, str]] = None) -> None:
+    """Run one claimed job to completion and record its outcome."""
+    context = JobContext(store, job)
+    stop = threading.Event()
+
+    # Handlers can spend minutes in one step (a PDF extraction, a Gemini call), so a
+    # background heartbeat keeps the job from being taken for a dead worker's
+    def beat():
+        while not stop.wait(10):
+            store.heartbeat(job["id"])
+
+    threading.Thread(target=beat, daemon=True).start()
+    try:
+        result = resolve_handler(job["kind"], handlers)(job["payload"], context)
+        store.finish(job["id"], SUCCEEDED, result=result)
+    except JobCancelled:
+        store.finish(job["id"], CANCELLED)
+    except Exception as e:
+        logging.exception(f"Job {job['id']} ({job['kind']}) failed")
+        store.finish(job["id"], FAILED, error=str(e))
+    finally:
+        stop.set()
+
+
+def worker_loop(store_path: str, handlers: Optional[Dict[str, str]] = None, poll_interval: float = 0.5,
+                stop_event=None, stale_timeout: float = 120.0) -> None:
+    """
+    Claim and run jobs until stop_event is set. Runs in a worker process.
+
+    Args:
+        store_path (str): SQLite file of the queue.
+        handlers (dict, optional): Handlers by kind (defaults to HANDLERS).
+        poll_interval (float): Seconds between polls of an empty queue.
+        stop_event: multiprocessing.Event ending the loop after the current job.
+        stale_timeout (float): Heartbeat age after which a running job is requeued.
+    """
+    store = JobStore(store_path)
+    worker = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    kinds = list((handlers or HANDLERS).keys())
+    while stop_event is None or not stop_event.is_set():
+        store.requeue_stale(stale_timeout)
+        job = store.claim(worker, kinds)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(store, job, handlers)
+
+
+class JobWorkerPool:
+    """
+    A fixed number of worker processes draining the job queue. Processes keep heavy
+    work (PDF parsing, embedding, OCR) off the API's event loop and threads and bound
+    how much of it runs at once.
+    """
+
+    def __init__(self, store_path: str = "data/jobs/jobs.sqlite", processes: int = 2,
+                 handlers: Optional[Dict[str, str]] = None, poll_interval: float = 0.5):
+        self.store_path = store_path
+        self.processes = processes
+        self.handlers = handlers
+        self.poll_interval = poll_interval
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self._workers: List[multiprocessing.Process] = []
+
+    def start(self) -> None:
+        for _ in range(self.processes):
+            process = self._context.Process(target=worker_loop, daemon=True,
+                                            args=(self.store_path, self.handlers, self.poll_interval, self._stop))
+            process.start()
+            self._workers.append(process)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Let the workers finish their current job, terminating those still busy after the timeout."""
+        self._stop.set()
+        for process in self._workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []
+
+
+@lru_cache()
+def get_job_store() -> JobStore:
+    """Return the process-wide job queue, stored at JOB_STORE_PATH (defaults to data/jobs/jobs.sqlite)."""
+    return JobStore(os.getenv("JOB_STORE_PATH", "data/jobs/jobs.sqlite"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", "2")), help="Worker processes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    pool = JobWorkerPool(os.getenv("JOB_STORE_PATH", "data/jobs/jobs.sqlite"), processes=args.workers)
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
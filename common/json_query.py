@@ -0,0 +1,356 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Path tokens: a filter ("[?isActive==true]"), an index or wildcard ("[0]", "[*]") or a key ("data")
+_TOKEN = re.compile(r"\[\?([^\]]+)\]|\[(\*|-?\d+)\]|([^.\[\]]+)")
+# Filter expression: field, operator (== equal, != not equal, ~ contains, case-insensitive) and literal
+_FILTER = re.compile(r"^\s*([\w.]+)\s*(==|!=|~)\s*(.+?)\s*$")
+
+# Query words too common to tell records apart
+STOPWORDS = {"the", "and", "for", "with", "all", "from", "into", "that", "this", "are", "was", "what", "which",
+             "generate", "provide", "report", "current", "activity", "activities", "operation", "operations"}
+
+
+def _literal(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text.strip("'\"")
+
+
+@lru_cache(maxsize=1024)
+def compile_path(path: str) -> Tuple[tuple, ...]:
+    """
+    Parse a path expression once into steps.
+
+    Syntax: dotted keys ("data.shift"), indexes ("[0]", "[-1]"), wildcards ("[*]") and
+    filters on list items ("[?isActive==true]", "[?name!=Night]", "[?hazard~blast]").
+    A key reached through a list fans out over the list's items.
+
+    Args:
+        path (str): Path expression; empty for the data itself.
+
+    Returns:
+        tuple: Steps of ('key', name), ('index', i), ('all',) or ('filter', field, operator, literal).
+
+    Raises:
+        ValueError: If the path cannot be parsed.
+    """
+    steps = []
+    position = 0
+    path = (path or "").strip().lstrip("$").lstrip(".")
+    for match in _TOKEN.finditer(path):
+        if path[position:match.start()].strip(". "):
+            raise ValueError(f"Invalid path expression: {path}")
+        position = match.end()
+        condition, index, key = match.groups()
+        if condition is not None:
+            parsed = _FILTER.match(condition)
+            if parsed is None:
+                raise ValueError(f"Invalid filter in path expression: {condition}")
+            field, operator, literal = parsed.groups()
+            steps.append(("filter", tuple(field.split(".")), operator, _literal(literal)))
+        elif index == "*":
+            steps.append(("all",))
+        elif index is not None:
+            steps.append(("index", int(index)))
+        else:
+            steps.append(("key", key.strip()))
+    if path[position:].strip(". "):
+        raise ValueError(f"Invalid path expression: {path}")
+    return tuple(steps)
+
+
+def _field(item: Any, field: tuple) -> Any:
+    for key in field:
+        if not isinstance(item, dict):
+            return None
+        item = item.get(key)
+    return item
+
+
+def _test(value: Any, operator: str, literal: Any) -> bool:
+    if operator == "~":
+        return str(literal).lower() in str(value).lower()
+    equal = value == literal or (isinstance(value, str) and isinstance(literal, str) and value.lower() == literal.lower())
+    return equal if operator == "==" else not equal
+
+
+def select(data: Any, path: str) -> List[Any]:
+    """
+    Select values from JSON data with a path expression (see compile_path),
+    e.g. "data[*].hazard", "data[0].name" or "data[?isActive==true].name".
+
+    Args:
+        data (Any): Parsed JSON.
+        path (str): Path expression; empty for the data itself.
+
+    Returns:
+        list: The selected values (empty if the path does not exist).
+    """
+    values = [data]
+    for step in compile_path(path):
+        selected = []
+        kind = step[0]
+        for value in values:
+            if kind == "key":
+                items = value if isinstance(value, list) else [value]
+                selected.extend(item[step[1]] for item in items if isinstance(item, dict) and step[1] in item)
+            elif kind == "all":
+                selected.extend(value if isinstance(value, list) else [])
+            elif kind == "index":
+                if isinstance(value, list) and -len(value) <= step[1] < len(value):
+                    selected.append(value[step[1]])
+            else:
+                items = value if isinstance(value, list) else [value]
+                selected.extend(item for item in items if _test(_field(item, step[1]), step[2], step[3]))
+        values = selected
+    return values
+
+
+def keywords(text: str) -> List[str]:
+    """Distinctive lowercase words of a query (three letters or more, no stopwords)."""
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) >= 3 and word not in STOPWORDS]
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, dict):
+        return " ".join(_text(item) for item in value.values())
+    if isinstance(value, list):
+        return " ".join(_text(item) for item in value)
+    return str(value).lower()
+
+
+def filter_records(records: Iterable[Any], where: Optional[Dict[str, Any]] = None, match: Optional[str] = None,
+                   fields: Optional[List[str]] = None, limit: Optional[int] = None) -> List[Any]:
+    """
+    Filter and project records deterministically.
+
+    Args:
+        records (iterable): Records, usually the output of select.
+        where (dict, optional): Field values a record must have.
+        match (str, optional): Query whose keywords a record must mention, ranked by how many it mentions.
+        fields (list, optional): Fields to keep in each record.
+        limit (int, optional): Maximum number of records.
+
+    Returns:
+        list: The matching records.
+    """
+    records = [record for record in records
+               if not where or (isinstance(record, dict) and all(record.get(k) == v for k, v in where.items()))]
+    if match:
+        words = keywords(match)
+        scored = [(sum(word in _text(record) for word in words), i, record) for i, record in enumerate(records)]
+        records = [record for hits, _, record in sorted(scored, key=lambda item: (-item[0], item[1])) if hits]
+    if fields:
+        records = [{field: record[field] for field in fields if field in record} if isinstance(record, dict) else record
+                   for record in records]
+    return records[:limit] if limit is not None else records
+
+
+class JsonIndex:
+    """
+    Key-path index of a JSON payload, built in one walk. Every leaf is filed under its
+    path pattern with list positions generalized ("data[*].shift.name"), so pattern
+    lookups are dictionary reads and the patterns describe the payload's schema for
+    translating questions into paths.
+    """
+
+    def __init__(self, data: Any, max_samples: int = 3):
+        """
+        Args:
+            data (Any): Parsed JSON.
+            max_samples (int): Distinct sample values kept per pattern for the schema summary.
+        """
+        self.data = data
+        self.paths: Dict[str, List[Any]] = {}
+        self.samples: Dict[str, List[Any]] = {}
+        self._walk(data, "", max_samples)
+        self.signature = hashlib.sha256("\n".join(sorted(self.paths)).encode("utf-8")).hexdigest()
+
+    def _walk(self, value: Any, pattern: str, max_samples: int) -> None:
+        if isinstance(value, dict):
+            for key, item in value.items():
+                self._walk(item, f"{pattern}.{key}" if pattern else str(key), max_samples)
+        elif isinstance(value, list):
+            for item in value:
+                self._walk(item, f"{pattern}[*]", max_samples)
+        else:
+            self.paths.setdefault(pattern, []).append(value)
+            samples = self.samples.setdefault(pattern, [])
+            if len(samples) < max_samples and value not in samples:
+                samples.append(value)
+
+    def select(self, path: str) -> List[Any]:
+        """Select values with a path expression, reading indexed patterns directly."""
+        if path in self.paths:
+            return list(self.paths[path])
+        return select(self.data, path)
+
+    def schema(self, max_chars: int = 4000) -> str:
+        """Path patterns of the payload with sample values, one per line."""
+        lines = [f"{pattern}: {json.dumps(samples, default=str)[:120]}" for pattern, samples in self.samples.items()]
+        return "\n".join(lines)[:max_chars]
+
+
+TRANSLATION_PROMPT = '''Translate a question about a JSON document into one path expression that selects the answer.
+
+Path syntax: dotted keys (data.shift), indexes (data[0], data[-1]), all list items (data[*].name) and
+filters on list items: data[?isActive==true].name, data[?name!=Night].id, data[?hazard~blast] (~ is contains).
+
+Paths of the document with sample values:
+{schema}
+
+Question: {question}
+
+Return JSON only, in the format {{"path": "<path expression>"}}.'''
+
+
+class JsonQueryEngine:
+    """
+    Answers questions about backend payloads (shift, rounds, SMP, user data) locally.
+    A question is translated into a path expression with at most one LLM call; the
+    translation is cached per question and payload schema, so repeated questions are
+    answered by evaluating the compiled path without any LLM call. Key-path indexes
+    are cached per payload content, so questions about a payload the backend client
+    served before reuse its index instead of walking the payload again.
+
+    Attributes:
+        stats (dict): 'queries', translation cache 'hits', LLM 'translations' and 'index_hits'
+    """
+
+    def __init__(self, translate: Optional[Callable[[str], str]] = None, cache_size: int = 1024,
+                 index_cache_size: int = 64):
+        """
+        Args:
+            translate (callable, optional): Sends a prompt to the LLM and returns its text (Gemini by default).
+            cache_size (int): Maximum number of cached translations.
+            index_cache_size (int): Maximum number of cached payload indexes.
+        """
+        self._translate = translate
+        self.cache_size = cache_size
+        self.index_cache_size = index_cache_size
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._indexes: "OrderedDict[str, JsonIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"queries": 0, "hits": 0, "translations": 0, "index_hits": 0}
+
+    def index(self, data: Any) -> JsonIndex:
+        """
+        Key-path index of a payload, built once per distinct payload content.
+
+        Args:
+            data (Any): Parsed JSON.
+
+        Returns:
+            JsonIndex: The cached or newly built index.
+        """
+        text = json.dumps(data, sort_keys=True, default=str)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            index = self._indexes.get(digest)
+            if index is not None:
+                self._indexes.move_to_end(digest)
+                self.stats["index_hits"] += 1
+                return index
+
+        # Indexed from its own copy, so later changes to the caller's data cannot make it stale
+        index = JsonIndex(json.loads(text))
+        with self._lock:
+            self._indexes[digest] = index
+            while len(self._indexes) > self.index_cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _llm(self) -> Callable[[str], str]:
+        if self._translate is None:
+            from langchain_google_genai import GoogleGenerativeAI
+            from common.llm_cache import get_llm_cache
+            llm = GoogleGenerativeAI(model='gemini-1.5-pro', google_api_key=os.getenv('GOOGLE_API_KEY'),
+                                     temperature=0, cache=get_llm_cache())
+            self._translate = llm.invoke
+        return self._translate
+
+    def translate(self, question: str, index: JsonIndex) -> str:
+        """
+        Path expression answering a question about an indexed payload.
+
+        Args:
+            question (str): Natural language question.
+            index (JsonIndex): Index of the payload.
+
+        Returns:
+            str: The path expression.
+
+        Raises:
+            ValueError: If the LLM does not return a valid path expression.
+        """
+        key = (re.sub(r"\s+", " ", question).strip().lower(), index.signature)
+        with self._lock:
+            self.stats["queries"] += 1
+            path = self._cache.get(key)
+            if path is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return path
+
+        text = self._llm()(TRANSLATION_PROMPT.format(schema=index.schema(), question=question))
+        match = re.search(r"\{.*\}", text, re.DOTALL)
+        try:
+            path = json.loads(match.group(0))["path"] if match else text.strip().strip("`")
+            compile_path(path)
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Could not translate question into a path expression: {text}") from e
+
+        with self._lock:
+            self.stats["translations"] += 1
+            self._cache[key] = path
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return path
+
+    def query(self, question: str, data: Any) -> Dict[str, Any]:
+        """
+        Answer a question about a payload.
+
+        Args:
+            question (str): Natural language question.
+            data (Any): Parsed JSON, or a JsonIndex built from it to reuse across questions.
+
+        Returns:
+            dict: The 'path' expression used and the selected 'values'.
+        """
+        index = data if isinstance(data, JsonIndex) else self.index(data)
+        path = self.translate(question, index)
+        return {"path": path, "values": index.select(path)}
+
+
+@lru_cache()
+def get_json_query_engine() -> JsonQueryEngine:
+    """Return the process-wide JSON query engine."""
+    return JsonQueryEngine()
+
+
+def query_json(query, data):
+    """
+    Query backend JSON data (user, shift, rounds or SMP information) in natural language.
+
+    Args:
+        query (str): The question about the data
+        data (dict): The data to query
+
+    Returns:
+        str: The selected values as JSON text
+    """
+    try:
+        result = get_json_query_engine().query(query, data)
+    except ValueError as e:
+        return f"Error querying data: {e}"
+    values = result["values"]
+    return json.dumps(values[0] if len(values) == 1 else values, default=str)
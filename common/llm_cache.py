@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumpd, load
+from langchain_core.outputs import Generation, ChatGeneration
+
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def llm_cache_bypass(enabled: bool = True):
+    """
+    Skip cache lookups for LLM calls made inside the block. Fresh responses are
+    still written back, so a bypassed call also refreshes the cached entry.
+
+    Args:
+        enabled (bool): Whether to bypass the cache. Allows `with llm_cache_bypass(not use_cache)`.
+    """
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def _serialize(return_val: RETURN_VAL_TYPE) -> str:
+    rows = []
+    for generation in return_val:
+        if isinstance(generation, ChatGeneration):
+            rows.append({"message": dumpd(generation.message), "generation_info": generation.generation_info})
+        else:
+            rows.append({"text": generation.text, "generation_info": generation.generation_info})
+    return json.dumps(rows)
+
+
+def _deserialize(value: str) -> RETURN_VAL_TYPE:
+    generations = []
+    for row in json.loads(value):
+        if "message" in row:
+            generations.append(ChatGeneration(message=load(row["message"]), generation_info=row["generation_info"]))
+        else:
+            generations.append(Generation(text=row["text"], generation_info=row["generation_info"]))
+    return generations
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Content address of an LLM call. The llm_string carries the model name,
+    temperature and the rest of the invocation parameters.
+    """
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache(BaseCache):
+    """
+    Two-tier LangChain cache for LLM responses: an in-memory LRU in front of an
+    on-disk SQLite store. Entries expire after a TTL and the disk tier is trimmed
+    to a maximum size, oldest-accessed first.
+
+    Attributes:
+        stats (dict): Hit/miss counters ('memory_hits', 'disk_hits', 'misses',
+            'bypassed', 'writes', 'evictions')
+    """
+
+    def __init__(self,
+                 path: Optional[str] = "data/cache/llm_cache.sqlite",
+                 memory_entries: int = 512,
+                 ttl_seconds: Optional[float] = 24 * 3600,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            path (str, optional): SQLite file for the disk tier. None keeps the cache in memory only.
+            memory_entries (int): Maximum number of entries in the memory tier.
+            ttl_seconds (float, optional): Lifetime of an entry. None never expires.
+            max_disk_bytes (int): Size budget of the disk tier.
+        """
+        self.path = path
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                                      "bypassed": 0, "writes": 0, "evictions": 0}
+
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache (
+                       key TEXT PRIMARY KEY,
+                       value TEXT NOT NULL,
+                       size INTEGER NOT NULL,
+                       created REAL NOT NULL,
+                       accessed REAL NOT NULL
+                   )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed)")
+            self._conn.commit()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def _remember(self, key: str, created: float, value: RETURN_VAL_TYPE) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if _bypass.get():
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return None
+
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+                        self._conn.commit()
+                        value = _deserialize(row[0])
+                        self._remember(key, row[1], value)
+                        self.stats["disk_hits"] += 1
+                        return value
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, return_val)
+            self.stats["writes"] += 1
+            if self._conn is None:
+                return
+
+            value = _serialize(return_val)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict_disk()
+            self._conn.commit()
+
+    def _evict_disk(self) -> None:
+        """Drop expired rows, then the least recently accessed rows until under the size budget."""
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_seconds,))
+            self.stats["evictions"] += max(cursor.rowcount, 0)
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._conn.commit()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the hit/miss counters together with the hit ratio and tier sizes."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._conn is not None:
+                stats["disk_entries"], stats["disk_bytes"] = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+@lru_cache()
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    Return the process-wide LLM response cache shared by every chain, configured
+    from the environment. Set LLM_CACHE_DISABLED=1 to turn caching off.
+    """
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    ttl = os.getenv("LLM_CACHE_TTL", str(24 * 3600))
+    return LLMResponseCache(
+        path=os.getenv("LLM_CACHE_PATH", "data/cache/llm_cache.sqlite") or None,
+        memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 512)),
+        ttl_seconds=float(ttl) if ttl else None,
+        max_disk_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    )
@@ -0,0 +1,90 @@
+import re
+import json
+import asyncio
+import hashlib
+import threading
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict
+
+
+def request_key(endpoint: str, query: str, *data: Any) -> str:
+    """
+    Key identifying a request. The free-text query is compared up to case and
+    whitespace, so "Blasting" and " blasting " share an in-flight call; the other
+    fields are compared exactly, since requests differing in data (e.g. mine or
+    supervisor names) must not receive each other's response.
+
+    Args:
+        endpoint (str): Name of the endpoint.
+        query (str): Free-text query of the request.
+        *data: Other JSON-serializable request fields.
+
+    Returns:
+        str: Hex digest of the request.
+    """
+    normalized = re.sub(r"\s+", " ", query or "").strip().lower()
+    payload = json.dumps([endpoint, normalized, list(data)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Deduplicates identical concurrent calls: the first caller for a key starts the
+    call and every caller that arrives while it is in flight awaits the same task.
+    The task is shielded, so a caller that disconnects does not cancel the call for
+    the others. Nothing is kept once the call finishes; caching results is the LLM
+    cache's job.
+
+    Attributes:
+        stats (dict): 'calls' received, 'executed' calls, 'coalesced' calls that
+            awaited another caller's task, and 'failures' of executed calls
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"calls": 0, "executed": 0, "coalesced": 0, "failures": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn, or join the in-flight call with the same key.
+
+        Args:
+            key (str): Request key, see request_key.
+            fn (callable): Coroutine function making the call.
+
+        Returns:
+            The result of the shared call (its exception is raised to every caller).
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.stats["calls"] += 1
+            task = self._inflight.get(key)
+            if task is not None and task.get_loop() is loop:
+                self.stats["coalesced"] += 1
+            else:
+                task = loop.create_task(fn())
+                self._inflight[key] = task
+                self.stats["executed"] += 1
+                task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            if task.cancelled() or task.exception() is not None:
+                self.stats["failures"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the counters together with the share of coalesced calls and the calls in flight."""
+        with self._lock:
+            calls = self.stats["calls"]
+            return {**self.stats, "in_flight": len(self._inflight),
+                    "coalesced_ratio": self.stats["coalesced"] / calls if calls else 0.0}
+
+
+@lru_cache()
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide single-flight group for LLM-backed requests."""
+    return SingleFlight()
@@ -0,0 +1,133 @@
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.output_parsers import JsonOutputParser
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """
+    Format one server-sent event.
+
+    Args:
+        data (Any): JSON-serializable payload.
+        event (str, optional): Event name; the client's default 'message' event if None.
+
+    Returns:
+        str: The event, terminated by a blank line.
+    """
+    lines = [f"event: {event}"] if event else []
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class IncrementalJsonParser:
+    """
+    Parses a JSON document while it is being generated and returns every element of
+    the watched arrays (e.g. "hazards" or "sections") as soon as the element closes,
+    long before the whole document is complete. Text before the first brace, such as
+    a markdown code fence, is ignored. On a closing bracket that matches nothing the
+    text is not valid JSON, so parsing stops and only the final full parse decides.
+    """
+
+    def __init__(self, array_keys: Iterable[str]):
+        """
+        Args:
+            array_keys (iterable): Keys of the arrays whose elements are emitted.
+        """
+        self.array_keys = set(array_keys)
+        self.text = ""
+        self._position = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        # One frame per open container: [bracket, key it sits under, key of the value being read]
+        self._stack: List[list] = []
+        self._element_start: Optional[int] = None
+        self.invalid = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add generated text.
+
+        Args:
+            chunk (str): Next piece of the generated text.
+
+        Returns:
+            list: (array key, element) for every element completed by this chunk.
+        """
+        self.text += chunk
+        completed = []
+        if self.invalid:
+            return completed
+        text = self.text
+        for i in range(self._position, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i + 1]
+                continue
+            if not self._started:
+                if char != "{":
+                    continue
+                self._started = True
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":" and self._stack and self._stack[-1][0] == "{":
+                self._stack[-1][2] = json.loads(self._last_string) if self._last_string else None
+            elif char in "{[":
+                parent = self._stack[-1] if self._stack else None
+                key = parent[2] if parent and parent[0] == "{" else None
+                if self._watched(parent) and self._element_start is None:
+                    self._element_start = i
+                self._stack.append([char, key, None])
+            elif char in "}]":
+                if not self._stack:
+                    self.invalid = True
+                    break
+                self._stack.pop()
+                parent = self._stack[-1] if self._stack else None
+                if self._watched(parent) and self._element_start is not None:
+                    element = text[self._element_start:i + 1]
+                    self._element_start = None
+                    try:
+                        completed.append((parent[1], json.loads(element)))
+                    except json.JSONDecodeError:
+                        pass
+            elif char == "," and self._stack and self._stack[-1][0] == "{":
+                self._stack[-1][2] = None
+        self._position = len(text)
+        return completed
+
+    def _watched(self, frame: Optional[list]) -> bool:
+        return frame is not None and frame[0] == "[" and frame[1] in self.array_keys
+
+
+async def astream_json_items(chain, inputs: Dict[str, Any], parser: JsonOutputParser,
+                             array_keys: Iterable[str]) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Stream a prompt | llm chain that generates JSON, yielding each element of the
+    watched arrays as it completes and then the fully parsed result.
+
+    Args:
+        chain: Runnable producing text (prompt | llm, without the output parser).
+        inputs (dict): Chain inputs.
+        parser (JsonOutputParser): Parser of the complete output.
+        array_keys (iterable): Keys of the arrays whose elements are streamed.
+
+    Yields:
+        tuple: (array key, element) for every completed element, then ("result", parsed output).
+    """
+    stream = IncrementalJsonParser(array_keys)
+    async for chunk in chain.astream(inputs):
+        text = chunk if isinstance(chunk, str) else getattr(chunk, "content", str(chunk))
+        for item in stream.feed(text):
+            yield item
+    yield "result", parser.parse(stream.text)
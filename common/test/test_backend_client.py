@@ -0,0 +1,189 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common.backend_client import BackendClient
+
+SHIFTS = {"message": "Fetched shifts successfully!", "data": [{"shiftId": 1, "name": "Morning Shift"}]}
+
+
+class Backend(BaseHTTPRequestHandler):
+    requests = []
+    failures = {}
+    etag = '"v1"'
+    body = SHIFTS
+
+    def do_GET(self):
+        Backend.requests.append((self.path, self.headers.get("If-None-Match")))
+        if Backend.failures.get(self.path, 0) > 0:
+            Backend.failures[self.path] -= 1
+            self.reply(503, {"error": "unavailable"})
+        elif self.path == "/api/v1/missing":
+            self.reply(404, {"error": "not found"})
+        elif self.headers.get("If-None-Match") == Backend.etag:
+            self.send_response(304)
+            self.send_header("ETag", Backend.etag)
+            self.end_headers()
+        else:
+            self.reply(200, Backend.body)
+
+    def reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", Backend.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    Backend.requests, Backend.failures, Backend.etag, Backend.body = [], {}, '"v1"', SHIFTS
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Backend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def wait_for(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_ttl_matches_longest_endpoint_path():
+    client = BackendClient(default_ttl=7, endpoint_ttls={"/api/v1/smp": 60, "/api/v1/smp/rm": 10})
+    assert client.ttl("http://backend/api/v1/smp") == 60
+    assert client.ttl("http://backend/api/v1/smp/rm?site=2") == 10
+    assert client.ttl("http://backend/api/v1/smpx") == 7
+
+
+def test_fresh_responses_are_served_from_cache():
+    server, host = serve()
+    try:
+        client = BackendClient(retries=0)
+        first = client.get(host + "/api/v1/shift")
+        second = client.get(host + "/api/v1/shift")
+        other_user = client.get(host + "/api/v1/shift", headers={"Authorization": "Bearer other"})
+    finally:
+        server.shutdown()
+
+    assert first == second == other_user == SHIFTS
+    assert len(Backend.requests) == 2
+    assert client.stats["hits"] == 1 and client.stats["misses"] == 2
+
+
+def test_callers_cannot_change_cached_data():
+    server, host = serve()
+    try:
+        client = BackendClient(retries=0)
+        first = client.get(host + "/api/v1/shift")
+        first["data"].clear()
+        first["message"] = "changed"
+        second = client.get(host + "/api/v1/shift")
+    finally:
+        server.shutdown()
+
+    assert second == SHIFTS and second is not first
+    assert len(Backend.requests) == 1
+
+
+def test_stale_responses_are_served_while_revalidated_with_etag():
+    server, host = serve()
+    try:
+        client = BackendClient(retries=0, endpoint_ttls={"/api/v1/shift": 0.05})
+        client.get(host + "/api/v1/shift")
+        time.sleep(0.1)
+        assert client.get(host + "/api/v1/shift") == SHIFTS
+        assert wait_for(lambda: client.stats["revalidated"] == 1)
+
+        Backend.etag, Backend.body = '"v2"', {"data": []}
+        time.sleep(0.1)
+        assert client.get(host + "/api/v1/shift") == SHIFTS
+        assert wait_for(lambda: client.get(host + "/api/v1/shift") == {"data": []})
+    finally:
+        server.shutdown()
+
+    assert Backend.requests[1] == ("/api/v1/shift", '"v1"')
+    assert client.stats["stale_hits"] >= 2
+
+
+def test_unavailable_responses_are_retried():
+    server, host = serve()
+    try:
+        Backend.failures = {"/api/v1/shift": 2}
+        client = BackendClient(retries=2, backoff=0.01)
+        data = client.get(host + "/api/v1/shift")
+    finally:
+        server.shutdown()
+
+    assert data == SHIFTS
+    assert len(Backend.requests) == 3
+    assert client.stats["retries"] == 2
+
+
+def test_last_good_response_is_served_when_backend_fails():
+    server, host = serve()
+    try:
+        client = BackendClient(retries=0, stale_ttl=0, endpoint_ttls={"/api/v1/shift": 0.05})
+        client.get(host + "/api/v1/shift")
+        time.sleep(0.1)
+        Backend.failures = {"/api/v1/shift": 1}
+        data = client.get(host + "/api/v1/shift")
+    finally:
+        server.shutdown()
+
+    assert data == SHIFTS
+    assert client.stats["errors"] == 1
+
+
+def test_failures_are_cached_for_error_ttl():
+    server, host = serve()
+    try:
+        client = BackendClient(retries=0, error_ttl=60)
+        first = client.get(host + "/api/v1/missing")
+        second = client.get(host + "/api/v1/missing")
+    finally:
+        server.shutdown()
+
+    assert first == second
+    assert first["error"] == "Failed to retrieve data. Status Code: 404"
+    assert len(Backend.requests) == 1
+
+
+def test_async_requests_share_the_cache():
+    server, host = serve()
+
+    async def fetch(client):
+        try:
+            return [await client.aget(host + "/api/v1/shift") for _ in range(2)]
+        finally:
+            await client.aclose()
+
+    try:
+        client = BackendClient(retries=0)
+        results = asyncio.run(fetch(client))
+        blocking = client.get(host + "/api/v1/shift")
+    finally:
+        server.shutdown()
+
+    assert results == [SHIFTS, SHIFTS] and blocking == SHIFTS
+    assert len(Backend.requests) == 1
+    assert client.metrics()["hit_ratio"] == 2 / 3
+
+
+if __name__ == "__main__":
+    test_ttl_matches_longest_endpoint_path()
+    test_fresh_responses_are_served_from_cache()
+    test_callers_cannot_change_cached_data()
+    test_stale_responses_are_served_while_revalidated_with_etag()
+    test_unavailable_responses_are_retried()
+    test_last_good_response_is_served_when_backend_fails()
+    test_failures_are_cached_for_error_ttl()
+    test_async_requests_share_the_cache()
+    print("Backend client tests passed.")
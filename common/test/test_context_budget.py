@@ -0,0 +1,48 @@
+import json
+from common.context_budget import (ContextStats, compress_json, count_tokens, pack_chunks,
+                                   truncate_to_budget)
+
+
+def test_pack_chunks_removes_overlap_and_respects_budget():
+    text = " ".join(f"word{i}" for i in range(200))
+    first, second = text[:600], text[400:1000]
+    chunks = [(first, {"source": "cmr.pdf"}), (first, {"source": "cmr.pdf"}), (second, {"source": "cmr.pdf"})]
+
+    packed = pack_chunks(chunks, max_tokens=1000)
+    assert packed.packed == 2 and packed.deduplicated == 2
+    assert "".join(packed.text.split()) == "".join(text[:1000].split())
+
+    small = pack_chunks([("a" * 400, {}), ("b" * 40, {}), ("c" * 40, {})], max_tokens=25)
+    assert small.text == "b" * 40 + "\n" + "c" * 40
+    assert small.dropped == 1 and small.tokens <= 25
+
+
+def test_compress_json_shrinks_to_budget():
+    payload = {"shift": "A", "notes": None, "workers": [{"name": f"worker {i}", "remarks": "x" * 300}
+                                                       for i in range(100)]}
+    assert json.loads(compress_json({"a": 1, "b": None, "c": []})) == {"a": 1}
+    assert json.loads(compress_json({"a": ""}, drop_empty=False)) == {"a": ""}
+
+    text = compress_json(payload, max_tokens=200)
+    assert count_tokens(text) <= 200
+    assert json.loads(text)["shift"] == "A"
+
+
+def test_truncate_and_stats():
+    text = "coal " * 1000
+    cut = truncate_to_budget(text, 50)
+    assert count_tokens(cut) <= 50 and cut.endswith(" ...")
+    assert truncate_to_budget("short", 50) == "short"
+
+    stats = ContextStats()
+    stats.record("chatbot", pack_chunks([("a" * 40, {})], max_tokens=100))
+    stats.record("chatbot", pack_chunks([("b" * 80, {})], max_tokens=100))
+    metrics = stats.metrics()["chatbot"]
+    assert metrics["requests"] == 2 and metrics["max_tokens"] == 20 and metrics["mean_tokens"] == 15
+
+
+if __name__ == "__main__":
+    test_pack_chunks_removes_overlap_and_respects_budget()
+    test_compress_json_shrinks_to_budget()
+    test_truncate_and_stats()
+    print("Context budget tests passed.")
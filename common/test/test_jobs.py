@@ -0,0 +1,120 @@
+import os
+import time
+import tempfile
+
+from common.jobs import (CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobCancelled, JobContext, JobStore,
+                         JobWorkerPool, run_job)
+
+HANDLERS = {
+    "echo": "test_jobs:echo_handler",
+    "steps": "test_jobs:steps_handler",
+    "broken": "test_jobs:broken_handler",
+}
+
+
+def echo_handler(payload, context):
+    context.progress(0.5, "Halfway")
+    return {"echo": payload["text"]}
+
+
+def steps_handler(payload, context):
+    for step in range(payload["steps"]):
+        context.progress(step / payload["steps"], f"Step {step}")
+        time.sleep(payload.get("delay", 0))
+    return {"steps": payload["steps"]}
+
+
+def broken_handler(payload, context):
+    raise ValueError("Document could not be read")
+
+
+def test_submit_claim_and_complete():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JobStore(os.path.join(tmp, "jobs.sqlite"))
+        first = store.submit("echo", {"text": "first"})
+        second = store.submit("echo", {"text": "second"})
+
+        job = store.claim("worker-1")
+        assert job["id"] == first and job["status"] == RUNNING
+        run_job(store, job, HANDLERS)
+
+        done = store.get(first)
+        assert done["status"] == SUCCEEDED
+        assert done["result"] == {"echo": "first"}
+        assert done["progress"] == 1 and done["message"] == "Halfway"
+        assert store.get(second)["status"] == QUEUED
+        assert [job["id"] for job in store.list(status=QUEUED)] == [second]
+
+
+def test_failures_are_recorded():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JobStore(os.path.join(tmp, "jobs.sqlite"))
+        job_id = store.submit("broken", {})
+        run_job(store, store.claim("worker-1"), HANDLERS)
+        job = store.get(job_id)
+        assert job["status"] == FAILED
+        assert "could not be read" in job["error"]
+
+
+def test_cancel_queued_and_running_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JobStore(os.path.join(tmp, "jobs.sqlite"))
+        queued = store.submit("steps", {"steps": 3})
+        assert store.cancel(queued) == CANCELLED
+        assert store.claim("worker-1") is None
+
+        running = store.submit("steps", {"steps": 3})
+        job = store.claim("worker-1")
+        assert store.cancel(running) == RUNNING
+        context = JobContext(store, job)
+        try:
+            context.progress(0.1)
+            assert False, "a cancelled job must stop at its next progress report"
+        except JobCancelled:
+            pass
+        run_job(store, job, HANDLERS)
+        assert store.get(running)["status"] == CANCELLED
+        assert store.cancel("missing") is None
+
+
+def test_kind_concurrency_and_stale_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JobStore(os.path.join(tmp, "jobs.sqlite"), kind_concurrency={"steps": 1})
+        first = store.submit("steps", {"steps": 1})
+        store.submit("steps", {"steps": 1})
+        echo = store.submit("echo", {"text": "x"})
+
+        assert store.claim("worker-1")["id"] == first
+        # The second "steps" job waits for the first; other kinds go ahead
+        assert store.claim("worker-2")["id"] == echo
+        assert store.claim("worker-3") is None
+
+        # A worker that stopped sending heartbeats gives its job back
+        assert store.requeue_stale(timeout=-1) == 2
+        assert store.get(first)["status"] == QUEUED
+
+
+def test_worker_processes_run_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.sqlite")
+        store = JobStore(path)
+        job_ids = [store.submit("steps", {"steps": 2, "delay": 0.05}) for _ in range(4)]
+        pool = JobWorkerPool(path, processes=2, handlers=HANDLERS, poll_interval=0.05)
+        pool.start()
+        try:
+            deadline = time.time() + 60
+            while time.time() < deadline and any(store.get(job_id)["status"] != SUCCEEDED for job_id in job_ids):
+                time.sleep(0.1)
+        finally:
+            pool.stop()
+        assert [store.get(job_id)["result"] for job_id in job_ids] == [{"steps": 2}] * 4
+        assert len({store.get(job_id)["worker"] for job_id in job_ids}) <= 2
+
+
+if __name__ == "__main__":
+    test_submit_claim_and_complete()
+    test_failures_are_recorded()
+    test_cancel_queued_and_running_jobs()
+    test_kind_concurrency_and_stale_jobs()
+    test_worker_processes_run_jobs()
+    print("Job queue tests passed.")
@@ -0,0 +1,102 @@
+import copy
+import time
+
+import pytest
+
+from common.json_query import JsonIndex, JsonQueryEngine, compile_path, filter_records, keywords, select
+
+DATA = {"data": [
+    {"user_name": "Shanthosh", "shift": {"name": "Shift1"}, "tasks": ["drilling", "blasting"], "active": True},
+    {"user_name": "Priya", "shift": {"name": "Shift2"}, "tasks": ["haulage"], "active": False},
+]}
+
+
+def test_select_paths():
+    assert select(DATA, "data[*].user_name") == ["Shanthosh", "Priya"]
+    assert select(DATA, "data.shift.name") == ["Shift1", "Shift2"]
+    assert select(DATA, "data[-1].tasks[0]") == ["haulage"]
+    assert select(DATA, "data[5].user_name") == []
+    assert select(DATA, "missing") == []
+    assert select(DATA, "") == [DATA]
+
+
+def test_filter_records():
+    records = select(DATA, "data[*]")
+    assert filter_records(records, where={"active": True}, fields=["user_name"]) == [{"user_name": "Shanthosh"}]
+    assert [r["user_name"] for r in filter_records(records, match="Haulage operations")] == ["Priya"]
+    assert filter_records(records, match="roof bolting") == []
+    assert keywords("Generate the SMP for blasting operations") == ["smp", "blasting"]
+
+
+def test_filters_in_paths():
+    assert select(DATA, "data[?active==true].user_name") == ["Shanthosh"]
+    assert select(DATA, "data[?shift.name==shift2].user_name") == ["Priya"]
+    assert select(DATA, "data[?user_name!=Priya].shift.name") == ["Shift1"]
+    assert select(DATA, "data[?tasks~blast].user_name") == ["Shanthosh"]
+    assert select(DATA, "$.data[0].user_name") == ["Shanthosh"]
+    for invalid in ("data[?active]", "data[x", "data]]"):
+        with pytest.raises(ValueError):
+            compile_path(invalid)
+
+
+def test_index_patterns_and_schema():
+    index = JsonIndex(DATA)
+    assert index.paths["data[*].user_name"] == ["Shanthosh", "Priya"]
+    assert index.select("data[*].tasks[*]") == ["drilling", "blasting", "haulage"]
+    assert index.select("data[?active==false].user_name") == ["Priya"]
+    assert 'data[*].shift.name: ["Shift1", "Shift2"]' in index.schema()
+    assert JsonIndex({"data": [{"user_name": "Other"}]}).signature != index.signature
+
+
+def test_engine_translates_once_per_question_and_schema():
+    prompts = []
+
+    def translate(prompt):
+        prompts.append(prompt)
+        return '```json\n{"path": "data[?active==true].shift.name"}\n```'
+
+    engine = JsonQueryEngine(translate=translate)
+    assert engine.query("Which shift is active?", DATA) == {"path": "data[?active==true].shift.name",
+                                                             "values": ["Shift1"]}
+    assert "data[*].user_name" in prompts[0]
+
+    index = JsonIndex({"data": [dict(DATA["data"][0], active=False), dict(DATA["data"][1], active=True)]})
+    start = time.perf_counter()
+    for _ in range(1000):
+        result = engine.query("which  shift is ACTIVE?", index)
+    assert (time.perf_counter() - start) / 1000 < 0.001
+    assert result["values"] == ["Shift2"]
+    assert len(prompts) == 1
+    assert engine.stats == {"queries": 1001, "hits": 1000, "translations": 1, "index_hits": 0}
+
+
+def test_engine_indexes_each_payload_once():
+    engine = JsonQueryEngine(translate=lambda prompt: '{"path": "data[*].user_name"}', index_cache_size=2)
+    payload = copy.deepcopy(DATA)
+    first = engine.index(payload)
+    # Equal payloads share one index, whichever object the caller holds
+    assert engine.index(copy.deepcopy(DATA)) is first
+    assert engine.query("Who is on shift?", copy.deepcopy(DATA))["values"] == ["Shanthosh", "Priya"]
+    assert engine.stats["index_hits"] == 2
+
+    # Changing the caller's data neither alters the cached index nor matches it any more
+    payload["data"][0]["user_name"] = "Arun"
+    assert first.select("data[*].user_name") == ["Shanthosh", "Priya"]
+    assert engine.index(payload) is not first
+
+
+def test_engine_rejects_invalid_translations():
+    engine = JsonQueryEngine(translate=lambda prompt: '{"path": "data[?oops]"}')
+    with pytest.raises(ValueError):
+        engine.query("Who is on shift?", DATA)
+
+
+if __name__ == "__main__":
+    test_select_paths()
+    test_filter_records()
+    test_filters_in_paths()
+    test_index_patterns_and_schema()
+    test_engine_translates_once_per_question_and_schema()
+    test_engine_indexes_each_payload_once()
+    test_engine_rejects_invalid_translations()
+    print("JSON query tests passed.")
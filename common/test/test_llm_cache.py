@@ -0,0 +1,59 @@
+import os
+import time
+import tempfile
+from langchain_core.outputs import Generation
+from langchain_core.language_models.fake import FakeListLLM
+from common.llm_cache import LLMResponseCache, llm_cache_bypass
+
+
+def test_memory_and_disk_tiers():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "llm_cache.sqlite")
+        cache = LLMResponseCache(path=path)
+        cache.update("prompt", "gemini-1.5-pro|0.7", [Generation(text="answer")])
+
+        assert cache.lookup("prompt", "gemini-1.5-pro|0.7")[0].text == "answer"
+        assert cache.lookup("prompt", "gemini-1.5-pro|0.2") is None
+
+        # A fresh process only has the disk tier
+        reopened = LLMResponseCache(path=path)
+        assert reopened.lookup("prompt", "gemini-1.5-pro|0.7")[0].text == "answer"
+        assert reopened.stats["disk_hits"] == 1
+        assert reopened.lookup("prompt", "gemini-1.5-pro|0.7") is not None
+        assert reopened.stats["memory_hits"] == 1
+
+
+def test_ttl_and_size_eviction():
+    cache = LLMResponseCache(path=None, ttl_seconds=0.01)
+    cache.update("prompt", "llm", [Generation(text="answer")])
+    time.sleep(0.02)
+    assert cache.lookup("prompt", "llm") is None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(path=os.path.join(tmp, "c.sqlite"), memory_entries=1, max_disk_bytes=1500)
+        for i in range(5):
+            cache.update(f"prompt {i}", "llm", [Generation(text="x" * 400)])
+        metrics = cache.metrics()
+        assert metrics["disk_bytes"] <= 1500
+        assert metrics["evictions"] > 0
+        assert cache.lookup("prompt 4", "llm") is not None
+
+
+def test_llm_uses_cache_and_bypass():
+    cache = LLMResponseCache(path=None)
+    llm = FakeListLLM(responses=["first", "second", "third"], cache=cache)
+
+    assert llm.invoke("same prompt") == "first"
+    assert llm.invoke("same prompt") == "first"
+    with llm_cache_bypass():
+        assert llm.invoke("same prompt") == "second"
+    # The bypassed call refreshed the entry
+    assert llm.invoke("same prompt") == "second"
+    assert cache.stats["bypassed"] == 1
+
+
+if __name__ == "__main__":
+    test_memory_and_disk_tiers()
+    test_ttl_and_size_eviction()
+    test_llm_uses_cache_and_bypass()
+    print("All LLM cache tests passed.")
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from common.single_flight import SingleFlight, request_key
+
+
+def test_request_key_normalizes_query_only():
+    assert request_key("hazard", "Blasting ", {"shift": "A"}) == request_key("hazard", "blasting", {"shift": "A"})
+    assert request_key("hazard", "Blasting") != request_key("hazard", "Drilling")
+    # Data values are compared exactly
+    assert request_key("form", "shift log", {"mine": "North"}) != request_key("form", "shift log", {"mine": "north"})
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    group = SingleFlight()
+    executions = []
+
+    async def call(value):
+        executions.append(value)
+        await asyncio.sleep(0.05)
+        return value.upper()
+
+    async def run():
+        same = [group.do("blasting", lambda: call("blasting")) for _ in range(5)]
+        other = group.do("drilling", lambda: call("drilling"))
+        return await asyncio.gather(*same, other)
+
+    results = asyncio.run(run())
+    assert results == ["BLASTING"] * 5 + ["DRILLING"]
+    assert sorted(executions) == ["blasting", "drilling"]
+    metrics = group.metrics()
+    assert metrics["calls"] == 6 and metrics["executed"] == 2 and metrics["coalesced"] == 4
+    assert metrics["in_flight"] == 0
+
+
+def test_errors_reach_every_caller_and_are_not_kept():
+    group = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("quota exceeded")
+
+    async def run():
+        return await asyncio.gather(group.do("k", fail), group.do("k", fail), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert group.stats["failures"] == 1
+
+    async def succeed():
+        return "ok"
+
+    assert asyncio.run(group.do("k", succeed)) == "ok"
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    group = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(group.do("k", slow))
+        follower = asyncio.ensure_future(group.do("k", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+
+if __name__ == "__main__":
+    test_request_key_normalizes_query_only()
+    test_concurrent_identical_calls_share_one_execution()
+    test_errors_reach_every_caller_and_are_not_kept()
+    test_cancelled_caller_does_not_cancel_the_shared_call()
+    print("Single-flight tests passed.")
@@ -0,0 +1,88 @@
+import json
+import asyncio
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.outputs import GenerationChunk
+from langchain_core.prompts import PromptTemplate
+from common.streaming import IncrementalJsonParser, astream_json_items, sse_event
+
+DOCUMENT = {
+    "activity_name": "Blasting",
+    "hazards": [
+        {"hazard_id": "BO-1", "hazard_aspect": "Fly rock {\"quoted\"} [x]",
+         "additional_control_measures": [{"description": "Clear the danger zone"}]},
+        {"hazard_id": "BO-2", "hazard_aspect": "Misfire", "additional_control_measures": []},
+    ],
+}
+
+
+class ChunkedLLM(LLM):
+    """LLM stand-in that streams a canned answer in fixed-size pieces."""
+    text: str
+    size: int = 7
+
+    @property
+    def _llm_type(self) -> str:
+        return "chunked"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        return self.text
+
+    async def _astream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None,
+                       **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        for start in range(0, len(self.text), self.size):
+            await asyncio.sleep(0)
+            yield GenerationChunk(text=self.text[start:start + self.size])
+
+
+def test_parser_emits_each_element_when_it_closes():
+    text = "```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```"
+    parser = IncrementalJsonParser(["hazards"])
+    emitted = []
+    first_at = None
+    for i, char in enumerate(text):
+        items = parser.feed(char)
+        if items and first_at is None:
+            first_at = i
+        emitted.extend(items)
+
+    assert emitted == [("hazards", hazard) for hazard in DOCUMENT["hazards"]]
+    # The first hazard is out before the second one has even started
+    assert first_at < text.index("BO-2")
+
+
+def test_parser_stops_on_unbalanced_brackets():
+    parser = IncrementalJsonParser(["hazards"])
+    text = json.dumps(DOCUMENT) + "\n}]\n" + json.dumps(DOCUMENT)
+    emitted = [item for char in text for item in parser.feed(char)]
+
+    # Elements of the first document are out; the stray brackets end incremental parsing
+    assert emitted == [("hazards", hazard) for hazard in DOCUMENT["hazards"]]
+    assert parser.invalid and parser.text == text
+
+
+def test_astream_json_items_streams_elements_then_result():
+    chain = PromptTemplate.from_template("{activity}") | ChunkedLLM(text=json.dumps(DOCUMENT))
+
+    async def collect():
+        return [event async for event in astream_json_items(chain, {"activity": "Blasting"},
+                                                              JsonOutputParser(), ["hazards"])]
+
+    events = asyncio.run(collect())
+    assert [key for key, _ in events] == ["hazards", "hazards", "result"]
+    assert events[-1][1] == DOCUMENT
+
+
+def test_sse_event_format():
+    assert sse_event({"text": "hi"}, event="token") == 'event: token\ndata: {"text": "hi"}\n\n'
+    assert sse_event([1, 2]) == "data: [1, 2]\n\n"
+
+
+if __name__ == "__main__":
+    test_parser_emits_each_element_when_it_closes()
+    test_parser_stops_on_unbalanced_brackets()
+    test_astream_json_items_streams_elements_then_result()
+    test_sse_event_format()
+    print("Streaming tests passed.")
@@ -12,13 +12,18 @@ from dotenv import load_dotenv
 from new_form_builder.core.doc_reader import document_reader, authenticate_account
 from new_form_builder.core.schema import FormSchemaFromDocument
 from new_form_builder.core.knowledge import KnowledgeBase
+from common.executor import run_blocking
+from common.llm_cache import get_llm_cache
+from common.context_budget import (PackedContext, compress_json, count_tokens, get_context_budget,
+                                   get_context_stats, truncate_to_budget)
 
 
 class DocToForm:
     def __init__(self, google_api_key):
         self.llm = GoogleGenerativeAI(
             model="gemini-1.5-pro",
-            google_api_key=google_api_key
+            google_api_key=google_api_key,
+            cache=get_llm_cache()
         )
         
         self.knowledge_base = KnowledgeBase(api_key=google_api_key or os.getenv('GOOGLE_API_KEY'))
@@ -56,7 +61,7 @@ class DocToForm:
                 used to generate the form. I do not want partially created form. Generate it fully. Do not leave it{format_instructions}''',
                 input_variables=['input_text'],
                 partial_variables={'format_instructions': self.parser.get_format_instructions(),
-                                   'example': self.example}    
+                                   'example': compress_json(self.example, drop_empty=False)}    
         )
         
         self.chain = self.prompt | self.llm | self.parser
@@ -91,8 +96,7 @@ class DocToForm:
         #     print(f"Error querying knowledge base: {e}")
         #     return None
         
-        client = authenticate_account(service_account_file=self.SERVICE_ACCOUNT_FILE)
-        extracted_text = document_reader(client, self.PROJECT_ID, self.LOCATION, self.PROCESSOR_ID, file_path=file_path, mime_type=self.MIME_TYPE)
+        extracted_text = self._fit_to_budget(self._read_document(file_path))
         
         try:
             res = self.chain.invoke({
@@ -101,4 +105,33 @@ class DocToForm:
             })
             return res
         except Exception as e:
-            raise ValueError(f"Error generating form {e}.")
\ No newline at end of file
+            raise ValueError(f"Error generating form {e}.")
+    
+    def _fit_to_budget(self, extracted_text):
+        """
+        Cut the extracted document text to the doc-to-form token budget (CONTEXT_BUDGET_DOC_TO_FORM)
+        """
+        budget = get_context_budget("doc_to_form")
+        fitted = truncate_to_budget(extracted_text, budget)
+        get_context_stats().record("doc_to_form", PackedContext(text=fitted, tokens=count_tokens(fitted), budget=budget,
+                                                                packed=1, dropped=int(fitted != extracted_text)))
+        return fitted
+    
+    def _read_document(self, file_path):
+        client = authenticate_account(service_account_file=self.SERVICE_ACCOUNT_FILE)
+        return document_reader(client, self.PROJECT_ID, self.LOCATION, self.PROCESSOR_ID, file_path=file_path, mime_type=self.MIME_TYPE)
+    
+    async def adoc2form(self, file_path):
+        """
+        Async variant of doc2form. Document AI extraction runs on the bounded
+        blocking pool and the form chain is awaited.
+        """
+        extracted_text = self._fit_to_budget(await run_blocking(self._read_document, file_path))
+        
+        try:
+            res = await self.chain.ainvoke({
+                "input_text": extracted_text,
+            })
+            return res
+        except Exception as e:
+            raise ValueError(f"Error generating form {e}.")
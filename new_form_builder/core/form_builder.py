@@ -5,10 +5,14 @@ from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_google_genai import GoogleGenerativeAI
 from dotenv import load_dotenv
-from new_form_builder.core.query_validator import user_query_validator
+from new_form_builder.core.query_validator import user_query_validator, auser_query_validator
 from new_form_builder.core.schema import FormSchema
 from new_form_builder.core.knowledge import KnowledgeBase
-from new_form_builder.utils.helper import data_requester, query_json
+from new_form_builder.utils.helper import data_requester, adata_requester, query_json
+from common.executor import run_blocking
+from common.llm_cache import get_llm_cache
+from common.streaming import astream_json_items
+from common.context_budget import compress_json, count_tokens, get_context_budget, get_context_stats, pack_chunks
 
 load_dotenv()
 
@@ -21,7 +25,8 @@ class CoalMineFormGenerator:
         """
         self.llm = GoogleGenerativeAI(
             model="gemini-1.5-pro",
-            google_api_key=google_api_key
+            google_api_key=google_api_key,
+            cache=get_llm_cache()
         )
         
         self.knowledge_base = KnowledgeBase(api_key=os.getenv("GOOGLE_API_KEY"))
@@ -89,7 +94,7 @@ class CoalMineFormGenerator:
             ''',
             input_variables=["user_description", "knowledge_base_info"],
             partial_variables={"format_instruction": self.parser.get_format_instructions(),
-                               "example": self.example}
+                               "example": compress_json(self.example, drop_empty=False)}
         )
         
         self.prompt_controlPlan = PromptTemplate(
@@ -115,25 +120,20 @@ class CoalMineFormGenerator:
         ,
         input_variables=["user_description", "knowledge_base_info", "activity_info"],
         partial_variables={"format_instructions": self.parser.get_format_instructions(),
-                           "example": self.example}
+                           "example": compress_json(self.example, drop_empty=False)}
         )
 
-    def generate_form(self, user_description: str, form_type: str, activity_info: str = None):
+    def _retrieve_knowledge_base_info(self, user_description: str, shift_data):
         """
-        Generate a specialized form based on user's operational description
+        Load the vector store if needed and build the knowledge base context for the prompt,
+        with the chunks and the compacted shift data packed under the form token budget
         
         Parameters:
         user_description: Detailed description of the industrial operation
-        form_type: type of form. Values can either be 'shift_handover_log' or 'control_plan'
+        shift_data: Shift information fetched from the backend
         
-        Returns a form generated for ShadCN using the Formschema class
+        Returns the formatted context string, or None on failure
         """
-
-        validity_result = user_query_validator(user_description)
-        if validity_result and not validity_result.get('query_validity', False):
-            return validity_result
-        
-        shift_data = data_requester("http://192.168.173.223:3000/api/v1/shift")
         if self.knowledge_base.vector_store is None:
             try:
                 print("Loading vector store...")
@@ -144,42 +144,130 @@ class CoalMineFormGenerator:
                 return None
         try:
             knowledge_base_info = self.knowledge_base.query_vector_store(user_description)
-            formatted_data = "\n".join([f"- {content}" for content, _ in knowledge_base_info])
-            formatted_data = formatted_data + json.dumps(shift_data)
-            print(formatted_data)
+            # The shift data may use up to a quarter of the budget, the chunks get the rest
+            budget = get_context_budget("form")
+            shift_json = compress_json(shift_data, max_tokens=budget // 4)
+            packed = pack_chunks(knowledge_base_info, budget - count_tokens(shift_json),
+                                 format_chunk=lambda content, _: f"- {content}")
+            formatted_data = packed.text + "\n" + shift_json
+            packed.tokens = count_tokens(formatted_data)
+            packed.budget = budget
+            get_context_stats().record("form", packed)
         except ValueError as ve:
             print(f"ValueError: {ve}")
             return None
         except Exception as e:
             print(f"Error querying knowledge base: {e}")
             return None
+        
+        return formatted_data
 
-
+    def _build_chain(self, form_type: str, user_description: str, formatted_data: str, activity_info: str = None):
+        """
+        Select the prompt chain and its inputs for the requested form type
+        
+        Returns a tuple of (chain, chain inputs)
+        """
         if form_type not in ['shift_handover_log', 'control_plan']:
             raise ValueError("Not a valid form type. Options are 'control_plan', 'shift_handover_log'")
         if form_type == 'shift_handover_log':
             chain = self.prompt_log | self.llm | self.parser
-        elif form_type == 'control_plan':
+            inputs = {
+                "user_description": user_description,
+                "knowledge_base_info": formatted_data
+            }
+        else:
             chain = self.prompt_controlPlan | self.llm | self.parser
+            inputs = {
+                "user_description": user_description,
+                "knowledge_base_info": formatted_data,
+                "activity_info": activity_info
+            }
+        return chain, inputs
+
+    def generate_form(self, user_description: str, form_type: str, activity_info: str = None):
+        """
+        Generate a specialized form based on user's operational description
+        
+        Parameters:
+        user_description: Detailed description of the industrial operation
+        form_type: type of form. Values can either be 'shift_handover_log' or 'control_plan'
         
+        Returns a form generated for ShadCN using the Formschema class
+        """
+
+        validity_result = user_query_validator(user_description)
+        if validity_result and not validity_result.get('query_validity', False):
+            return validity_result
+        
+        shift_data = data_requester("http://192.168.173.223:3000/api/v1/shift")
+        formatted_data = self._retrieve_knowledge_base_info(user_description, shift_data)
+        if formatted_data is None:
+            return None
+
+        chain, inputs = self._build_chain(form_type, user_description, formatted_data, activity_info)
 
         try:
-            if form_type == 'shift_handover_log':
-                result = chain.invoke({
-                    "user_description": user_description,
-                    "knowledge_base_info": formatted_data
-                })
-                return result
-            else:
-                result = chain.invoke({
-                    "user_description": user_description,
-                    "knowledge_base_info": formatted_data,
-                    "activity_info": activity_info
-                })
-                return result
+            return chain.invoke(inputs)
         except Exception as e:
             raise ValueError(f"Error generating form for operation: {e}")
+
+    async def agenerate_form(self, user_description: str, form_type: str, activity_info: str = None):
+        """
+        Async variant of generate_form. The validator and form chains are awaited,
+        the shift data is fetched with an async HTTP client and retrieval runs on
+        the bounded blocking pool.
+        
+        Parameters:
+        user_description: Detailed description of the industrial operation
+        form_type: type of form. Values can either be 'shift_handover_log' or 'control_plan'
+        
+        Returns a form generated for ShadCN using the Formschema class
+        """
+        validity_result = await auser_query_validator(user_description)
+        if validity_result and not validity_result.get('query_validity', False):
+            return validity_result
+        
+        shift_data = await adata_requester("http://192.168.173.223:3000/api/v1/shift")
+        formatted_data = await run_blocking(self._retrieve_knowledge_base_info, user_description, shift_data)
+        if formatted_data is None:
             return None
+
+        chain, inputs = self._build_chain(form_type, user_description, formatted_data, activity_info)
+
+        try:
+            return await chain.ainvoke(inputs)
+        except Exception as e:
+            raise ValueError(f"Error generating form for operation: {e}")
+
+    async def astream_form(self, user_description: str, form_type: str, activity_info: str = None):
+        """
+        Streaming variant of agenerate_form. The form JSON is parsed while Gemini
+        generates it, so every section is available as soon as its object closes.
+        
+        Parameters:
+        user_description: Detailed description of the industrial operation
+        form_type: type of form. Values can either be 'shift_handover_log' or 'control_plan'
+        
+        Returns an async generator of ("invalid_query", validator result) if the query is rejected,
+        otherwise ("sections", section) for each completed section, then ("result", full form)
+        """
+        validity_result = await auser_query_validator(user_description)
+        if validity_result and not validity_result.get('query_validity', False):
+            yield "invalid_query", validity_result
+            return
+        
+        shift_data = await adata_requester("http://192.168.173.223:3000/api/v1/shift")
+        formatted_data = await run_blocking(self._retrieve_knowledge_base_info, user_description, shift_data)
+        if formatted_data is None:
+            raise ValueError("Knowledge base information could not be retrieved")
+
+        chain, inputs = self._build_chain(form_type, user_description, formatted_data, activity_info)
+        # Stream the text of prompt | llm and parse it here instead of through the chain's parser
+        prompt = chain.first
+        async for event in astream_json_items(prompt | self.llm, inputs, self.parser, ["sections"]):
+            yield event
+
     def save_form_to_json(self, form: Union[Dict, FormSchema], filename: str):
         """
         Save the generated form to a JSON file
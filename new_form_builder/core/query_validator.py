@@ -4,6 +4,7 @@ from langchain_google_genai import GoogleGenerativeAI
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import os
+from common.llm_cache import get_llm_cache
 
 # Load environment variables
 load_dotenv()
@@ -19,12 +20,12 @@ class QueryModel(BaseModel):
     query_validity: bool = Field(description="Validity of the query asked. True is Valid, False is Invalid.")
     reason: str = Field(description="Explanation of why the query is valid or invalid.")
 
-def user_query_validator(user_query: str):
+def _build_validator_chain():
     # Initialize JSON Output Parser
     parser = JsonOutputParser(pydantic_object=QueryModel)
 
     # Initialize the LLM
-    llm = GoogleGenerativeAI(model="gemini-1.5-pro", google_api_key=os.getenv("GOOGLE_API_KEY"))
+    llm = GoogleGenerativeAI(model="gemini-1.5-pro", google_api_key=os.getenv("GOOGLE_API_KEY"), cache=get_llm_cache())
 
     # Define the Prompt
     prompt = PromptTemplate(
@@ -48,7 +49,10 @@ def user_query_validator(user_query: str):
     )
 
     # Create the LLM Chain
-    chain = prompt | llm | parser
+    return prompt | llm | parser
+
+def user_query_validator(user_query: str):
+    chain = _build_validator_chain()
     
     try:
         response = chain.invoke({"query": user_query})
@@ -56,3 +60,14 @@ def user_query_validator(user_query: str):
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
+
+async def auser_query_validator(user_query: str):
+    """Async variant of user_query_validator that awaits the LLM call."""
+    chain = _build_validator_chain()
+    
+    try:
+        response = await chain.ainvoke({"query": user_query})
+        return response
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
@@ -33,3 +33,35 @@ PROBABILITY_SCALE = {
     "Practically impossible": 0.5,
     "Virtually impossible": 0.1
 }
+
+# Standard activities pre-computed in the hazard analysis library (smp/core/library.py),
+# matching the activity templates in new_form_builder/template
+SMP_ACTIVITIES = [
+    "Blasting",
+    "Drilling",
+    "Dumper Haulage",
+    "Dragline Operation",
+    "Excavator Operation",
+]
+
+# Other names of the standard activities, after normalization
+ACTIVITY_ALIASES = {
+    "explosive": "blasting",
+    "explosives": "blasting",
+    "explosive handling": "blasting",
+    "drill": "drilling",
+    "driller": "drilling",
+    "dumper": "dumper haulage",
+    "haulage": "dumper haulage",
+    "dumper operation": "dumper haulage",
+    "excavation": "excavator",
+    "shovel": "excavator",
+}
+
+# Minimum risk score (Probability x Exposure x Consequence) of each risk rating.
+# Scores range from 0.0000002 (0.1 x 0.02 x 0.0001) to 500 (10 x 10 x 5) on the scales above.
+RISK_RATING_THRESHOLDS = {
+    "High": 10,
+    "Medium": 1,
+    "Low": 0,
+}
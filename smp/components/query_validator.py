@@ -5,6 +5,7 @@ from langchain_core.prompts import PromptTemplate
 from typing import Dict, Union, Optional
 import os
 from dotenv import load_dotenv
+from common.llm_cache import get_llm_cache
 
 class QueryValidator(BaseModel):
     query_validity: bool = Field(description="The validity of the user query asked, 1(true) for valid, 0(false) for invalid")
@@ -19,7 +20,7 @@ class QueryValidator(BaseModel):
         return value
     
 def validate_query(user_query):
-    llm = GoogleGenerativeAI(model='gemini-1.5-pro', google_api_key=os.getenv('GOOGLE_API_KEY'))
+    llm = GoogleGenerativeAI(model='gemini-1.5-pro', google_api_key=os.getenv('GOOGLE_API_KEY'), cache=get_llm_cache())
     parser = JsonOutputParser(pydantic_object=QueryValidator)
     
     prompt = PromptTemplate(
@@ -0,0 +1,199 @@
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from smp.components.config import CONSEQUENCE_SCALE, EXPOSURE_SCALE, PROBABILITY_SCALE, RISK_RATING_THRESHOLDS
+
+
+class RiskScorer:
+    """
+    Deterministic risk scoring of SMP hazards: Risk Score = Probability x Exposure x Consequence
+    on the scales of smp/components/config.py, with the rating taken from score thresholds.
+
+    Factors may be given as scale labels ("Quite possible") or numbers. Numbers that are not
+    on the scale are snapped to the nearest scale factor (on a log scale, as the scales are
+    geometric), so every score is one the scales can produce. All hazards are scored in one
+    vectorised pass.
+    """
+
+    def __init__(self,
+                 probability_scale: Dict[str, float] = PROBABILITY_SCALE,
+                 exposure_scale: Dict[str, float] = EXPOSURE_SCALE,
+                 consequence_scale: Dict[str, float] = CONSEQUENCE_SCALE,
+                 thresholds: Dict[str, float] = RISK_RATING_THRESHOLDS):
+        """
+        Args:
+            probability_scale (dict): Probability label to factor.
+            exposure_scale (dict): Exposure label to factor.
+            consequence_scale (dict): Consequence label to factor.
+            thresholds (dict): Rating to the minimum score that earns it.
+        """
+        self.scales = {"probability": probability_scale, "exposure": exposure_scale,
+                       "consequences": consequence_scale}
+        self._labels = {field: {label.lower(): factor for label, factor in scale.items()}
+                        for field, scale in self.scales.items()}
+        self._factors = {field: np.array(sorted(set(scale.values())), dtype=float)
+                         for field, scale in self.scales.items()}
+        ordered = sorted(thresholds.items(), key=lambda item: item[1])
+        self._threshold_values = np.array([value for _, value in ordered], dtype=float)
+        self._ratings = np.array([rating for rating, _ in ordered], dtype=object)
+
+    def factors(self, field: str, values: Iterable[Any]) -> np.ndarray:
+        """
+        Map a column of factors to the scale of a field.
+
+        Args:
+            field (str): 'probability', 'exposure' or 'consequences'.
+            values (iterable): Scale labels or numbers.
+
+        Returns:
+            np.ndarray: Scale factors, NaN where a value could not be read.
+        """
+        if isinstance(values, np.ndarray) and values.dtype.kind in "fiu":
+            raw = values.astype(float)
+        else:
+            raw = np.array([self._read(field, value) for value in values], dtype=float)
+
+        # Snap to the nearest scale factor; non-positive numbers go to the lowest one
+        factors = self._factors[field]
+        logs = np.log(np.where(raw > 0, raw, factors[0]))
+        nearest = np.abs(logs[:, None] - np.log(factors)[None, :]).argmin(axis=1)
+        return np.where(np.isnan(raw), np.nan, factors[nearest])
+
+    def _read(self, field: str, value: Any) -> float:
+        if isinstance(value, str):
+            factor = self._labels[field].get(value.strip().lower())
+            if factor is not None:
+                return factor
+            try:
+                return float(value)
+            except ValueError:
+                return np.nan
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        return np.nan
+
+    def score(self, probability: Iterable[Any], exposure: Iterable[Any],
+              consequences: Iterable[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score hazards from their factor columns.
+
+        Returns:
+            tuple: Risk scores (NaN where a factor could not be read) and ratings (None there).
+        """
+        return self._combine(self.factors("probability", probability), self.factors("exposure", exposure),
+                             self.factors("consequences", consequences))
+
+    def _combine(self, probability: np.ndarray, exposure: np.ndarray,
+                 consequences: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        scores = probability * exposure * consequences
+        index = np.searchsorted(self._threshold_values, np.nan_to_num(scores, nan=-np.inf), side="right") - 1
+        ratings = np.where((index >= 0) & ~np.isnan(scores), self._ratings[np.maximum(index, 0)], None)
+        return scores, ratings
+
+    def score_hazards(self, hazards: List[Dict[str, Any]], overwrite: bool = True) -> Dict[str, Any]:
+        """
+        Score hazard dicts (HazardDetails) and replace the LLM's factors, score and rating
+        with the deterministic ones. Hazards whose factors cannot be read are left as they are.
+
+        Args:
+            hazards (list): Hazards to score, updated in place.
+            overwrite (bool): Whether to write the scores; False only validates.
+
+        Returns:
+            dict: 'scored' hazards, 'corrected' hazards whose score or rating differed from
+            the computed one, 'unscored' hazards and the 'elapsed_ms'.
+        """
+        start = time.perf_counter()
+        probability = self.factors("probability", [hazard.get("probability") for hazard in hazards])
+        exposure = self.factors("exposure", [hazard.get("exposure") for hazard in hazards])
+        consequences = self.factors("consequences", [hazard.get("consequences") for hazard in hazards])
+        scores, ratings = self._combine(probability, exposure, consequences)
+
+        given = np.array([hazard.get("risk_score") if isinstance(hazard.get("risk_score"), (int, float)) else np.nan
+                          for hazard in hazards], dtype=float)
+        scored = ~np.isnan(scores)
+        wrong_score = ~np.isclose(given, scores, rtol=1e-3)
+        wrong_rating = np.array([str(hazard.get("risk_rating", "")).lower() != str(rating).lower()
+                                 for hazard, rating in zip(hazards, ratings)], dtype=bool)
+        corrected = scored & (wrong_score | wrong_rating)
+
+        if overwrite:
+            for i in np.flatnonzero(scored):
+                hazard = hazards[i]
+                hazard["probability"] = _number(probability[i])
+                hazard["exposure"] = _number(exposure[i])
+                hazard["consequences"] = _number(consequences[i])
+                hazard["risk_score"] = _number(scores[i])
+                hazard["risk_rating"] = ratings[i]
+
+        return {"scored": int(scored.sum()), "corrected": int(corrected.sum()),
+                "unscored": int((~scored).sum()), "elapsed_ms": (time.perf_counter() - start) * 1000}
+
+    def score_analyses(self, analyses: List[Dict[str, Any]], overwrite: bool = True) -> Dict[str, Any]:
+        """
+        Score the hazards of several SMP analyses (SMPModel dicts) in one pass.
+
+        Args:
+            analyses (list): Analyses to score, updated in place.
+            overwrite (bool): Whether to write the scores; False only validates.
+
+        Returns:
+            dict: Report of score_hazards over all hazards.
+        """
+        hazards = [hazard for analysis in analyses for hazard in (analysis or {}).get("hazards") or []
+                   if isinstance(hazard, dict)]
+        return self.score_hazards(hazards, overwrite)
+
+
+def _number(value: float):
+    # Keep whole factors as ints, as in the SMP schema
+    value = round(float(value), 6)
+    return int(value) if value.is_integer() else value
+
+
+@lru_cache()
+def get_risk_scorer() -> RiskScorer:
+    """Return the scorer on the configured scales and thresholds."""
+    return RiskScorer()
+
+
+def build_risk_register(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Consolidate the hazards of several activity analyses into one risk register,
+    highest risk first, with counts per rating and a summary per activity.
+
+    Args:
+        entries (list): Dicts with the 'activity_name', optional 'section' and 'shift',
+            and the scored SMPModel 'result' of each activity.
+
+    Returns:
+        dict: 'hazards' (register rows), 'by_rating' counts and per-'activities' summaries.
+    """
+    rows = []
+    for entry in entries:
+        for hazard in (entry.get("result") or {}).get("hazards") or []:
+            rows.append({
+                "activity_name": entry["activity_name"],
+                "section": entry.get("section"),
+                "shift": entry.get("shift"),
+                **{key: hazard.get(key) for key in ("hazard_id", "hazard_aspect", "probability", "exposure",
+                                                     "consequences", "risk_score", "risk_rating",
+                                                     "additional_control_measures", "residual_impact")},
+            })
+
+    scores = np.array([row["risk_score"] if isinstance(row["risk_score"], (int, float)) else -np.inf
+                       for row in rows], dtype=float)
+    rows = [rows[i] for i in np.argsort(-scores, kind="stable")]
+
+    by_rating: Dict[str, int] = {}
+    activities: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        by_rating[row["risk_rating"]] = by_rating.get(row["risk_rating"], 0) + 1
+        # Rows are sorted, so the first row of an activity is its highest risk
+        summary = activities.setdefault(row["activity_name"], {"hazards": 0, "max_risk_score": row["risk_score"],
+                                                               "max_risk_rating": row["risk_rating"]})
+        summary["hazards"] += 1
+    return {"hazards": rows, "by_rating": by_rating, "activities": activities}
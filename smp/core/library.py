@@ -0,0 +1,193 @@
+import os
+import re
+import json
+import copy
+import argparse
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from chatbot.db.manifest import IngestionManifest
+from smp.core.schema import HazardDetails
+from smp.components.config import ACTIVITY_ALIASES
+
+# Words that do not change which activity is meant ("Blasting Operations" is "Blasting")
+GENERIC_WORDS = {"operation", "operations", "activity", "activities", "work", "works", "process"}
+
+
+def normalize_activity(activity_name: str) -> str:
+    """
+    Key of an activity in the library: lowercase, punctuation and generic words
+    such as "operation" removed, and known aliases mapped to the standard name.
+
+    :param activity_name: Activity name as given by the user
+    :return: Normalized activity name
+    """
+    words = re.sub(r"[^a-z0-9]+", " ", activity_name.lower()).split()
+    while len(words) > 1 and words[-1] in GENERIC_WORDS:
+        words.pop()
+    name = " ".join(words)
+    return ACTIVITY_ALIASES.get(name, name)
+
+
+def validate_analysis(result) -> dict:
+    """
+    Check that a generated hazard analysis has the SMPModel structure before it is stored
+
+    :param result: Parsed chain output
+    :return: The analysis
+    :raises ValueError: If it is not a complete analysis
+    """
+    if not isinstance(result, dict) or not isinstance(result.get("hazards"), list) or not result["hazards"]:
+        raise ValueError("Analysis has no hazards")
+    for hazard in result["hazards"]:
+        missing = [name for name in HazardDetails.__fields__ if name not in hazard]
+        if missing:
+            raise ValueError(f"Hazard {hazard.get('hazard_id')} is missing {', '.join(missing)}")
+        for name in ("probability", "exposure", "consequences"):
+            if not isinstance(hazard[name], (int, float)):
+                raise ValueError(f"Hazard {hazard['hazard_id']} has a non-numeric {name}")
+        if not isinstance(hazard["additional_control_measures"], list):
+            raise ValueError(f"Hazard {hazard['hazard_id']} has no list of additional control measures")
+    return result
+
+
+def merge_analysis(base: dict, delta) -> dict:
+    """
+    Apply the hazards the merge prompt added or changed to a library analysis.
+    A hazard with the id of an existing one replaces it, others are appended.
+
+    :param base: Stored analysis
+    :param delta: Merge chain output with the new and changed hazards
+    :return: The merged analysis
+    """
+    merged = copy.deepcopy(base)
+    hazards = (delta or {}).get("hazards") or []
+    positions = {hazard.get("hazard_id"): i for i, hazard in enumerate(merged["hazards"])}
+    for hazard in hazards:
+        if hazard.get("hazard_id") in positions:
+            merged["hazards"][positions[hazard["hazard_id"]]] = hazard
+        else:
+            merged["hazards"].append(hazard)
+    return merged
+
+
+class HazardLibrary:
+    """
+    Pre-computed hazard analyses of the standard activities, indexed by normalized
+    activity name. Each entry records the knowledge base version it was generated
+    from and is only served while the knowledge base is unchanged. The library is
+    a JSON file shared by the API and the job workers that refresh it.
+    """
+
+    def __init__(self, path: str = "data/smp_library/library.json",
+                 store_path: str = "data/vector_db/faiss_index"):
+        """
+        :param path: JSON file of the library
+        :param store_path: Vector store whose manifest versions the entries
+        """
+        self.path = path
+        self.store_path = store_path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        self._mtime = None
+        self._version = None
+        self._manifest_mtime = None
+
+    def _reload(self) -> None:
+        # Pick up entries written by other processes
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime != self._mtime:
+            entries = {}
+            if mtime is not None:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f).get("entries", {})
+            self._entries, self._mtime = entries, mtime
+
+    def knowledge_base_version(self) -> str:
+        """ Version of the knowledge base on disk, re-read only when its manifest changes. """
+        path = os.path.join(self.store_path, IngestionManifest.FILE_NAME)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        with self._lock:
+            if self._version is None or mtime != self._manifest_mtime:
+                self._version = IngestionManifest.load(self.store_path).version()
+                self._manifest_mtime = mtime
+            return self._version
+
+    def get(self, activity_name: str) -> Optional[dict]:
+        """
+        Stored analysis of an activity, if there is one for the current knowledge base
+
+        :param activity_name: Activity name as given by the user
+        :return: Copy of the analysis named after the request, or None
+        """
+        version = self.knowledge_base_version()
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(normalize_activity(activity_name))
+            if entry is None or entry["kb_version"] != version:
+                return None
+            result = copy.deepcopy(entry["result"])
+        result["activity_name"] = activity_name
+        return result
+
+    def put(self, activity_name: str, result: dict, kb_version: str) -> None:
+        """
+        Store a validated analysis
+
+        :param activity_name: Standard activity name
+        :param result: Analysis generated for it
+        :param kb_version: Knowledge base version it was generated from
+        """
+        with self._lock:
+            self._reload()
+            self._entries[normalize_activity(activity_name)] = {
+                "activity_name": activity_name,
+                "kb_version": kb_version,
+                "generated_at": datetime.now().isoformat(),
+                "result": validate_analysis(result),
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"entries": self._entries}, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.path.getmtime(self.path)
+
+    def stale(self, activity_names: List[str]) -> List[str]:
+        """ Activities with no entry for the current knowledge base. """
+        version = self.knowledge_base_version()
+        with self._lock:
+            self._reload()
+            return [name for name in activity_names
+                    if self._entries.get(normalize_activity(name), {}).get("kb_version") != version]
+
+    def status(self) -> Dict[str, dict]:
+        """ Activities in the library with their generation time and freshness. """
+        version = self.knowledge_base_version()
+        with self._lock:
+            self._reload()
+            return {key: {"activity_name": entry["activity_name"], "generated_at": entry["generated_at"],
+                          "hazards": len(entry["result"]["hazards"]), "fresh": entry["kb_version"] == version}
+                    for key, entry in self._entries.items()}
+
+
+@lru_cache()
+def get_hazard_library() -> HazardLibrary:
+    """ Return the process-wide hazard analysis library, stored at SMP_LIBRARY_PATH. """
+    return HazardLibrary(os.getenv("SMP_LIBRARY_PATH", "data/smp_library/library.json"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-compute the hazard analyses of the standard activities.")
+    parser.add_argument("--force", action="store_true", help="Regenerate entries that are still fresh")
+    args = parser.parse_args()
+
+    from smp.core.smp import HazardAnalysisChain
+    chain = HazardAnalysisChain(os.getenv("GOOGLE_API_KEY"))
+    print(json.dumps(chain.precompute_library(force=args.force), indent=2))
+
+
+if __name__ == "__main__":
+    main()
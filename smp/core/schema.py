@@ -13,10 +13,10 @@ class HazardDetails(BaseModel):
     hazard_aspect: str = Field(description="The specific hazard or environmental aspect identified in the activity.")
     possible_outcome: str = Field(description="The potential consequences of the hazard (e.g., injury, property damage).")
     existing_control_measures: str = Field(description="Current safety measures or protocols in place to manage the hazard.")
-    probability: int = Field(description="The likelihood of the hazard occurring, based on a numeric scale.")
-    exposure: int = Field(description="The frequency or level of exposure to the hazard, represented on a numeric scale.")
-    consequences: int = Field(description="The potential severity of the consequences if the hazard occurs, on a numeric scale.")
-    risk_score: int = Field(description="The calculated risk score, based on the formula: Risk Score = Probability * Exposure * Consequences.")
+    probability: float = Field(description="The likelihood of the hazard occurring, a factor of the probability scale.")
+    exposure: float = Field(description="The frequency or level of exposure to the hazard, a factor of the exposure scale.")
+    consequences: float = Field(description="The potential severity of the consequences if the hazard occurs, a factor of the consequence scale.")
+    risk_score: float = Field(description="The calculated risk score, based on the formula: Risk Score = Probability * Exposure * Consequences.")
     risk_rating: str = Field(description="The risk level derived from the risk score, typically categorized (e.g., 'Low', 'Medium', 'High').")
     additional_control_measures: List[MitigationStep] = Field(description="New or additional measures to control the hazard (maximum of 2 items).", max_items=2)
     residual_impact: str = Field(description="The remaining risk level after applying additional control measures (e.g., 'Low', 'Medium', 'High').")
@@ -1,4 +1,8 @@
 import os
+import json
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Langchain and AI imports
@@ -10,8 +14,14 @@ from langchain_core.output_parsers import JsonOutputParser
 # Vector DB and SMP imports
 from smp.core.schema import SMPModel
 from smp.data.vector_store import KnowledgeBase
-from smp.components.config import EXPOSURE_SCALE, CONSEQUENCE_SCALE, PROBABILITY_SCALE
-from smp.utils.data_req import rtd_analyser
+from smp.components.config import EXPOSURE_SCALE, CONSEQUENCE_SCALE, PROBABILITY_SCALE, SMP_ACTIVITIES
+from smp.core.library import get_hazard_library, merge_analysis, validate_analysis
+from smp.components.risk import build_risk_register, get_risk_scorer
+from smp.utils.data_req import artd_analyser, artd_analyser_many, rtd_analyser, rtd_analyser_many
+from common.executor import run_blocking
+from common.llm_cache import get_llm_cache
+from common.streaming import astream_json_items
+from common.context_budget import compress_json, get_context_budget, get_context_stats, pack_chunks
 # Load environment variables
 load_dotenv()
 
@@ -22,7 +32,8 @@ class HazardAnalysisChain:
         
         self.llm = GoogleGenerativeAI(
             model="gemini-1.5-pro", 
-            google_api_key=google_api_key
+            google_api_key=google_api_key,
+            cache=get_llm_cache()
         )
         
         self.knowledge_base = KnowledgeBase(api_key=google_api_key)
@@ -35,7 +46,7 @@ class HazardAnalysisChain:
             The user has given you additional information: {input_info}. Use this information if it is clear and relevant to the analysis. 
             
             Knowledge Base Information: {knowledge_base_info}. Use only relevant information from the knowledge base information given.
-            Real time data information in concise version: will be given later
+            Real time data information in concise version: {rtd_info}
             Follow these instructions for the hazard analysis:
             
             1. Incorporate insights from the context information and input provided.
@@ -43,7 +54,10 @@ class HazardAnalysisChain:
             3. For each identified hazard:
             - Describe in detail the potential outcomes and consequences of the hazard.
             - Analyze existing control measures, their effectiveness, and any gaps.
-            - Determine the potential risk factors, including likelihood, severity, and exposure.
+            - Determine the potential risk factors, including likelihood, severity, and exposure, as factors of these scales:
+              Probability: {probability_scale}
+              Exposure: {exposure_scale}
+              Consequences: {consequence_scale}
             - Propose practical and actionable mitigation measures, including technological, procedural, or administrative controls.
             - Specify responsible parties for implementing each mitigation step.
             - Assess the potential residual impact and suggest monitoring or review mechanisms for ongoing safety.
@@ -53,19 +67,61 @@ class HazardAnalysisChain:
             {format_instruction}
             ''',
             input_variables=["activity_name", "knowledge_base_info", "input_info"],
-            partial_variables={"format_instruction": self.parser.get_format_instructions()},
+            partial_variables={
+                "format_instruction": self.parser.get_format_instructions(),
+                "rtd_info": "Not available",
+                "probability_scale": json.dumps(PROBABILITY_SCALE),
+                "exposure_scale": json.dumps(EXPOSURE_SCALE),
+                "consequence_scale": json.dumps(CONSEQUENCE_SCALE),
+            },
         )
 
     
         self.chain = self.prompt | self.llm | self.parser
+        
+        # Fold real-time shift, SMP and rounds data from the backend into generated analyses
+        self.use_rtd = os.getenv("SMP_RTD", "false").lower() == "true"
+        
+        # Serves the pre-computed analyses of the standard activities; the LLM then
+        # only merges the user's additional information into the stored analysis
+        self.library = get_hazard_library()
+        self.merge_prompt = PromptTemplate(
+            template='''Hazard Analysis Update Task:
+            Below is an existing hazard analysis of the coal mining activity "{activity_name}":
+            {analysis}
+            
+            The user has given you additional information: {input_info}.
+            If it is clear and relevant, update the analysis with it:
+            - Revise the hazards it affects (keep their hazard_id) and add any new hazard it reveals.
+            - Keep probability, exposure and consequences on the scales used in the existing analysis.
+            Return only the revised and new hazards, with every field; return an empty hazards list if nothing changes.
+
+            Return the output as JSON in the following format:
+            {format_instruction}
+            ''',
+            input_variables=["activity_name", "analysis", "input_info"],
+            partial_variables={"format_instruction": self.parser.get_format_instructions()},
+        )
+        self.merge_chain = self.merge_prompt | self.llm | self.parser
     
-    def perform_hazard_analysis(self, activity_name, input_info=None, top_k=3):
+    def _retrieve_knowledge_base_info(self, activity_name):
         """
-        Perform hazard analysis using activity name as context query
+        Load the vector store if needed and format the most relevant chunks for the prompt
         
         :param activity_name: Name of the mining activity
-        :param top_k: Number of top context results to retrieve
-        :return: Hazard analysis results
+        :return: Formatted knowledge base information, or None on failure
+        """
+        formatted = self._retrieve_knowledge_base_info_many([activity_name])
+        return None if formatted is None else formatted[activity_name]
+    
+    def _retrieve_knowledge_base_info_many(self, activity_names):
+        """
+        Format the most relevant chunks for several activities with a single batched
+        retrieval pass (one embedding request and one index search for all of them),
+        each packed under the hazard analysis token budget
+        
+        :param activity_names: Names of the mining activities
+        :return: Dict of activity name to formatted knowledge base information, or None on failure
         """
         if self.knowledge_base.vector_store is None:
             try:
@@ -77,9 +133,13 @@ class HazardAnalysisChain:
                 return None
                                                       
         try:
-            knowledge_base_info = self.knowledge_base.query_vector_store(activity_name)
-            formatted_data = "\n".join([f"- {content}" for content, _ in knowledge_base_info])
-            print(formatted_data)
+            knowledge_base_info = self.knowledge_base.query_many(activity_names)
+            formatted = {}
+            for activity_name, results in zip(activity_names, knowledge_base_info):
+                packed = pack_chunks(results, get_context_budget("hazard_analysis"),
+                                     format_chunk=lambda content, _: f"- {content}")
+                get_context_stats().record("hazard_analysis", packed)
+                formatted[activity_name] = packed.text
         except ValueError as ve:
             print(f"ValueError: {ve}")
             return None
@@ -87,19 +147,334 @@ class HazardAnalysisChain:
             print(f"Error querying knowledge base: {e}")
             return None
         
+        return formatted
+    
+    def perform_hazard_analysis(self, activity_name, input_info=None, top_k=3, use_library=True):
+        """
+        Perform hazard analysis using activity name as context query. Standard activities
+        are served from the pre-computed library, with only input_info merged in by the LLM
+        
+        :param activity_name: Name of the mining activity
+        :param top_k: Number of top context results to retrieve
+        :param use_library: Whether to serve pre-computed analyses
+        :return: Hazard analysis results
+        """
+        cached = self.library.get(activity_name) if use_library else None
+        if cached is not None:
+            if not input_info:
+                return cached
+            return self._score(merge_analysis(cached, self.merge_chain.invoke(self._merge_inputs(cached, input_info))))
+        
+        formatted_data = self._retrieve_knowledge_base_info(activity_name)
+        if formatted_data is None:
+            return None
         
-        rtd_data = {"shift": "shift_dat", "smp_data": "smp_data"}
-        # rtd_data = rtd_analyser(activity_name)
         result = self.chain.invoke({
             "activity_name": activity_name,
             "knowledge_base_info": formatted_data,
             "input_info": input_info,
-            # "iot_data":{},
-            # "shift_data": rtd_data["shift"] or {},
-            # "smp_data": rtd_data["smp"] or {},
-            
+            "rtd_info": self._format_rtd(rtd_analyser(activity_name)) if self.use_rtd else "Not available",
         })
         
+        return self._score(result)
+    
+    async def aperform_hazard_analysis(self, activity_name, input_info=None, top_k=3, use_library=True):
+        """
+        Async variant of perform_hazard_analysis. Retrieval runs on the bounded
+        blocking pool and the LLM chain is awaited, so the event loop is never stalled.
+        
+        :param activity_name: Name of the mining activity
+        :param top_k: Number of top context results to retrieve
+        :param use_library: Whether to serve pre-computed analyses
+        :return: Hazard analysis results
+        """
+        cached = self.library.get(activity_name) if use_library else None
+        if cached is not None:
+            if not input_info:
+                return cached
+            return self._score(merge_analysis(cached, await self.merge_chain.ainvoke(self._merge_inputs(cached, input_info))))
+        
+        formatted_data, rtd_info = await asyncio.gather(run_blocking(self._retrieve_knowledge_base_info, activity_name),
+                                                        self._arealtime_info(activity_name))
+        if formatted_data is None:
+            return None
+        
+        result = await self.chain.ainvoke({
+            "activity_name": activity_name,
+            "knowledge_base_info": formatted_data,
+            "input_info": input_info,
+            "rtd_info": rtd_info,
+        })
+        
+        return self._score(result)
+    
+    async def astream_hazard_analysis(self, activity_name, input_info=None, use_library=True):
+        """
+        Streaming variant of aperform_hazard_analysis. The JSON is parsed while Gemini
+        generates it, so every hazard is available as soon as its object closes.
+        
+        :param activity_name: Name of the mining activity
+        :param input_info: Additional information from the user
+        :param use_library: Whether to serve pre-computed analyses
+        :return: Async generator of ("hazards", hazard) for each completed hazard, then ("result", full analysis)
+        """
+        cached = self.library.get(activity_name) if use_library else None
+        if cached is not None:
+            if input_info:
+                cached = self._score(merge_analysis(cached, await self.merge_chain.ainvoke(self._merge_inputs(cached, input_info))))
+            for hazard in cached["hazards"]:
+                yield "hazards", hazard
+            yield "result", cached
+            return
+        
+        formatted_data, rtd_info = await asyncio.gather(run_blocking(self._retrieve_knowledge_base_info, activity_name),
+                                                        self._arealtime_info(activity_name))
+        if formatted_data is None:
+            raise ValueError("Knowledge base information could not be retrieved")
+        
+        async for event in astream_json_items(self.prompt | self.llm, {
+            "activity_name": activity_name,
+            "knowledge_base_info": formatted_data,
+            "input_info": input_info,
+            "rtd_info": rtd_info,
+        }, self.parser, ["hazards"]):
+            key, data = event
+            if key == "hazards":
+                get_risk_scorer().score_hazards([data])
+            else:
+                self._score(data)
+            yield key, data
+    
+    def _plan_batch(self, activities, use_library):
+        """
+        Group a mine plan's activities so that each distinct activity and input is analysed once
+        
+        :param activities: Activity names, or dicts with 'activity_name', optional 'input_info', and optional 'section'
+                           and 'shift' labels that are carried into the results and the risk register
+        :param use_library: Whether to serve pre-computed analyses
+        :return: Dict of (activity name, input_info) to its plan items, and the library hits
+        """
+        groups = {}
+        for activity in activities:
+            item = {"activity_name": activity} if isinstance(activity, str) else dict(activity)
+            groups.setdefault((item["activity_name"], item.get("input_info") or ""), []).append(item)
+        hits = {key: self.library.get(key[0]) if use_library else None for key in groups}
+        return groups, hits
+    
+    def _invoke_many(self, chain, inputs, max_concurrency=4):
+        """
+        Invoke a chain on several inputs from a bounded thread pool. Unlike chain.batch,
+        a failed call only fails its own input
+        
+        :param chain: Chain to invoke
+        :param inputs: Chain inputs
+        :param max_concurrency: Maximum number of concurrent calls
+        :return: Output, or the raised exception, for every input
+        """
+        def invoke(context, chain_inputs):
+            try:
+                return context.run(chain.invoke, chain_inputs)
+            except Exception as e:
+                return e
+        
+        # Each call runs in a copy of the caller's context, so llm_cache_bypass still applies
+        contexts = [contextvars.copy_context() for _ in inputs]
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            return list(pool.map(invoke, contexts, inputs))
+    
+    def _batch_entries(self, items, result=None, error=None):
+        if error is not None:
+            return [{**item, "error": error} for item in items]
+        return [{**item, "result": result} for item in items]
+    
+    def perform_batch_hazard_analysis(self, activities, max_concurrency=4, use_library=True):
+        """
+        Perform hazard analysis for all activities of a mine plan: one batched retrieval
+        pass for every activity not in the library, then the LLM calls with bounded concurrency
+        
+        :param activities: Activity names, or dicts with 'activity_name', optional 'input_info', and optional 'section'
+                           and 'shift' labels that are carried into the results and the risk register
+        :param max_concurrency: Maximum number of concurrent LLM calls
+        :param use_library: Whether to serve pre-computed analyses
+        :return: Dict with the 'results' and 'errors' per activity and the consolidated risk 'register'
+        """
+        groups, hits = self._plan_batch(activities, use_library)
+        outcomes = {}
+        merges = [key for key in groups if hits[key] is not None and key[1]]
+        misses = [key for key in groups if hits[key] is None]
+        for key in groups:
+            if hits[key] is not None and not key[1]:
+                outcomes[key] = hits[key]
+        
+        if merges:
+            deltas = self._invoke_many(self.merge_chain, [self._merge_inputs(hits[key], key[1]) for key in merges],
+                                       max_concurrency)
+            for key, delta in zip(merges, deltas):
+                outcomes[key] = delta if isinstance(delta, Exception) else merge_analysis(hits[key], delta)
+        if misses:
+            names = list(dict.fromkeys(name for name, _ in misses))
+            formatted = self._retrieve_knowledge_base_info_many(names)
+            if formatted is None:
+                raise ValueError("Knowledge base information could not be retrieved")
+            rtd_info = self._realtime_info_many(names)
+            results = self._invoke_many(self.chain, [{"activity_name": name, "knowledge_base_info": formatted[name],
+                                                      "input_info": input_info, "rtd_info": rtd_info[name]}
+                                                     for name, input_info in misses],
+                                        max_concurrency)
+            outcomes.update(zip(misses, results))
+        
+        entries, errors = [], []
+        for key, items in groups.items():
+            outcome = outcomes[key]
+            if isinstance(outcome, Exception):
+                errors.extend(self._batch_entries(items, error=str(outcome)))
+            else:
+                entries.extend(self._batch_entries(items, result=self._score(outcome)))
+        return {"results": entries, "errors": errors, "register": build_risk_register(entries)}
+    
+    async def astream_batch_hazard_analysis(self, activities, max_concurrency=4, use_library=True):
+        """
+        Async variant of perform_batch_hazard_analysis that yields every activity's analysis
+        as soon as it completes, library hits first
+        
+        :param activities: Activity names, or dicts with 'activity_name', optional 'input_info', and optional 'section'
+                           and 'shift' labels that are carried into the results and the risk register
+        :param max_concurrency: Maximum number of concurrent LLM calls
+        :param use_library: Whether to serve pre-computed analyses
+        :return: Async generator of ("activity", entry) or ("error", entry) per activity, then ("register", risk register)
+        """
+        groups, hits = self._plan_batch(activities, use_library)
+        misses = list(dict.fromkeys(name for (name, _), hit in hits.items() if hit is None))
+        formatted, rtd_info = {}, {}
+        if misses:
+            formatted, rtd_info = await asyncio.gather(run_blocking(self._retrieve_knowledge_base_info_many, misses),
+                                                       self._arealtime_info_many(misses))
+            if formatted is None:
+                raise ValueError("Knowledge base information could not be retrieved")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def analyse(key):
+            name, input_info = key
+            try:
+                hit = hits[key]
+                if hit is not None and not input_info:
+                    return key, self._score(hit), None
+                async with semaphore:
+                    if hit is not None:
+                        delta = await self.merge_chain.ainvoke(self._merge_inputs(hit, input_info))
+                        return key, self._score(merge_analysis(hit, delta)), None
+                    result = await self.chain.ainvoke({"activity_name": name, "knowledge_base_info": formatted[name],
+                                                       "input_info": input_info, "rtd_info": rtd_info[name]})
+                    return key, self._score(result), None
+            except Exception as e:
+                return key, None, str(e)
+        
+        tasks = [asyncio.ensure_future(analyse(key)) for key in groups]
+        entries = []
+        try:
+            for completed in asyncio.as_completed(tasks):
+                key, result, error = await completed
+                for entry in self._batch_entries(groups[key], result, error):
+                    if error is None:
+                        entries.append(entry)
+                    yield ("error" if error is not None else "activity"), entry
+        finally:
+            # Stop the remaining calls if the consumer goes away
+            for task in tasks:
+                task.cancel()
+        yield "register", build_risk_register(entries)
+    
+    async def _arealtime_info(self, activity_name):
+        """
+        Real-time shift, SMP and rounds data relevant to the activity, fetched within the
+        RTD deadline, or "Not available" when real-time data is disabled (SMP_RTD)
+        """
+        if not self.use_rtd:
+            return "Not available"
+        return self._format_rtd(await artd_analyser(activity_name))
+    
+    async def _arealtime_info_many(self, activity_names):
+        """
+        Real-time data for several activities, with every endpoint fetched once
+        
+        :param activity_names: Names of the activities
+        :return: Dict of activity name to its real-time data, or "Not available"
+        """
+        if not self.use_rtd:
+            return {name: "Not available" for name in activity_names}
+        rtd_data = await artd_analyser_many(activity_names)
+        return {name: self._format_rtd(rtd_data[name]) for name in activity_names}
+    
+    def _realtime_info_many(self, activity_names):
+        """
+        Blocking variant of _arealtime_info_many
+        """
+        if not self.use_rtd:
+            return {name: "Not available" for name in activity_names}
+        rtd_data = rtd_analyser_many(activity_names)
+        return {name: self._format_rtd(rtd_data[name]) for name in activity_names}
+    
+    def _format_rtd(self, rtd_data):
+        rtd_data = {name: records for name, records in rtd_data.items() if name != "errors" and records}
+        if not rtd_data:
+            return "Not available"
+        return compress_json(rtd_data, get_context_budget("hazard_analysis") // 4)
+    
+    def _score(self, result):
+        """
+        Replace the LLM's risk scores and ratings with the deterministic ones of the SMP scales
+        
+        :param result: Hazard analysis
+        :return: The analysis, scored in place
+        """
+        if isinstance(result, dict):
+            get_risk_scorer().score_analyses([result])
         return result
-            
-            
\ No newline at end of file
+    
+    def _merge_inputs(self, analysis, input_info):
+        return {
+            "activity_name": analysis["activity_name"],
+            "analysis": compress_json(analysis, get_context_budget("hazard_analysis")),
+            "input_info": input_info,
+        }
+    
+    def precompute_library(self, activities=None, force=False, progress=None):
+        """
+        Generate, validate and store the hazard analyses of the standard activities.
+        Retrieval for all activities is one batched pass and the analyses are generated
+        concurrently. Entries still fresh for the current knowledge base are kept unless forced.
+        
+        :param activities: Activity names (defaults to SMP_ACTIVITIES)
+        :param force: Regenerate fresh entries too
+        :param progress: Optional callback(fraction, message)
+        :return: Summary with the generated, fresh and failed activities
+        """
+        activities = list(activities or SMP_ACTIVITIES)
+        pending = activities if force else self.library.stale(activities)
+        summary = {"generated": [], "fresh": [name for name in activities if name not in pending], "failed": {}}
+        if not pending:
+            return summary
+        
+        # Analyses must reflect the knowledge base on disk, which another process may have updated
+        version = self.library.knowledge_base_version()
+        self.knowledge_base.load_vector_store(self.library.store_path)
+        if progress:
+            progress(0.1, "Retrieving knowledge base information")
+        formatted = self._retrieve_knowledge_base_info_many(pending)
+        if formatted is None:
+            raise ValueError("Knowledge base information could not be retrieved")
+        
+        if progress:
+            progress(0.3, f"Generating {len(pending)} analyses")
+        results = self._invoke_many(self.chain, [{"activity_name": name, "knowledge_base_info": formatted[name],
+                                                  "input_info": None} for name in pending])
+        for name, result in zip(pending, results):
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                self.library.put(name, validate_analysis(self._score(result)), version)
+                summary["generated"].append(name)
+            except Exception as e:
+                summary["failed"][name] = str(e)
+        return summary
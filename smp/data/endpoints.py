@@ -36,8 +36,8 @@ endpoints = {
     "get_shift_info": "/api/v1/shift",
     "get_section_info": "/api/v1/section",
     "get_mine_info": "/api/v1/mine",
-    "get_smp_rm_info: /api/v1/smp/rm"
-    "get_smp_ra_info: /api/v1/smp/ra"
+    "get_smp_rm_info": "/api/v1/smp/rm",
+    "get_smp_ra_info": "/api/v1/smp/ra",
     "get_supervisor_info": "/api/v1/supervisor",
     "get_user_info": "/api/v1/user",
     "get_rounds_info": "/api/v1/rounds",
@@ -45,7 +45,18 @@ endpoints = {
 
 mapping = {
     "get_shift_info": "shift",
-    "get_smp_info": "smp/rm",
-    "get_round_info": "round",
+    "get_smp_rm_info": "smp",
+    "get_rounds_info": "rounds",
     # "get_iot_info": "iot"
+}
+
+# How real-time data is extracted for hazard analysis, by the mapping name of its endpoint:
+# 'path' to the records in the response, 'where' field values they must have, 'match'
+# to keep only records mentioning the activity, 'fields' to keep, at most 'limit'
+# records, and the endpoint's 'timeout' in seconds.
+rtd_sources = {
+    "shift": {"path": "data", "where": {"isActive": True}, "fields": ["shiftId", "name", "startTime", "endTime"],
+              "limit": 1, "timeout": 1.0},
+    "smp": {"path": "data", "match": True, "limit": 10, "timeout": 1.0},
+    "rounds": {"path": "data", "match": True, "limit": 10, "timeout": 1.0},
 }
\ No newline at end of file
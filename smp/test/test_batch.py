@@ -0,0 +1,151 @@
+import os
+import json
+import asyncio
+import tempfile
+from typing import Any, List, Optional
+
+from langchain_core.language_models.llms import LLM
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+import smp.core.smp as smp_module
+from smp.components.risk import build_risk_register
+from smp.test.test_library import build_chain, hazard
+
+
+class ConcurrencyLLM(LLM):
+    """LLM stand-in answering with one hazard named after the activity, tracking concurrent calls."""
+    active: int = 0
+    peak: int = 0
+    calls: int = 0
+    prompts: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "concurrency"
+
+    def _respond(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        name = prompt.split('Given the activity "')[1].split('"')[0]
+        if name == "Broken":
+            raise ValueError("Gemini refused")
+        probability = 10 if name == "Blasting" else 1
+        return json.dumps({"activity_name": name, "hazards": [hazard(f"{name[:2].upper()}-1", name, probability)]})
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        self.calls += 1
+        return self._respond(prompt)
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None,
+                     **kwargs: Any) -> str:
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.02)
+            return self._respond(prompt)
+        finally:
+            self.active -= 1
+
+
+def batch_chain(tmp):
+    chain, _ = build_chain(tmp, {})
+    llm = ConcurrencyLLM()
+    chain.chain = chain.prompt | llm | chain.parser
+    retrievals = []
+    retrieve = chain._retrieve_knowledge_base_info_many
+    chain._retrieve_knowledge_base_info_many = lambda names: retrievals.append(list(names)) or retrieve(names)
+    return chain, llm, retrievals
+
+
+PLAN = [{"activity_name": f"Activity {i}", "section": f"Section {i % 3}", "shift": "A"} for i in range(8)]
+
+
+def test_stream_batch_bounds_concurrency_and_builds_register():
+    with tempfile.TemporaryDirectory() as tmp:
+        chain, llm, retrievals = batch_chain(tmp)
+        activities = ["Blasting", "Blasting", "Broken"] + PLAN
+
+        async def collect():
+            return [event async for event in chain.astream_batch_hazard_analysis(activities, max_concurrency=3)]
+
+        events = asyncio.run(collect())
+        assert len(retrievals) == 1 and len(retrievals[0]) == 10
+        assert llm.calls == 10 and llm.peak == 3
+        assert sorted(key for key, _ in events[:-1]) == ["activity"] * 10 + ["error"]
+        assert [data["activity_name"] for key, data in events if key == "error"] == ["Broken"]
+
+        key, register = events[-1]
+        assert key == "register"
+        assert len(register["hazards"]) == 10
+        assert register["hazards"][0]["activity_name"] == "Blasting" and register["hazards"][0]["risk_rating"] == "High"
+        assert register["activities"]["Blasting"]["hazards"] == 2
+        assert register["hazards"][-1]["section"].startswith("Section")
+
+
+def test_sync_batch_serves_library_hits_without_the_llm():
+    with tempfile.TemporaryDirectory() as tmp:
+        chain, llm, retrievals = batch_chain(tmp)
+        chain.precompute_library(["Blasting"])
+        llm.calls = 0
+        retrievals.clear()
+
+        batch = chain.perform_batch_hazard_analysis(["Blasting operations", "Activity 1", "Broken"], max_concurrency=2)
+        assert retrievals == [["Activity 1", "Broken"]]
+        assert llm.calls == 2
+        assert [entry["activity_name"] for entry in batch["results"]] == ["Blasting operations", "Activity 1"]
+        assert batch["errors"][0]["activity_name"] == "Broken"
+        assert batch["register"]["by_rating"] == {"High": 1, "Medium": 1}
+
+
+def test_batch_uses_realtime_data_per_activity():
+    fetched = []
+
+    def fake_rtd_analyser_many(queries):
+        fetched.append(list(queries))
+        return {query: {"rounds": [{"note": f"{query} area cleared"}]} for query in queries}
+
+    async def fake_artd_analyser_many(queries):
+        return fake_rtd_analyser_many(queries)
+
+    originals = smp_module.artd_analyser_many, smp_module.rtd_analyser_many
+    smp_module.artd_analyser_many, smp_module.rtd_analyser_many = fake_artd_analyser_many, fake_rtd_analyser_many
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            chain, llm, _ = batch_chain(tmp)
+            chain.use_rtd = True
+            plan = [{"activity_name": "Drilling", "section": "North", "shift": "A"},
+                    {"activity_name": "Drilling", "section": "South", "shift": "B"},
+                    {"activity_name": "Hauling", "section": "North", "shift": "A"}]
+
+            async def collect():
+                return [event async for event in chain.astream_batch_hazard_analysis(plan)]
+
+            events = asyncio.run(collect())
+            sync_batch = chain.perform_batch_hazard_analysis(plan)
+    finally:
+        smp_module.artd_analyser_many, smp_module.rtd_analyser_many = originals
+
+    # Real-time data is fetched once per batch and folded into each activity's prompt
+    assert fetched == [["Drilling", "Hauling"], ["Drilling", "Hauling"]]
+    assert len(llm.prompts) == 4
+    assert all(("Drilling area cleared" in prompt) != ("Hauling area cleared" in prompt) for prompt in llm.prompts)
+    assert all("Not available" not in prompt for prompt in llm.prompts)
+    assert [data["section"] for key, data in events if key == "activity"].count("North") == 2
+    assert len(sync_batch["results"]) == 3
+
+
+def test_register_orders_by_risk():
+    entries = [{"activity_name": "Drilling", "result": {"hazards": [hazard("DR-1", "Dust", 1)]}},
+               {"activity_name": "Blasting", "section": "North", "result": {"hazards": [hazard("BO-1", "Fly rock", 10),
+                                                                                        hazard("BO-2", "Misfire", 3)]}}]
+    register = build_risk_register(entries)
+    assert [row["hazard_id"] for row in register["hazards"]] == ["BO-1", "BO-2", "DR-1"]
+    assert register["activities"]["Blasting"] == {"hazards": 2, "max_risk_score": 30, "max_risk_rating": "Medium"}
+
+
+if __name__ == "__main__":
+    test_stream_batch_bounds_concurrency_and_builds_register()
+    test_sync_batch_serves_library_hits_without_the_llm()
+    test_batch_uses_realtime_data_per_activity()
+    test_register_orders_by_risk()
+    print("Batch hazard analysis tests passed.")
@@ -0,0 +1,142 @@
+import os
+import json
+import asyncio
+import tempfile
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+from smp.core.smp import HazardAnalysisChain
+from smp.core.library import HazardLibrary, merge_analysis, normalize_activity
+from smp.data.vector_store import KnowledgeBase
+
+
+def hazard(hazard_id, aspect, probability=3):
+    return {
+        "hazard_id": hazard_id, "hazard_aspect": aspect, "possible_outcome": "Injury",
+        "existing_control_measures": "Standard procedure", "probability": probability, "exposure": 3,
+        "consequences": 1, "risk_score": probability * 3, "risk_rating": "Medium",
+        "additional_control_measures": [], "residual_impact": "Low",
+    }
+
+
+class RecordingLLM(LLM):
+    """LLM stand-in answering every prompt with a canned response and recording the prompts."""
+    response: str
+    prompts: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        self.prompts.append(prompt)
+        return self.response
+
+
+class HashEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [np.random.default_rng(abs(hash(t)) % (2 ** 32)).normal(size=16).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def write_doc(tmp, text):
+    doc = os.path.join(tmp, "smp.txt")
+    with open(doc, "w", encoding="utf-8") as f:
+        f.write(text)
+    return doc
+
+
+def build_chain(tmp, response):
+    kb = KnowledgeBase(chunk_size=80, chunk_overlap=0, embedding_cache_dir=None, embeddings=HashEmbeddings())
+    kb.add_documents([write_doc(tmp, "Blasting needs a cleared danger zone.\n\nDrilling raises dust.")],
+                     document_type="txt", save_path=os.path.join(tmp, "faiss_index"))
+    chain = HazardAnalysisChain("test-key")
+    chain.knowledge_base = kb
+    chain.library = HazardLibrary(os.path.join(tmp, "library.json"), store_path=os.path.join(tmp, "faiss_index"))
+    llm = RecordingLLM(response=json.dumps(response), prompts=[])
+    chain.chain = chain.prompt | llm | chain.parser
+    chain.merge_chain = chain.merge_prompt | llm | chain.parser
+    return chain, llm
+
+
+def test_normalize_activity():
+    assert normalize_activity("Blasting Operations") == "blasting"
+    assert normalize_activity("  EXPLOSIVE handling ") == "blasting"
+    assert normalize_activity("Dragline operation") == "dragline"
+    assert normalize_activity("Dumper-Haulage") == "dumper haulage"
+
+
+def test_merge_analysis_replaces_by_id_and_appends():
+    base = {"activity_name": "Blasting", "hazards": [hazard("BO-1", "Fly rock"), hazard("BO-2", "Misfire")]}
+    merged = merge_analysis(base, {"hazards": [hazard("BO-2", "Misfire", 10), hazard("BO-3", "Toxic fumes")]})
+    assert [h["hazard_id"] for h in merged["hazards"]] == ["BO-1", "BO-2", "BO-3"]
+    assert merged["hazards"][1]["probability"] == 10
+    assert base["hazards"][1]["probability"] == 3
+
+
+def test_precomputed_analyses_are_served_without_retrieval_or_generation():
+    with tempfile.TemporaryDirectory() as tmp:
+        analysis = {"activity_name": "Blasting", "hazards": [hazard("BO-1", "Fly rock")]}
+        chain, llm = build_chain(tmp, analysis)
+
+        summary = chain.precompute_library(["Blasting", "Drilling"])
+        assert summary["generated"] == ["Blasting", "Drilling"] and not summary["failed"]
+        assert len(llm.prompts) == 2
+        assert chain.precompute_library(["Blasting", "Drilling"])["fresh"] == ["Blasting", "Drilling"]
+
+        chain._retrieve_knowledge_base_info = None  # retrieval must not run for library hits
+        result = chain.perform_hazard_analysis("blasting operations")
+        assert result["activity_name"] == "blasting operations"
+        assert result["hazards"] == analysis["hazards"]
+        assert asyncio.run(chain.aperform_hazard_analysis("Blasting"))["hazards"] == analysis["hazards"]
+        assert len(llm.prompts) == 2
+
+
+def test_input_info_is_merged_by_the_llm():
+    with tempfile.TemporaryDirectory() as tmp:
+        chain, llm = build_chain(tmp, {"activity_name": "Blasting", "hazards": [hazard("BO-1", "Fly rock")]})
+        chain.precompute_library(["Blasting"])
+
+        llm.response = json.dumps({"activity_name": "Blasting", "hazards": [hazard("BO-2", "Misfire in wet holes")]})
+        result = chain.perform_hazard_analysis("Blasting", input_info="Holes are waterlogged after rain")
+        assert [h["hazard_id"] for h in result["hazards"]] == ["BO-1", "BO-2"]
+        assert "waterlogged" in llm.prompts[-1] and "Fly rock" in llm.prompts[-1]
+
+
+def test_entries_go_stale_when_the_knowledge_base_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        chain, llm = build_chain(tmp, {"activity_name": "Blasting", "hazards": [hazard("BO-1", "Fly rock")]})
+        chain.precompute_library(["Blasting"])
+        assert chain.library.get("Blasting") is not None
+
+        chain.knowledge_base.add_documents([write_doc(tmp, "Blasting is banned during thunderstorms.")],
+                                           document_type="txt", save_path=os.path.join(tmp, "faiss_index"),
+                                           source_names=["circular.txt"])
+        assert chain.library.get("Blasting") is None
+        assert chain.library.stale(["Blasting"]) == ["Blasting"]
+        assert chain.precompute_library(["Blasting"])["generated"] == ["Blasting"]
+        assert chain.library.get("Blasting") is not None
+
+
+def test_invalid_analyses_are_not_stored():
+    with tempfile.TemporaryDirectory() as tmp:
+        chain, llm = build_chain(tmp, {"activity_name": "Blasting", "hazards": [{"hazard_id": "BO-1"}]})
+        summary = chain.precompute_library(["Blasting"])
+        assert "Blasting" in summary["failed"] and not summary["generated"]
+        assert chain.library.get("Blasting") is None
+
+
+if __name__ == "__main__":
+    test_normalize_activity()
+    test_merge_analysis_replaces_by_id_and_appends()
+    test_precomputed_analyses_are_served_without_retrieval_or_generation()
+    test_input_info_is_merged_by_the_llm()
+    test_entries_go_stale_when_the_knowledge_base_changes()
+    test_invalid_analyses_are_not_stored()
+    print("Hazard library tests passed.")
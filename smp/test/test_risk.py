@@ -0,0 +1,61 @@
+import numpy as np
+
+from smp.components.risk import RiskScorer
+
+
+def hazard(probability, exposure, consequences, risk_score=0, risk_rating="Low"):
+    return {"hazard_id": "H-1", "probability": probability, "exposure": exposure, "consequences": consequences,
+            "risk_score": risk_score, "risk_rating": risk_rating}
+
+
+def test_labels_and_numbers_map_to_scale_factors():
+    scorer = RiskScorer()
+    assert scorer.factors("probability", ["Quite possible", "quite possible ", 7, "10"]).tolist() == [7, 7, 7, 10]
+    # Off-scale numbers snap to the nearest factor on a log scale
+    assert scorer.factors("exposure", [4, 0.03, 100]).tolist() == [5, 0.02, 10]
+    assert np.isnan(scorer.factors("consequences", ["Unknown", None])).all()
+
+
+def test_scores_and_ratings_follow_thresholds():
+    scorer = RiskScorer(thresholds={"Critical": 100, "High": 10, "Medium": 1, "Low": 0})
+    scores, ratings = scorer.score(["May well be expected", 7, 1], ["Continuous", 5, 0.5], ["Several dead", 1, 0.001])
+    assert scores.tolist() == [500, 35, 0.0005]
+    assert ratings.tolist() == ["Critical", "High", "Low"]
+
+
+def test_score_hazards_overwrites_llm_numbers():
+    scorer = RiskScorer()
+    hazards = [hazard(7, 5, 1, risk_score=35, risk_rating="High"), hazard(7, 5, 1, risk_score=12, risk_rating="Low"),
+               hazard("Unusual but possible", 3, 0.3), hazard("often", 3, 1, risk_score=9)]
+    report = scorer.score_hazards(hazards)
+    assert (report["scored"], report["corrected"], report["unscored"]) == (3, 2, 1)
+    assert hazards[1]["risk_score"] == 35 and hazards[1]["risk_rating"] == "High"
+    assert hazards[2]["probability"] == 3 and hazards[2]["risk_score"] == 2.7 and hazards[2]["risk_rating"] == "Medium"
+    assert hazards[3]["risk_score"] == 9
+
+
+def test_validation_only_leaves_hazards_untouched():
+    hazards = [hazard(7, 5, 1, risk_score=12)]
+    report = RiskScorer().score_hazards(hazards, overwrite=False)
+    assert report["corrected"] == 1 and hazards[0]["risk_score"] == 12
+
+
+def test_thousands_of_hazards_in_one_pass():
+    rng = np.random.default_rng(0)
+    analyses = [{"activity_name": f"Activity {i}",
+                 "hazards": [hazard(*map(float, rng.choice([0.5, 1, 3, 7, 10], 3))) for _ in range(20)]}
+                for i in range(500)]
+    report = RiskScorer().score_analyses(analyses)
+    assert report["scored"] == 10000
+    assert report["elapsed_ms"] < 2000
+    first = analyses[0]["hazards"][0]
+    assert first["risk_score"] == round(first["probability"] * first["exposure"] * first["consequences"], 6)
+
+
+if __name__ == "__main__":
+    test_labels_and_numbers_map_to_scale_factors()
+    test_scores_and_ratings_follow_thresholds()
+    test_score_hazards_overwrites_llm_numbers()
+    test_validation_only_leaves_hazards_untouched()
+    test_thousands_of_hazards_in_one_pass()
+    print("Risk scoring tests passed.")
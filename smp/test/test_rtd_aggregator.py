@@ -0,0 +1,103 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from smp.utils.data_req import rtd_analyser, rtd_analyser_many
+
+RESPONSES = {
+    "/api/v1/shift": {"message": "Fetched shifts successfully!", "data": [
+        {"shiftId": 1, "name": "Morning Shift", "startTime": "08:00", "endTime": "16:00", "isActive": False},
+        {"shiftId": 2, "name": "Afternoon Shift", "startTime": "16:00", "endTime": "00:00", "isActive": True},
+    ]},
+    "/api/v1/smp/rm": {"status": "success", "data": [
+        {"smp_id": 1, "hazard": "Fly rock during blasting", "probability": 3},
+        {"smp_id": 2, "hazard": "Dumper collision on haul road", "probability": 2},
+        {"smp_id": 3, "hazard": "Misfire after blasting", "probability": 7},
+    ]},
+    "/api/v1/rounds": {"data": [{"round": 1, "note": "Blasting area cleared"}]},
+}
+
+
+class Backend(BaseHTTPRequestHandler):
+    delays = {}
+    requests = []
+
+    def do_GET(self):
+        Backend.requests.append((self.path, time.monotonic()))
+        time.sleep(Backend.delays.get(self.path, 0))
+        body = json.dumps(RESPONSES[self.path]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Backend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_endpoints_are_fetched_concurrently_and_extracted_deterministically():
+    server, host = serve()
+    try:
+        Backend.delays = {path: 0.2 for path in RESPONSES}
+        Backend.requests = []
+        start = time.monotonic()
+        data = rtd_analyser("Blasting", deadline=2, host_url=host)
+        elapsed = time.monotonic() - start
+    finally:
+        server.shutdown()
+
+    assert elapsed < 0.55
+    assert data["shift"] == [{"shiftId": 2, "name": "Afternoon Shift", "startTime": "16:00", "endTime": "00:00"}]
+    assert [record["smp_id"] for record in data["smp"]] == [1, 3]
+    assert data["rounds"] == [{"round": 1, "note": "Blasting area cleared"}]
+    assert "errors" not in data
+
+
+def test_several_queries_share_one_fetch_per_endpoint():
+    server, host = serve()
+    try:
+        Backend.delays = {}
+        Backend.requests = []
+        data = rtd_analyser_many(["Blasting", "Dumper"], deadline=2, host_url=host)
+    finally:
+        server.shutdown()
+
+    assert sorted(path for path, _ in Backend.requests) == sorted(RESPONSES)
+    assert [record["smp_id"] for record in data["Blasting"]["smp"]] == [1, 3]
+    assert [record["smp_id"] for record in data["Dumper"]["smp"]] == [2]
+
+
+def test_slow_endpoints_are_cut_at_the_deadline():
+    server, host = serve()
+    try:
+        Backend.delays = {"/api/v1/rounds": 2}
+        start = time.monotonic()
+        data = rtd_analyser("Blasting", deadline=0.3, host_url=host)
+        elapsed = time.monotonic() - start
+    finally:
+        server.shutdown()
+
+    assert elapsed < 1
+    assert "rounds" not in data and "rounds" in data["errors"]
+    assert [record["smp_id"] for record in data["smp"]] == [1, 3]
+
+
+def test_unreachable_backend_is_reported():
+    data = rtd_analyser("Blasting", deadline=1, host_url="http://127.0.0.1:9")
+    assert set(data["errors"]) == {"shift", "smp", "rounds"}
+
+
+if __name__ == "__main__":
+    test_endpoints_are_fetched_concurrently_and_extracted_deterministically()
+    test_several_queries_share_one_fetch_per_endpoint()
+    test_slow_endpoints_are_cut_at_the_deadline()
+    test_unreachable_backend_is_reported()
+    print("Real-time data aggregator tests passed.")
@@ -1,50 +1,122 @@
-import requests
-from smp.data.endpoints import endpoints, mapping
-from smp.components.json_tools import query_json
+import os
+import time
+import asyncio
+from smp.data.endpoints import endpoints, mapping, rtd_sources
+from common.json_query import filter_records, select
+from common.backend_client import adata_requester, data_requester, get_backend_client
 
-def data_requester(endpoint_url, headers=None):
+# Backend serving the real-time shift, SMP and rounds data
+RTD_HOST_URL = os.getenv("RTD_HOST_URL", "http://192.168.137.53:3000")
+# Time allowed for all real-time data of one hazard analysis
+RTD_DEADLINE = float(os.getenv("RTD_DEADLINE_MS", 1500)) / 1000
+
+
+def extract_rtd(data, query, source):
+    """
+    Extract the records relevant to a query from an endpoint's response, without an LLM.
+
+    Args:
+        data (dict): Endpoint response.
+        query (str): Activity or query the hazard analysis is for.
+        source (dict): Extraction spec of the endpoint (see rtd_sources).
+
+    Returns:
+        list: The relevant records.
+    """
+    records = []
+    for value in select(data, source.get("path", "")):
+        records.extend(value if isinstance(value, list) else [value])
+    return filter_records(records, where=source.get("where"), match=query if source.get("match") else None,
+                          fields=source.get("fields"), limit=source.get("limit"))
+
+
+async def artd_analyser(query, deadline=None, host_url=None, headers=None):
     """
-    Fetches data from a GET endpoint.
+    Fetch the real-time data endpoints concurrently and extract what is relevant to a query.
+    Each endpoint has its own timeout and all of them share a deadline; endpoints still
+    pending at the deadline are cancelled and reported as timed out.
 
     Args:
-        endpoint_url (str): The URL of the GET endpoint.
-        headers (dict, optional): Headers to include in the request (e.g., for authentication).
+        query (str): Activity or query the hazard analysis is for.
+        deadline (float, optional): Seconds allowed for all endpoints (defaults to RTD_DEADLINE_MS).
+        host_url (str, optional): Backend URL (defaults to RTD_HOST_URL).
+        headers (dict, optional): Headers to include in the requests.
 
     Returns:
-        dict: The data retrieved from the endpoint, or an error message.
+        dict: Relevant records by data name ('shift', 'smp', 'rounds'), with an 'errors'
+        entry naming the endpoints that failed or timed out.
+    """
+    return (await artd_analyser_many([query], deadline=deadline, host_url=host_url, headers=headers))[query]
+
+
+async def artd_analyser_many(queries, deadline=None, host_url=None, headers=None):
     """
-    try:
-        response = requests.get(endpoint_url, headers=headers)
+    Variant of artd_analyser for several queries, e.g. the activities of a mine plan.
+    Every endpoint is fetched once and the relevant records are extracted for each query.
+
+    Args:
+        queries (list): Activities or queries the hazard analyses are for.
+        deadline (float, optional): Seconds allowed for all endpoints (defaults to RTD_DEADLINE_MS).
+        host_url (str, optional): Backend URL (defaults to RTD_HOST_URL).
+        headers (dict, optional): Headers to include in the requests.
 
-        if response.status_code == 200:
-            return response.json()
+    Returns:
+        dict: For each query, the result artd_analyser would return for it.
+    """
+    deadline = RTD_DEADLINE if deadline is None else deadline
+    host_url = host_url or RTD_HOST_URL
+    start = time.monotonic()
+
+    async def fetch(key, name):
+        source = rtd_sources.get(name, {})
+        timeout = min(source.get("timeout", deadline), max(deadline - (time.monotonic() - start), 0.001))
+        data = await adata_requester(host_url + endpoints[key], headers=headers, timeout=timeout)
+        if isinstance(data, dict) and "error" in data:
+            raise RuntimeError(data["error"])
+        return data
+
+    tasks = {name: asyncio.ensure_future(fetch(key, name)) for key, name in mapping.items() if key in endpoints}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=deadline)
+
+    pending = [task for task in tasks.values() if not task.done()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    fetched, errors = {}, {}
+    for name, task in tasks.items():
+        if task.cancelled():
+            errors[name] = "timed out"
+        elif task.exception() is not None:
+            errors[name] = str(task.exception())
         else:
-            return {
-                "error": f"Failed to retrieve data. Status Code: {response.status_code}",
-                "details": response.text
-            }
-    except Exception as e:
-        return {"error": f"An exception occurred: {str(e)}"}
-    
-def rtd_analyser(query):
-        combined_data = {}
-        host_url = "http://192.168.137.53:3000"
-        for key, value in mapping.items():
-            endpoint_url = endpoints[key]
-            query = queries[value] + f'. Do not use markdown language or style the text. The user has asked for activity/queried: {query}. Extract only relevant information'
-            print(f"endpoint_url: {host_url + endpoint_url}, query: {query}")
-            
-            data = data_requester(endpoint_url=endpoint_url)
-            res = query_json(query=query, data=data)
-            
-            print(res)
-            combined_data[value] = res
-        
-        return combined_data
-    
-queries = {
-    'shift': 'Provide a detailed breakdown of works in the current shift, categorized as: Completed works, Half Completed, Unfinished works',
-    'user': 'For the current user and current shift, generate a comprehensive report of completed tasks',
-    'smp': 'Provide a textual report for the current Safety Management Plan (SMP), identifying each activity/hazard and it\'s Consequences, Probability, Exposure.',
-    'iot': 'Conduct a thorough anomaly detection analysis on the current IoT sensor data: 1) Identify any data points that deviate significantly from the established baseline or normal operating range. 2) Create a comprehensive report of: a) Unusual spikes in measurements, b) Values exceeding predefined thresholds, c) Unexpected patterns or correlations in sensor readings.'
-}
\ No newline at end of file
+            fetched[name] = task.result()
+
+    results = {}
+    for query in queries:
+        combined_data = {name: extract_rtd(data, query, rtd_sources.get(name, {})) for name, data in fetched.items()}
+        if errors:
+            combined_data["errors"] = dict(errors)
+        results[query] = combined_data
+    return results
+
+
+def rtd_analyser(query, deadline=None, host_url=None, headers=None):
+    """
+    Blocking variant of artd_analyser, for use outside an event loop.
+    """
+    return rtd_analyser_many([query], deadline=deadline, host_url=host_url, headers=headers)[query]
+
+
+def rtd_analyser_many(queries, deadline=None, host_url=None, headers=None):
+    """
+    Blocking variant of artd_analyser_many, for use outside an event loop.
+    """
+    async def analyse():
+        try:
+            return await artd_analyser_many(queries, deadline=deadline, host_url=host_url, headers=headers)
+        finally:
+            await get_backend_client().aclose()
+
+    return asyncio.run(analyse())